@@ -4,195 +4,310 @@ Coding Knowledge API Server - REST API for the coding knowledge service
 Runs on port 8001 to avoid conflicts with other services
 """
 
-import json
+import asyncio
+import hashlib
 import sys
 import os
-from http.server import HTTPServer, BaseHTTPRequestHandler
-from urllib.parse import urlparse, parse_qs
 from pathlib import Path
+from typing import Any, Dict, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
+from starlette.exceptions import HTTPException as StarletteHTTPException
+import uvicorn
+
+# ijson lets /save-crawl parse crawl results incrementally instead of
+# materializing the whole request body
+try:
+    import ijson
+    IJSON_AVAILABLE = True
+except ImportError:
+    IJSON_AVAILABLE = False
 
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 # Import the coding knowledge service
-from coding_knowledge_service import CodingKnowledgeService
+from coding_knowledge_service import (
+    CodingKnowledgeService, EmbeddingWorker, EMBEDDINGS_AVAILABLE, json_dumps, json_loads
+)
 
-class CodingKnowledgeAPIHandler(BaseHTTPRequestHandler):
-    """HTTP Request Handler for Coding Knowledge API"""
-    
-    def __init__(self, *args, **kwargs):
-        # Get workspace path from environment
-        workspace_path = os.environ.get('KNOWLEDGE_WORKSPACE', 
-                                       '/Users/clemenshoenig/Documents/My-Coding-Programs/Knowledge OS')
-        
-        self.knowledge_service = CodingKnowledgeService(workspace_path)
-        super().__init__(*args, **kwargs)
-    
-    def do_OPTIONS(self):
-        """Handle CORS preflight requests"""
-        self.send_response(200)
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
-        self.end_headers()
+# Crawl results are inserted in batches of this size while the body streams in
+SAVE_CRAWL_BATCH_SIZE = 64
+
+WORKSPACE_PATH = os.environ.get('KNOWLEDGE_WORKSPACE',
+                                '/Users/clemenshoenig/Documents/My-Coding-Programs/Knowledge OS')
+
+app = FastAPI(
+    title="Coding Knowledge API",
+    description="Standalone service for coding documentation",
+    version="1.0.0"
+)
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_methods=["GET", "POST", "OPTIONS"],
+    allow_headers=["Content-Type"],
+)
+
+
+def send_json_response(data: Any, status: int = 200, headers: Optional[Dict[str, str]] = None) -> Response:
+    """Send JSON response with proper headers"""
+    return Response(content=json_dumps(data), status_code=status, media_type='application/json', headers=headers)
+
+
+def send_cacheable_json_response(request: Request, data: Any, max_age: int = 60) -> Response:
+    """Send JSON with an ETag so clients can revalidate repeated queries cheaply"""
+    body = json_dumps(data)
+    etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    headers = {'ETag': etag, 'Cache-Control': f'max-age={max_age}'}
+    if request.headers.get('if-none-match') == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type='application/json', headers=headers)
+
+
+async def read_json_body(request: Request) -> Any:
+    """Parse the request body, returning None if it is not valid JSON"""
+    try:
+        return json_loads(await request.body())
+    except ValueError:
+        return None
+
+
+async def run_blocking(func, *args):
+    """Run a blocking service call (SQLite / embedding inference) off the event loop"""
+    return await asyncio.to_thread(func, *args)
+
+
+@app.middleware("http")
+async def handle_errors(request: Request, call_next):
+    """Report unexpected errors as JSON, like the previous handler did"""
+    try:
+        return await call_next(request)
+    except Exception as e:
+        print(f"Error processing request: {e}")
+        import traceback
+        traceback.print_exc()
+        return send_json_response({'error': str(e)}, 500)
+
+
+@app.exception_handler(StarletteHTTPException)
+async def handle_http_error(request: Request, exc: StarletteHTTPException):
+    """Keep the {'error': ...} body shape for unknown endpoints"""
+    message = 'Endpoint not found' if exc.status_code == 404 else exc.detail
+    return send_json_response({'error': message}, exc.status_code)
+
+
+@app.on_event("startup")
+async def startup_event():
+    """Create the shared knowledge service once for all requests"""
+    # Encode in a worker process so embedding inference never blocks requests
+    app.state.embedding_worker = None
+    if EMBEDDINGS_AVAILABLE:
+        try:
+            app.state.embedding_worker = await run_blocking(EmbeddingWorker)
+        except Exception as e:
+            print(f"⚠️  Embedding worker unavailable ({e}); encoding in-process")
     
-    def do_GET(self):
-        """Handle GET requests"""
-        parsed_path = urlparse(self.path)
-        path = parsed_path.path
+    app.state.knowledge_service = CodingKnowledgeService(WORKSPACE_PATH, encoder=app.state.embedding_worker)
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the embedding worker"""
+    if app.state.embedding_worker is not None:
+        app.state.embedding_worker.close()
+
+
+@app.get("/health")
+async def health():
+    """Check service health"""
+    return send_json_response({
+        'status': 'healthy',
+        'service': 'coding-knowledge',
+        'version': '1.0.0'
+    })
+
+
+@app.get("/statistics")
+async def statistics():
+    """Get knowledge base statistics"""
+    stats = await run_blocking(app.state.knowledge_service.get_statistics)
+    return send_json_response(stats)
+
+
+@app.post("/save-crawl")
+async def save_crawl(request: Request):
+    """Save crawl results to database"""
+    if not IJSON_AVAILABLE:
+        data = await read_json_body(request)
+        if data is None:
+            return send_json_response({'error': 'Invalid JSON'}, 400)
         
-        if path == '/health':
-            self.send_json_response({
-                'status': 'healthy',
-                'service': 'coding-knowledge',
-                'version': '1.0.0'
-            })
-            
-        elif path == '/statistics':
-            stats = self.knowledge_service.get_statistics()
-            self.send_json_response(stats)
-            
-        else:
-            self.send_json_response({'error': 'Not found'}, 404)
+        results = data.get('results', [])
+        save_result = await run_blocking(app.state.knowledge_service.save_crawl_results, results)
+        return send_json_response(save_result)
     
-    def do_POST(self):
-        """Handle POST requests"""
-        content_length = int(self.headers['Content-Length'])
-        post_data = self.rfile.read(content_length)
-        
-        try:
-            data = json.loads(post_data.decode('utf-8'))
-        except json.JSONDecodeError:
-            self.send_json_response({'error': 'Invalid JSON'}, 400)
-            return
-        
-        path = urlparse(self.path).path
-        
-        try:
-            if path == '/save-crawl':
-                # Save crawl results to database
-                results = data.get('results', [])
-                save_result = self.knowledge_service.save_crawl_results(results)
-                self.send_json_response(save_result)
-                
-            elif path == '/search':
-                # Search code knowledge
-                query = data.get('query', '')
-                search_type = data.get('search_type', 'hybrid')
-                limit = data.get('limit', 10)
-                
-                results = self.knowledge_service.search_code(query, search_type, limit)
-                self.send_json_response({
-                    'success': True,
-                    'results': results,
-                    'count': len(results)
-                })
-                
-            elif path == '/api-signature':
-                # Get API signature
-                class_name = data.get('class_name')
-                method_name = data.get('method_name', '')
-                
-                signature = self.knowledge_service.get_api_signature(class_name, method_name)
-                if signature:
-                    self.send_json_response({
-                        'success': True,
-                        'signature': signature
-                    })
-                else:
-                    self.send_json_response({
-                        'success': False,
-                        'error': 'API signature not found'
-                    }, 404)
-                    
-            elif path == '/error-search':
-                # Search for error solutions
-                error_message = data.get('error', '')
-                
-                solutions = self.knowledge_service.search_by_error(error_message)
-                self.send_json_response({
-                    'success': True,
-                    'solutions': solutions,
-                    'count': len(solutions)
-                })
-                
-            elif path == '/patterns':
-                # Get language patterns
-                language = data.get('language', '')
-                pattern_type = data.get('type', 'all')
-                
-                patterns = self.knowledge_service.get_language_patterns(language, pattern_type)
-                self.send_json_response({
-                    'success': True,
-                    'patterns': patterns,
-                    'count': len(patterns)
-                })
-                
-            else:
-                self.send_json_response({'error': 'Endpoint not found'}, 404)
-                
-        except Exception as e:
-            print(f"Error processing request: {e}")
-            import traceback
-            traceback.print_exc()
-            self.send_json_response({'error': str(e)}, 500)
+    # Parse results out of the body batch by batch, so peak memory is bounded by
+    # the batch size rather than the payload size. Each batch is encoded and
+    # staged as it arrives; the database is written in one transaction once the
+    # body is complete, so the crawl is saved all-or-nothing and a slow upload
+    # never holds the write lock
+    writer = await run_blocking(app.state.knowledge_service.crawl_writer)
+    try:
+        # ijson's push parser is fed from this task; its async pull interface
+        # would call receive() from outside the middleware's cancel scope
+        batch = []
+        parsed = ijson.sendable_list()
+        parser = ijson.items_coro(parsed, 'results.item', use_float=True)
+        async for chunk in request.stream():
+            if not chunk:
+                continue
+            parser.send(chunk)
+            batch.extend(parsed)
+            del parsed[:]
+            if len(batch) >= SAVE_CRAWL_BATCH_SIZE:
+                await run_blocking(writer.add, batch)
+                batch = []
+        parser.close()
+        batch.extend(parsed)
+        if batch:
+            await run_blocking(writer.add, batch)
+        save_result = await run_blocking(writer.commit)
+    except ijson.JSONError:
+        return send_json_response({'error': 'Invalid JSON'}, 400)
+    except Exception as e:
+        save_result = {
+            'success': False,
+            'error': str(e)
+        }
+    finally:
+        await run_blocking(writer.close)
+    return send_json_response(save_result)
+
+
+@app.post("/search")
+async def search(request: Request):
+    """Search code knowledge"""
+    data = await read_json_body(request)
+    if data is None:
+        return send_json_response({'error': 'Invalid JSON'}, 400)
+
+    query = data.get('query', '')
+    search_type = data.get('search_type', 'hybrid')
+    limit = data.get('limit', 10)
+
+    results = await run_blocking(app.state.knowledge_service.search_code, query, search_type, limit)
+    return send_cacheable_json_response(request, {
+        'success': True,
+        'results': results,
+        'count': len(results)
+    })
+
+
+@app.post("/search-batch")
+async def search_batch(request: Request):
+    """Search code knowledge for several queries in one request"""
+    data = await read_json_body(request)
+    if data is None:
+        return send_json_response({'error': 'Invalid JSON'}, 400)
     
-    def send_json_response(self, data, status=200):
-        """Send JSON response with proper headers"""
-        self.send_response(status)
-        self.send_header('Content-Type', 'application/json')
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.end_headers()
-        self.wfile.write(json.dumps(data).encode('utf-8'))
+    queries = data.get('queries', [])
+    if not isinstance(queries, list) or not all(isinstance(query, str) for query in queries):
+        return send_json_response({'error': 'queries must be a list of strings'}, 400)
+    search_type = data.get('search_type', 'hybrid')
+    limit = data.get('limit', 10)
     
-    def log_message(self, format, *args):
-        """Custom logging"""
-        print(f"[Coding Knowledge API] {format % args}")
+    results = await run_blocking(app.state.knowledge_service.search_code_batch, queries, search_type, limit)
+    return send_json_response({
+        'success': True,
+        'results': results,
+        'count': len(results)
+    })
+
+
+@app.post("/api-signature")
+async def api_signature(request: Request):
+    """Get exact API signature"""
+    data = await read_json_body(request)
+    if data is None:
+        return send_json_response({'error': 'Invalid JSON'}, 400)
+
+    class_name = data.get('class_name')
+    method_name = data.get('method_name', '')
+
+    signature = await run_blocking(app.state.knowledge_service.get_api_signature, class_name, method_name)
+    if signature:
+        return send_json_response({
+            'success': True,
+            'signature': signature
+        })
+    return send_json_response({
+        'success': False,
+        'error': 'API signature not found'
+    }, 404)
+
+
+@app.post("/error-search")
+async def error_search(request: Request):
+    """Search for error solutions"""
+    data = await read_json_body(request)
+    if data is None:
+        return send_json_response({'error': 'Invalid JSON'}, 400)
+
+    error_message = data.get('error', '')
+
+    solutions = await run_blocking(app.state.knowledge_service.search_by_error, error_message)
+    return send_json_response({
+        'success': True,
+        'solutions': solutions,
+        'count': len(solutions)
+    })
+
+
+@app.post("/patterns")
+async def patterns(request: Request):
+    """Get language patterns"""
+    data = await read_json_body(request)
+    if data is None:
+        return send_json_response({'error': 'Invalid JSON'}, 400)
+
+    language = data.get('language', '')
+    pattern_type = data.get('type', 'all')
+
+    patterns = await run_blocking(app.state.knowledge_service.get_language_patterns, language, pattern_type)
+    return send_json_response({
+        'success': True,
+        'patterns': patterns,
+        'count': len(patterns)
+    })
+
 
 def run_server(port=8001):
-    """Run the HTTP server"""
-    workspace_path = os.environ.get('KNOWLEDGE_WORKSPACE', 
-                                   '/Users/clemenshoenig/Documents/My-Coding-Programs/Knowledge OS')
-    
+    """Run the ASGI server"""
     print(f"🚀 Starting Coding Knowledge API Server on port {port}")
-    print(f"📁 Workspace: {workspace_path}")
-    print(f"🗄️  Database: {Path(workspace_path) / '.knowledge' / 'code_knowledge.db'}")
-    
-    server_address = ('', port)
-    
-    # Create a custom HTTPServer that passes workspace to handlers
-    class CodingKnowledgeHTTPServer(HTTPServer):
-        def __init__(self, server_address, RequestHandlerClass):
-            super().__init__(server_address, RequestHandlerClass)
-            self.workspace_path = workspace_path
-            self.knowledge_service = CodingKnowledgeService(workspace_path)
-    
-    # Create custom handler that uses the shared service
-    class CustomHandler(CodingKnowledgeAPIHandler):
-        def __init__(self, *args, **kwargs):
-            self.knowledge_service = httpd.knowledge_service
-            BaseHTTPRequestHandler.__init__(self, *args, **kwargs)
-    
-    httpd = CodingKnowledgeHTTPServer(server_address, CustomHandler)
-    
+    print(f"📁 Workspace: {WORKSPACE_PATH}")
+    print(f"🗄️  Database: {Path(WORKSPACE_PATH) / '.knowledge' / 'code_knowledge.db'}")
+
     print(f"\n✅ Coding Knowledge API ready at http://localhost:{port}")
     print("\nEndpoints:")
     print("  GET  /health           - Check service health")
     print("  GET  /statistics       - Get knowledge base statistics")
     print("  POST /save-crawl       - Save crawl results to database")
     print("  POST /search           - Search code knowledge")
+    print("  POST /search-batch     - Search code knowledge for several queries")
     print("  POST /api-signature    - Get exact API signature")
     print("  POST /error-search     - Find solutions for errors")
     print("  POST /patterns         - Get language patterns and best practices")
     print("\n📚 This is a standalone service for coding documentation")
     print("🔧 It does not interfere with other KnowledgeOS features")
-    
-    try:
-        httpd.serve_forever()
-    except KeyboardInterrupt:
-        print("\n👋 Shutting down Coding Knowledge API Server")
-        httpd.shutdown()
+
+    # uvicorn picks uvloop/httptools automatically when they are installed
+    uvicorn.run(app, host="0.0.0.0", port=port, log_level="info")
+    print("\n👋 Shutting down Coding Knowledge API Server")
 
 if __name__ == "__main__":
     port = int(sys.argv[1]) if len(sys.argv) > 1 else 8001
-    run_server(port)
\ No newline at end of file
+    run_server(port)
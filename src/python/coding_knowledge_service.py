@@ -5,29 +5,640 @@ Completely independent from other services
 """
 
 import sqlite3
-import json
 import os
+import pickle
+import tempfile
+import itertools
+import multiprocessing
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from multiprocessing import shared_memory
 from pathlib import Path
 from typing import List, Dict, Any, Optional, Tuple
-from datetime import datetime
-import hashlib
 import re
 
+# Prefer orjson for (de)serialization; it emits bytes directly and is several
+# times faster on large structured_data / parameter blobs
+try:
+    import orjson
+
+    def json_dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj)
+
+    json_loads = orjson.loads
+except ImportError:
+    import json
+
+    def json_dumps(obj: Any) -> bytes:
+        return json.dumps(obj).encode('utf-8')
+
+    json_loads = json.loads
+
 # Try to import NLP libraries for enhanced features
 try:
     import numpy as np
     from sentence_transformers import SentenceTransformer
+    from embedding_codec import EMBEDDING_INT8_MAGIC, quantize_embedding, decode_embeddings
     EMBEDDINGS_AVAILABLE = True
-    embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
 except ImportError:
     EMBEDDINGS_AVAILABLE = False
-    embedding_model = None
     print("⚠️  Embeddings not available. Install sentence-transformers for semantic search.")
 
+# Faiss is optional; without it semantic search falls back to a NumPy scan
+try:
+    import faiss
+    FAISS_AVAILABLE = True
+except ImportError:
+    FAISS_AVAILABLE = False
+
+# ONNX Runtime (via optimum) runs the embedding model with int8 weights when installed
+try:
+    from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
+
+EMBEDDING_MODEL_NAME = 'sentence-transformers/all-MiniLM-L6-v2'
+
+# Crawl batches staged by CrawlWriter stay in memory up to this size, then spill to disk
+CRAWL_STAGING_MEMORY = 16 * 1024 * 1024
+ONNX_MODEL_DIR = Path(os.environ.get(
+    'CODING_KNOWLEDGE_ONNX_DIR',
+    str(Path.home() / '.cache' / 'knowledgeos' / 'all-MiniLM-L6-v2-onnx-int8')
+))
+
+# IVF needs enough vectors to train its coarse quantizer; smaller tables use a flat index
+ANN_NLIST = 64
+ANN_NPROBE = 8
+ANN_MIN_TRAIN_SIZE = ANN_NLIST * 39
+
+# Tables with an `embeddings` BLOB column
+EMBEDDING_TABLES = ('code_docs', 'code_examples', 'api_references', 'coding_concepts', 'search_index')
+
+# Small integer per result type, packed with the row id into one dedup key
+SEARCH_RESULT_TYPE_IDS = {'code_examples': 0, 'api_references': 1}
+
+class OnnxEmbeddingModel:
+    """all-MiniLM-L6-v2 on ONNX Runtime with int8 dynamic quantization.
+    
+    The model is exported and quantized once into `model_dir`; `encode` mirrors
+    SentenceTransformer.encode (tokenize, mean-pool, optionally L2-normalize).
+    """
+    
+    MODEL_FILE = 'model_quantized.onnx'
+    MAX_SEQ_LENGTH = 256
+    
+    def __init__(self, model_dir: Path):
+        if not (model_dir / self.MODEL_FILE).exists():
+            self._export(model_dir)
+        self.tokenizer = AutoTokenizer.from_pretrained(str(model_dir))
+        self.model = ORTModelForFeatureExtraction.from_pretrained(str(model_dir), file_name=self.MODEL_FILE)
+    
+    @staticmethod
+    def _export(model_dir: Path):
+        """Export the PyTorch model to ONNX and quantize its weights to int8"""
+        print(f"📦 Exporting {EMBEDDING_MODEL_NAME} to ONNX (one-time) in {model_dir}")
+        export_dir = model_dir / 'fp32'
+        model = ORTModelForFeatureExtraction.from_pretrained(EMBEDDING_MODEL_NAME, export=True)
+        model.save_pretrained(str(export_dir))
+        
+        quantizer = ORTQuantizer.from_pretrained(str(export_dir))
+        qconfig = AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+        quantizer.quantize(save_dir=str(model_dir), quantization_config=qconfig)
+        AutoTokenizer.from_pretrained(EMBEDDING_MODEL_NAME).save_pretrained(str(model_dir))
+    
+    def encode(self, sentences, batch_size: int = 32, convert_to_numpy: bool = True,
+               normalize_embeddings: bool = False, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            inputs = self.tokenizer(
+                texts[start:start + batch_size],
+                padding=True,
+                truncation=True,
+                max_length=self.MAX_SEQ_LENGTH,
+                return_tensors='np'
+            )
+            token_embeddings = self.model(**inputs).last_hidden_state
+            
+            # Mean pooling over real (non-padding) tokens
+            mask = inputs['attention_mask'][..., None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            batches.append(pooled.astype(np.float32))
+        
+        if not batches:
+            return np.empty((0, self.model.config.hidden_size), dtype=np.float32)
+        
+        embeddings = np.vstack(batches)
+        if normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings = embeddings / np.clip(norms, 1e-12, None)
+        return embeddings[0] if single else embeddings
+
+
+class EmbeddingStore:
+    """Append-only, memory-mapped float32 matrix of L2-normalized embeddings for
+    one table, with a parallel file of SQLite row ids (row i of the matrix
+    belongs to ids[i]). SQLite keeps the durable copy in its BLOB column.
+    """
+    
+    def __init__(self, directory: Path, table_name: str):
+        self.matrix_path = directory / f"{table_name}.emb.f32"
+        self.ids_path = directory / f"{table_name}.ids.i64"
+    
+    def exists(self) -> bool:
+        return self.matrix_path.exists() and self.ids_path.exists()
+    
+    def load(self) -> Optional[Tuple[Any, Any]]:
+        """Map (ids, matrix) from disk, or None if missing or inconsistent"""
+        if not self.exists():
+            return None
+        row_count = self.ids_path.stat().st_size // 8
+        matrix_size = self.matrix_path.stat().st_size
+        if row_count == 0 or matrix_size % (4 * row_count):
+            return None
+        
+        dim = matrix_size // (4 * row_count)
+        ids = np.memmap(self.ids_path, dtype=np.int64, mode='r', shape=(row_count,))
+        matrix = np.memmap(self.matrix_path, dtype=np.float32, mode='r', shape=(row_count, dim))
+        return ids, matrix
+    
+    def write(self, ids, matrix):
+        # Written beside the live files and renamed over them, so maps handed
+        # out by load() keep reading the old files instead of truncated ones
+        for path, data in ((self.matrix_path, np.ascontiguousarray(matrix, dtype=np.float32)),
+                           (self.ids_path, np.ascontiguousarray(ids, dtype=np.int64))):
+            tmp_path = path.with_name(path.name + '.tmp')
+            data.tofile(tmp_path)
+            os.replace(tmp_path, path)
+    
+    def append(self, ids, matrix):
+        with open(self.matrix_path, 'ab') as f:
+            f.write(np.ascontiguousarray(matrix, dtype=np.float32).tobytes())
+        with open(self.ids_path, 'ab') as f:
+            f.write(np.ascontiguousarray(ids, dtype=np.int64).tobytes())
+
+
+def load_embedding_model():
+    """Load the embedding model, preferring the quantized ONNX Runtime backend"""
+    if ONNX_AVAILABLE:
+        try:
+            return OnnxEmbeddingModel(ONNX_MODEL_DIR)
+        except Exception as e:
+            print(f"⚠️  ONNX embedding model unavailable ({e}); using sentence-transformers")
+    return SentenceTransformer('all-MiniLM-L6-v2')
+
+
+
+def _embedding_worker_main(requests, responses, model_loader, slots: int, slot_rows: int, batch_window: float):
+    """Worker process loop: micro-batch pending requests into one encode call and
+    write each request's vectors into its shared-memory slot"""
+    try:
+        model = model_loader()
+        dim = len(model.encode('dimension probe'))
+        shm = shared_memory.SharedMemory(create=True, size=slots * slot_rows * dim * 4)
+    except Exception as e:
+        responses.put(('error', str(e)))
+        return
+    
+    buffer = np.ndarray((slots, slot_rows, dim), dtype=np.float32, buffer=shm.buf)
+    responses.put(('ready', (shm.name, dim)))
+    
+    try:
+        stopping = False
+        while not stopping:
+            request = requests.get()
+            if request is None:
+                break
+            
+            # Collect whatever else arrives within the batching window
+            batch = [request]
+            deadline = time.monotonic() + batch_window
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = requests.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if request is None:
+                    stopping = True
+                    break
+                batch.append(request)
+            
+            for normalize in (False, True):
+                group = [request for request in batch if request[3] == normalize]
+                if not group:
+                    continue
+                texts = [text for request in group for text in request[2]]
+                try:
+                    vectors = model.encode(texts, batch_size=64, convert_to_numpy=True,
+                                           normalize_embeddings=normalize)
+                except Exception as e:
+                    for request_id, _, _, _ in group:
+                        responses.put((request_id, 0, str(e)))
+                    continue
+                
+                offset = 0
+                for request_id, slot, request_texts, _ in group:
+                    count = len(request_texts)
+                    buffer[slot, :count] = vectors[offset:offset + count]
+                    offset += count
+                    responses.put((request_id, count, None))
+    finally:
+        del buffer
+        shm.close()
+        shm.unlink()
+
+
+class EmbeddingWorker:
+    """Runs the embedding model in a separate process so encoding never holds the
+    API process's GIL. Concurrent requests are micro-batched by the worker and
+    the vectors come back through shared memory; `encode` mirrors
+    SentenceTransformer.encode so it can stand in for the in-process model.
+    
+    A worker that exits is restarted on the next request; callers waiting on
+    it fail fast instead of sitting out the full timeout. A worker that stays
+    alive but stops answering is killed and restarted once a caller has waited
+    `timeout` seconds for a free slot.
+    """
+    
+    # How often a waiting caller checks that the worker process is still alive
+    LIVENESS_INTERVAL = 1.0
+    
+    def __init__(self, model_loader=None, slots: int = 8, slot_rows: int = 256,
+                 batch_window: float = 0.005, timeout: float = 300.0):
+        self._model_loader = model_loader or load_embedding_model
+        self._slots = slots
+        self._slot_rows = slot_rows
+        self._batch_window = batch_window
+        self._timeout = timeout
+        
+        self._free_slots: 'queue.Queue[int]' = queue.Queue()
+        for slot in range(slots):
+            self._free_slots.put(slot)
+        self._pending: Dict[int, Future] = {}
+        # Slots of timed-out requests, held back until the worker's late
+        # response arrives so it cannot overwrite another caller's vectors
+        self._quarantined: Dict[int, int] = {}
+        self._pending_lock = threading.Lock()
+        self._restart_lock = threading.Lock()
+        self._request_ids = itertools.count()
+        # Buffers of replaced workers that could not be unmapped yet
+        self._retired_shm: List[shared_memory.SharedMemory] = []
+        
+        self._start()
+    
+    def _start(self):
+        """Spawn the worker process, map its shared buffer and start reading responses"""
+        ctx = multiprocessing.get_context('spawn')
+        requests = ctx.Queue()
+        responses = ctx.Queue()
+        process = ctx.Process(
+            target=_embedding_worker_main,
+            args=(requests, responses, self._model_loader,
+                  self._slots, self._slot_rows, self._batch_window),
+            daemon=True
+        )
+        process.start()
+        
+        while True:
+            try:
+                status, payload = responses.get(timeout=self.LIVENESS_INTERVAL)
+                break
+            except queue.Empty:
+                if not process.is_alive():
+                    raise RuntimeError("Embedding worker exited during startup")
+        if status != 'ready':
+            process.join()
+            raise RuntimeError(f"Embedding worker failed to start: {payload}")
+        
+        shm_name, self.dim = payload
+        self._shm = shared_memory.SharedMemory(name=shm_name)
+        self._buffer = np.ndarray((self._slots, self._slot_rows, self.dim), dtype=np.float32,
+                                  buffer=self._shm.buf)
+        self._requests = requests
+        self._responses = responses
+        self._process = process
+        
+        self._reader = threading.Thread(target=self._read_responses, args=(responses,), daemon=True)
+        self._reader.start()
+    
+    def _ensure_running(self):
+        """Restart the worker process if it has exited"""
+        process = self._process
+        if not process.is_alive():
+            self._restart(process, "Embedding worker exited")
+    
+    def _restart(self, process, reason: str):
+        """Replace `process` with a fresh worker, failing every request still waiting on it"""
+        with self._restart_lock:
+            if process is not self._process:
+                return  # Another caller already restarted it
+            print(f"⚠️  {reason}; restarting it")
+            if process.is_alive():
+                process.kill()
+            process.join()
+            with self._pending_lock:
+                pending, self._pending = self._pending, {}
+                quarantined, self._quarantined = self._quarantined, {}
+            for future in pending.values():
+                future.set_exception(RuntimeError(reason))
+            # The dead process can no longer write into these slots
+            for slot in quarantined.values():
+                self._free_slots.put(slot)
+            self._responses.put(None)
+            self._reader.join(timeout=5)
+            # Nobody reads the old request queue any more; don't wait on it at exit
+            self._requests.cancel_join_thread()
+            self._release_buffer()
+            self._start()
+    
+    def _release_buffer(self):
+        """Unmap and unlink the current worker's shared buffer"""
+        shm = self._shm
+        del self._buffer
+        self._retired_shm.append(shm)
+        # The dead worker never got to unlink its buffer
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+        # A caller still copying its vectors out keeps a segment mapped; it is
+        # closed on a later restart or on close()
+        for retired in list(self._retired_shm):
+            try:
+                retired.close()
+            except BufferError:
+                continue
+            self._retired_shm.remove(retired)
+    
+    def encode(self, sentences, batch_size: int = 64, convert_to_numpy: bool = True,
+               normalize_embeddings: bool = False, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        
+        chunks = [
+            self._encode_chunk(texts[start:start + self._slot_rows], normalize_embeddings)
+            for start in range(0, len(texts), self._slot_rows)
+        ]
+        embeddings = np.vstack(chunks) if chunks else np.empty((0, self.dim), dtype=np.float32)
+        return embeddings[0] if single else embeddings
+    
+    def close(self):
+        """Stop the worker process and release the shared buffer"""
+        self._requests.put(None)
+        self._process.join(timeout=5)
+        self._responses.put(None)
+        self._reader.join(timeout=5)
+        del self._buffer
+        self._shm.close()
+        for retired in self._retired_shm:
+            retired.close()
+        self._retired_shm = []
+    
+    def _acquire_slot(self) -> int:
+        """Take a free slot, restarting the worker if none frees up within the timeout"""
+        deadline = time.monotonic() + self._timeout
+        while True:
+            try:
+                return self._free_slots.get(timeout=self.LIVENESS_INTERVAL)
+            except queue.Empty:
+                pass
+            # A dead worker's quarantined slots come back on restart
+            self._ensure_running()
+            if time.monotonic() >= deadline:
+                # Alive but not answering: its slots would never come back
+                self._restart(self._process, "Embedding worker stopped responding")
+                deadline = time.monotonic() + self._timeout
+    
+    def _encode_chunk(self, texts: List[str], normalize: bool):
+        self._ensure_running()
+        slot = self._acquire_slot()
+        request_id = next(self._request_ids)
+        future: Future = Future()
+        with self._pending_lock:
+            self._pending[request_id] = future
+            process, buffer = self._process, self._buffer
+        
+        try:
+            self._requests.put((request_id, slot, texts, normalize))
+            deadline = time.monotonic() + self._timeout
+            while True:
+                try:
+                    count = future.result(timeout=min(self.LIVENESS_INTERVAL, max(deadline - time.monotonic(), 0)))
+                    break
+                except FutureTimeout:
+                    if not process.is_alive():
+                        raise RuntimeError("Embedding worker exited")
+                    if time.monotonic() >= deadline:
+                        raise
+            return buffer[slot, :count].copy()
+        except BaseException:
+            with self._pending_lock:
+                self._pending.pop(request_id, None)
+                if not future.done() and process is self._process and process.is_alive():
+                    self._quarantined[request_id] = slot
+                    slot = None
+            raise
+        finally:
+            if slot is not None:
+                self._free_slots.put(slot)
+    
+    def _read_responses(self, responses):
+        while True:
+            message = responses.get()
+            if message is None:
+                break
+            request_id, count, error = message
+            # Resolve under the lock so a caller giving up on this request
+            # sees either a finished future or a quarantined slot, never neither
+            with self._pending_lock:
+                future = self._pending.pop(request_id, None)
+                if future is None:
+                    slot = self._quarantined.pop(request_id, None)
+                    if slot is not None:
+                        self._free_slots.put(slot)
+                elif error:
+                    future.set_exception(RuntimeError(error))
+                else:
+                    future.set_result(count)
+
+
+# Potential class/function names in error messages (CamelCase or snake_case)
+_ERROR_TERM_RE = re.compile(r'\b[A-Z][a-z]+(?:[A-Z][a-z]+)*\b|\b[a-z]+(?:_[a-z]+)*\b')
+_FTS_TOKEN_RE = re.compile(r'\w+')
+_ERROR_STOP_WORDS = frozenset({'the', 'is', 'at', 'which', 'on', 'a', 'an', 'as', 'are', 'was', 'were', 'been', 'be'})
+
+
+class TTLCache:
+    """Small thread-safe LRU cache whose entries expire after `ttl` seconds"""
+    
+    def __init__(self, maxsize: int = 512, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: 'OrderedDict[Any, Tuple[float, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: Any, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+    
+    def set(self, key: Any, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+class SemanticQueryCache:
+    """Results of recent queries, reused for new queries whose embedding is
+    nearly identical (cosine similarity >= `threshold`)"""
+    
+    def __init__(self, maxsize: int = 256, threshold: float = 0.97, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.threshold = threshold
+        self.ttl = ttl
+        self._vectors = None  # (maxsize, dim) ring buffer, allocated on first insert
+        self._entries: List[Optional[Tuple[Any, float, Any]]] = [None] * maxsize
+        self._next_slot = 0
+        self._lock = threading.Lock()
+    
+    def get(self, query_vec, key: Any) -> Any:
+        query_vec = self._normalize(query_vec)
+        if query_vec is None:
+            return None
+        
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != len(query_vec):
+                return None
+            scores = self._vectors @ query_vec
+            now = time.monotonic()
+            for slot in np.argsort(-scores):
+                if scores[slot] < self.threshold:
+                    break
+                entry = self._entries[slot]
+                if entry is not None and entry[0] == key and entry[1] >= now:
+                    return entry[2]
+        return None
+    
+    def set(self, query_vec, key: Any, results: Any):
+        query_vec = self._normalize(query_vec)
+        if query_vec is None:
+            return
+        
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != len(query_vec):
+                self._vectors = np.zeros((self.maxsize, len(query_vec)), dtype=np.float32)
+                self._entries = [None] * self.maxsize
+                self._next_slot = 0
+            # FIFO eviction: overwrite the oldest slot
+            slot = self._next_slot
+            self._next_slot = (slot + 1) % self.maxsize
+            self._vectors[slot] = query_vec
+            self._entries[slot] = (key, time.monotonic() + self.ttl, results)
+    
+    @staticmethod
+    def _normalize(query_vec):
+        norm = np.linalg.norm(query_vec)
+        if norm == 0:
+            return None
+        return (query_vec / norm).astype(np.float32)
+
+
+class CrawlWriter:
+    """Saves a crawl in one transaction, fed one batch of results at a time.
+    
+    `add` encodes a batch and stages it in a spooled temporary file, without
+    touching the database; `commit` then inserts every staged batch in a single
+    write transaction. The write lock is held only for the inserts, never while
+    the caller is still producing batches (e.g. waiting on a slow upload).
+    Nothing is visible to readers until `commit`. Batches must be added one
+    after another, never concurrently.
+    """
+    
+    def __init__(self, service: 'CodingKnowledgeService', conn: sqlite3.Connection,
+                 owns_connection: bool = False):
+        self._service = service
+        self._conn = conn
+        self._owns_connection = owns_connection
+        self._staged = None
+        self._staged_batches = 0
+        self.stats = {
+            'docs_saved': 0,
+            'examples_saved': 0,
+            'api_refs_saved': 0,
+            'concepts_saved': 0
+        }
+        # (table_name, record_id, embedding) for rows that need to join the ANN index
+        self._new_embeddings: List[Tuple[str, int, bytes]] = []
+    
+    def add(self, results: List[Dict[str, Any]]):
+        """Encode a batch of crawl results and stage it for `commit`"""
+        embeddings = list(self._service._crawl_embeddings(results))
+        if self._staged is None:
+            self._staged = tempfile.SpooledTemporaryFile(max_size=CRAWL_STAGING_MEMORY,
+                                                         dir=self._service.knowledge_dir)
+        pickle.dump((results, embeddings), self._staged, protocol=pickle.HIGHEST_PROTOCOL)
+        self._staged_batches += 1
+    
+    def commit(self) -> Dict[str, Any]:
+        """Insert every staged batch in one transaction and make the new rows searchable"""
+        if self._staged_batches:
+            self._staged.seek(0)
+            cursor = self._conn.cursor()
+            try:
+                cursor.execute('BEGIN IMMEDIATE')
+                for _ in range(self._staged_batches):
+                    results, embeddings = pickle.load(self._staged)
+                    self._service._insert_crawl_results(cursor, results, iter(embeddings),
+                                                        self.stats, self._new_embeddings)
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+            finally:
+                cursor.close()
+        self._service._invalidate_caches()
+        self._service._index_new_embeddings(self._new_embeddings)
+        return {
+            'success': True,
+            'stats': self.stats
+        }
+    
+    def close(self):
+        """Discard the staged batches and release the connection"""
+        if self._staged is not None:
+            self._staged.close()
+            self._staged = None
+        if self._owns_connection:
+            self._conn.close()
+
+
+_MISSING = object()
+
+
 class CodingKnowledgeService:
     """Service for managing coding documentation knowledge base"""
     
-    def __init__(self, workspace_path: str):
+    def __init__(self, workspace_path: str, encoder: Optional[Any] = None):
         self.workspace_path = Path(workspace_path)
         self.knowledge_dir = self.workspace_path / ".knowledge"
         self.db_path = self.knowledge_dir / "code_knowledge.db"
@@ -35,12 +646,69 @@ class CodingKnowledgeService:
         # Create knowledge directory if it doesn't exist
         self.knowledge_dir.mkdir(parents=True, exist_ok=True)
         
+        # Embedding backend; an EmbeddingWorker keeps encoding out of this process
+        self._encoder = encoder
+        self._embedding_model = None
+        self._model_lock = threading.Lock()
+        
+        # Per-table (ids, L2-normalized embedding matrix), built lazily on first search
+        self._emb_cache: Dict[str, Tuple[Any, Any]] = {}
+        self._emb_cache_lock = threading.Lock()
+        # Held around every EmbeddingStore load, write and append: the matrix and
+        # ids files only line up row for row if each pair is written as a unit
+        self._emb_store_lock = threading.Lock()
+        
+        # Per-table Faiss indexes keyed by row id, persisted under .knowledge/
+        self._ann_indexes: Dict[str, Any] = {}
+        self._ann_lock = threading.Lock()
+        
+        # One SQLite connection per worker thread, reused across requests
+        self._tls = threading.local()
+        
+        # Result caches for repeated lookups; keys carry the cache version,
+        # which save_crawl_results bumps so writes invalidate implicitly
+        self._cache_version = 0
+        self._cache_version_lock = threading.Lock()
+        self._search_cache = TTLCache(maxsize=512, ttl=60)
+        self._signature_cache = TTLCache(maxsize=512, ttl=60)
+        self._semantic_cache = SemanticQueryCache(maxsize=256, threshold=0.97, ttl=60) \
+            if EMBEDDINGS_AVAILABLE else None
+        
         # Initialize database
         self.init_database()
     
+    @property
+    def embedding_model(self):
+        """Embedding backend, loaded on first use so the server starts instantly"""
+        if self._embedding_model is None:
+            # Concurrent first searches must not each load their own copy
+            with self._model_lock:
+                if self._embedding_model is None:
+                    self._embedding_model = self._encoder or load_embedding_model()
+        return self._embedding_model
+    
+    def _connect(self, check_same_thread: bool = True) -> sqlite3.Connection:
+        """Open a database connection with the service's pragmas"""
+        conn = sqlite3.connect(str(self.db_path), check_same_thread=check_same_thread)
+        # WAL lets searches keep reading while a crawl is being saved
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        conn.execute('PRAGMA mmap_size=268435456')
+        conn.execute('PRAGMA cache_size=-65536')
+        return conn
+    
+    def _get_connection(self) -> sqlite3.Connection:
+        """Return this thread's database connection, opening it on first use"""
+        conn = getattr(self._tls, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            self._tls.conn = conn
+        return conn
+    
     def init_database(self):
         """Initialize the SQLite database with schema for coding knowledge"""
-        conn = sqlite3.connect(str(self.db_path))
+        conn = self._get_connection()
         cursor = conn.cursor()
         
         # Main documentation table
@@ -118,6 +786,7 @@ class CodingKnowledgeService:
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_api_doc_id ON api_references(doc_id)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_concept_category ON coding_concepts(category)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_concept_doc_id ON coding_concepts(doc_id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_doc_language ON code_docs(language, id)')
         
         # Search index for fast retrieval
         cursor.execute('''
@@ -147,139 +816,230 @@ class CodingKnowledgeService:
         ''')
         
         conn.commit()
-        conn.close()
+        
+        if EMBEDDINGS_AVAILABLE:
+            self._migrate_embeddings(cursor)
+        cursor.close()
+    
+    def _migrate_embeddings(self, cursor):
+        """One-time rewrite of legacy float32 embedding BLOBs into the int8 format"""
+        for table_name in EMBEDDING_TABLES:
+            cursor.execute(f'''
+                SELECT id, embeddings FROM {table_name}
+                WHERE embeddings IS NOT NULL AND substr(embeddings, 1, ?) != ?
+            ''', (len(EMBEDDING_INT8_MAGIC), EMBEDDING_INT8_MAGIC))
+            rows = cursor.fetchall()
+            if not rows:
+                continue
+            
+            matrix = decode_embeddings([embedding for _, embedding in rows])
+            cursor.executemany(
+                f'UPDATE {table_name} SET embeddings = ? WHERE id = ?',
+                [(quantize_embedding(vector), row_id) for vector, (row_id, _) in zip(matrix, rows)]
+            )
+            print(f"🗜️  Migrated {len(rows)} {table_name} embeddings to int8")
+        cursor.connection.commit()
     
     def save_crawl_results(self, results: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Save crawl results to the database"""
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
-        
-        stats = {
-            'docs_saved': 0,
-            'examples_saved': 0,
-            'api_refs_saved': 0,
-            'concepts_saved': 0
-        }
-        
+        writer = CrawlWriter(self, self._get_connection())
         try:
-            for result in results:
-                # Save main documentation
-                cursor.execute('''
-                    INSERT OR REPLACE INTO code_docs 
-                    (url, title, language, framework, version, content, structured_data, embeddings, last_updated)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    result.get('url'),
-                    result.get('title'),
-                    result.get('metadata', {}).get('language'),
-                    result.get('metadata', {}).get('framework'),
-                    result.get('metadata', {}).get('version'),
-                    result.get('content'),
-                    json.dumps(result.get('structured_data', {})),
-                    self._generate_embedding(result.get('content', '')),
-                    datetime.now()
-                ))
-                
-                doc_id = cursor.lastrowid
-                stats['docs_saved'] += 1
-                
-                # Save code examples
-                for example in result.get('codeBlocks', []):
-                    cursor.execute('''
-                        INSERT INTO code_examples 
-                        (doc_id, title, description, language, code, imports, explanation, embeddings)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        doc_id,
-                        example.get('title'),
-                        example.get('description'),
-                        example.get('language'),
-                        example.get('code'),
-                        json.dumps(example.get('imports', [])),
-                        example.get('explanation'),
-                        self._generate_embedding(example.get('code', ''))
-                    ))
-                    stats['examples_saved'] += 1
-                    
-                    # Add to search index
-                    self._add_to_search_index(
-                        cursor,
-                        'code_examples',
-                        cursor.lastrowid,
-                        f"{example.get('title', '')} {example.get('code', '')}"
-                    )
-                
-                # Save API references
-                for api_ref in result.get('apiReferences', []):
-                    cursor.execute('''
-                        INSERT INTO api_references 
-                        (doc_id, class_name, method_name, signature, parameters, return_type, description, embeddings)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        doc_id,
-                        api_ref.get('className'),
-                        api_ref.get('methodName'),
-                        api_ref.get('signature'),
-                        json.dumps(api_ref.get('parameters', [])),
-                        api_ref.get('returnType'),
-                        api_ref.get('description'),
-                        self._generate_embedding(api_ref.get('signature', ''))
-                    ))
-                    stats['api_refs_saved'] += 1
-                    
-                    # Add to search index
-                    self._add_to_search_index(
-                        cursor,
-                        'api_references',
-                        cursor.lastrowid,
-                        f"{api_ref.get('methodName', '')} {api_ref.get('signature', '')} {api_ref.get('description', '')}"
-                    )
-            
-            conn.commit()
-            return {
-                'success': True,
-                'stats': stats
-            }
-            
+            writer.add(results)
+            return writer.commit()
         except Exception as e:
-            conn.rollback()
             return {
                 'success': False,
                 'error': str(e)
             }
         finally:
-            conn.close()
+            writer.close()
+    
+    def crawl_writer(self) -> 'CrawlWriter':
+        """Start a crawl save that is fed in batches and committed once.
+        
+        It gets its own connection because successive batches may run on
+        different worker threads.
+        """
+        return CrawlWriter(self, self._connect(check_same_thread=False), owns_connection=True)
+    
+    def _crawl_embeddings(self, results: List[Dict[str, Any]]):
+        """Encode every text of the crawl in one batched pass; _insert_crawl_results
+        consumes the embeddings in the same order they were queued"""
+        texts = []
+        for result in results:
+            texts.append(result.get('content', ''))
+            for example in result.get('codeBlocks', []):
+                texts.append(example.get('code', ''))
+                texts.append(self._example_search_text(example))
+            for api_ref in result.get('apiReferences', []):
+                texts.append(api_ref.get('signature', ''))
+                texts.append(self._api_ref_search_text(api_ref))
+        return iter(self._generate_embeddings(texts))
+    
+    def _insert_crawl_results(self, cursor, results: List[Dict[str, Any]], embeddings,
+                              stats: Dict[str, int], new_embeddings: List[Tuple[str, int, bytes]]):
+        """Insert one batch of crawl results inside the caller's transaction"""
+        # Row ids are assigned here so every table can be written with one
+        # executemany call and still reference each other's rows
+        doc_id = self._next_row_id(cursor, 'code_docs')
+        example_id = self._next_row_id(cursor, 'code_examples')
+        api_ref_id = self._next_row_id(cursor, 'api_references')
+        index_id = self._next_row_id(cursor, 'search_index')
+        
+        doc_rows = []
+        example_rows = []
+        api_ref_rows = []
+        index_rows = []
+        
+        for result in results:
+            doc_rows.append((
+                doc_id,
+                result.get('url'),
+                result.get('title'),
+                result.get('metadata', {}).get('language'),
+                result.get('metadata', {}).get('framework'),
+                result.get('metadata', {}).get('version'),
+                result.get('content'),
+                json_dumps(result.get('structured_data', {})).decode('utf-8'),
+                next(embeddings)
+            ))
+            
+            for example in result.get('codeBlocks', []):
+                embedding = next(embeddings)
+                example_rows.append((
+                    example_id,
+                    doc_id,
+                    example.get('title'),
+                    example.get('description'),
+                    example.get('language'),
+                    example.get('code'),
+                    json_dumps(example.get('imports', [])).decode('utf-8'),
+                    example.get('explanation'),
+                    embedding
+                ))
+                if embedding:
+                    new_embeddings.append(('code_examples', example_id, embedding))
+                index_rows.append((
+                    index_id,
+                    'code_examples',
+                    example_id,
+                    self._example_search_text(example),
+                    next(embeddings)
+                ))
+                example_id += 1
+                index_id += 1
+            
+            for api_ref in result.get('apiReferences', []):
+                embedding = next(embeddings)
+                api_ref_rows.append((
+                    api_ref_id,
+                    doc_id,
+                    api_ref.get('className'),
+                    api_ref.get('methodName'),
+                    api_ref.get('signature'),
+                    json_dumps(api_ref.get('parameters', [])).decode('utf-8'),
+                    api_ref.get('returnType'),
+                    api_ref.get('description'),
+                    embedding
+                ))
+                if embedding:
+                    new_embeddings.append(('api_references', api_ref_id, embedding))
+                index_rows.append((
+                    index_id,
+                    'api_references',
+                    api_ref_id,
+                    self._api_ref_search_text(api_ref),
+                    next(embeddings)
+                ))
+                api_ref_id += 1
+                index_id += 1
+            
+            doc_id += 1
+        
+        # Save main documentation
+        cursor.executemany('''
+            INSERT OR REPLACE INTO code_docs 
+            (id, url, title, language, framework, version, content, structured_data, embeddings)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', doc_rows)
+        
+        # Save code examples
+        cursor.executemany('''
+            INSERT INTO code_examples 
+            (id, doc_id, title, description, language, code, imports, explanation, embeddings)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', example_rows)
+        
+        # Save API references
+        cursor.executemany('''
+            INSERT INTO api_references 
+            (id, doc_id, class_name, method_name, signature, parameters, return_type, description, embeddings)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', api_ref_rows)
+        
+        # Add to search index; FTS rows share the search_index rowid
+        # because search_fts reads its content from that table
+        cursor.executemany('''
+            INSERT INTO search_index (id, table_name, record_id, searchable_text, embeddings)
+            VALUES (?, ?, ?, ?, ?)
+        ''', index_rows)
+        cursor.executemany('''
+            INSERT INTO search_fts (rowid, table_name, record_id, searchable_text)
+            VALUES (?, ?, ?, ?)
+        ''', [row[:4] for row in index_rows])
+        
+        stats['docs_saved'] += len(doc_rows)
+        stats['examples_saved'] += len(example_rows)
+        stats['api_refs_saved'] += len(api_ref_rows)
+    
+    def _invalidate_caches(self):
+        """Bump the cache version; saves run on worker threads, so the
+        read-modify-write must not interleave"""
+        with self._cache_version_lock:
+            self._cache_version += 1
     
     def search_code(self, query: str, search_type: str = 'hybrid', limit: int = 10) -> List[Dict[str, Any]]:
         """Search for code examples and documentation"""
-        conn = sqlite3.connect(str(self.db_path))
+        version = self._cache_version
+        key = (version, query, search_type, limit)
+        results = self._search_cache.get(key)
+        if results is not None:
+            return results
+        
+        # Near-duplicate queries ("KeyError fix" / "how do I fix a KeyError")
+        # share results; the query embedding is reused by the search itself.
+        # Only pure semantic results depend on the embedding alone - hybrid
+        # results carry the query's own keyword hits, so they stay exact-key
+        query_embedding = None
+        semantic_key = (version, limit)
+        if search_type == 'semantic' and self._semantic_cache is not None:
+            query_embedding = self._generate_embedding(query)
+            if query_embedding is not None:
+                results = self._semantic_cache.get(np.frombuffer(query_embedding, dtype=np.float32), semantic_key)
+        
+        if results is None:
+            results = self._search_code_uncached(query, search_type, limit, query_embedding)
+            if query_embedding is not None:
+                self._semantic_cache.set(np.frombuffer(query_embedding, dtype=np.float32), semantic_key, results)
+        
+        self._search_cache.set(key, results)
+        return results
+    
+    def _search_code_uncached(self, query: str, search_type: str, limit: int,
+                              query_embedding: Optional[bytes] = None) -> List[Dict[str, Any]]:
+        conn = self._get_connection()
         cursor = conn.cursor()
         
         results = []
         
         try:
             if search_type in ['keyword', 'hybrid']:
-                # Full-text search
-                cursor.execute('''
-                    SELECT table_name, record_id, searchable_text, metadata
-                    FROM search_fts
-                    WHERE searchable_text MATCH ?
-                    LIMIT ?
-                ''', (query, limit))
-                
-                for row in cursor.fetchall():
-                    table_name, record_id, text, metadata = row
-                    results.append({
-                        'type': table_name,
-                        'id': record_id,
-                        'text': text[:500],  # Truncate for preview
-                        'metadata': json.loads(metadata) if metadata else {},
-                        'score': 1.0  # FTS doesn't provide scores
-                    })
+                results.extend(self._keyword_search(cursor, query, limit))
             
             if search_type in ['semantic', 'hybrid'] and EMBEDDINGS_AVAILABLE:
                 # Semantic search using embeddings
-                query_embedding = self._generate_embedding(query)
+                if query_embedding is None:
+                    query_embedding = self._generate_embedding(query)
                 if query_embedding is not None:
                     # Search in code examples
                     results.extend(self._semantic_search(
@@ -297,26 +1057,104 @@ class CodingKnowledgeService:
                         limit
                     ))
             
-            # Remove duplicates and sort by relevance
-            seen = set()
-            unique_results = []
-            for result in results:
-                key = f"{result['type']}_{result['id']}"
-                if key not in seen:
-                    seen.add(key)
-                    unique_results.append(result)
+            return self._rank_results(results, limit)
             
-            # Sort by score (if available)
-            unique_results.sort(key=lambda x: x.get('score', 0), reverse=True)
+        finally:
+            cursor.close()
+    
+    def search_code_batch(self, queries: List[str], search_type: str = 'hybrid',
+                          limit: int = 10) -> List[List[Dict[str, Any]]]:
+        """Search for several queries at once, sharing one embedding pass and
+        one index search per table across all of them"""
+        keys = [(self._cache_version, query, search_type, limit) for query in queries]
+        results: List[Optional[List[Dict[str, Any]]]] = [self._search_cache.get(key) for key in keys]
+        pending = [i for i, cached in enumerate(results) if cached is None]
+        if not pending:
+            return results
+        
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            found: List[List[Dict[str, Any]]] = [[] for _ in pending]
             
-            return unique_results[:limit]
+            if search_type in ['keyword', 'hybrid']:
+                for slot, i in enumerate(pending):
+                    found[slot].extend(self._keyword_search(cursor, queries[i], limit))
+            
+            if search_type in ['semantic', 'hybrid'] and EMBEDDINGS_AVAILABLE:
+                query_matrix = self._generate_query_embeddings([queries[i] for i in pending])
+                if query_matrix is not None:
+                    for table_name in ('code_examples', 'api_references'):
+                        matches = self._semantic_search_batch(cursor, table_name, query_matrix, limit)
+                        for slot, table_matches in enumerate(matches):
+                            found[slot].extend(table_matches)
+            
+            for slot, i in enumerate(pending):
+                results[i] = self._rank_results(found[slot], limit)
+                self._search_cache.set(keys[i], results[i])
+            
+            return results
             
         finally:
-            conn.close()
+            cursor.close()
+    
+    def _keyword_search(self, cursor, query: str, limit: int) -> List[Dict[str, Any]]:
+        """Full-text search, ranked by bm25 (lower is better)"""
+        fts_query = self._fts_query(query)
+        if not fts_query:
+            return []
+        
+        cursor.execute('''
+            SELECT f.table_name, f.record_id, f.searchable_text, s.metadata, bm25(search_fts) AS rank
+            FROM search_fts f
+            JOIN search_index s ON s.id = f.rowid
+            WHERE search_fts MATCH ?
+            ORDER BY rank
+            LIMIT ?
+        ''', (fts_query, limit))
+        
+        results = []
+        for row in cursor.fetchall():
+            table_name, record_id, text, metadata, rank = row
+            # Map bm25 onto 0-1 so it sorts alongside cosine similarity
+            relevance = max(-rank, 0.0)
+            results.append({
+                'type': table_name,
+                'id': record_id,
+                'text': text[:500],  # Truncate for preview
+                'metadata': json_loads(metadata) if metadata else {},
+                'score': relevance / (1.0 + relevance)
+            })
+        return results
+    
+    @staticmethod
+    def _rank_results(results: List[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+        """Remove duplicates and sort by relevance"""
+        seen: set = set()
+        unique_results = []
+        for result in results:
+            key = (SEARCH_RESULT_TYPE_IDS[result['type']] << 32) | result['id']
+            if key not in seen:
+                seen.add(key)
+                unique_results.append(result)
+        
+        # Sort by score (if available)
+        unique_results.sort(key=lambda x: x.get('score', 0), reverse=True)
+        
+        return unique_results[:limit]
     
     def get_api_signature(self, class_name: Optional[str], method_name: str) -> Optional[Dict[str, Any]]:
         """Get exact API signature and usage"""
-        conn = sqlite3.connect(str(self.db_path))
+        key = (self._cache_version, class_name, method_name)
+        signature = self._signature_cache.get(key, _MISSING)
+        if signature is _MISSING:
+            signature = self._get_api_signature_uncached(class_name, method_name)
+            self._signature_cache.set(key, signature)
+        return signature
+    
+    def _get_api_signature_uncached(self, class_name: Optional[str], method_name: str) -> Optional[Dict[str, Any]]:
+        conn = self._get_connection()
         cursor = conn.cursor()
         
         try:
@@ -338,18 +1176,21 @@ class CodingKnowledgeService:
                 columns = [desc[0] for desc in cursor.description]
                 result = dict(zip(columns, row))
                 
+                # The stored embedding is an internal (quantized) format
+                result.pop('embeddings', None)
+                
                 # Parse JSON fields
                 if result.get('parameters'):
-                    result['parameters'] = json.loads(result['parameters'])
+                    result['parameters'] = json_loads(result['parameters'])
                 if result.get('examples'):
-                    result['examples'] = json.loads(result['examples'])
+                    result['examples'] = json_loads(result['examples'])
                 
                 return result
             
             return None
             
         finally:
-            conn.close()
+            cursor.close()
     
     def search_by_error(self, error_message: str) -> List[Dict[str, Any]]:
         """Find solutions for specific errors"""
@@ -369,47 +1210,46 @@ class CodingKnowledgeService:
     
     def get_language_patterns(self, language: str, pattern_type: str = 'all') -> List[Dict[str, Any]]:
         """Get language-specific patterns and best practices"""
-        conn = sqlite3.connect(str(self.db_path))
+        conn = self._get_connection()
         cursor = conn.cursor()
         
         try:
             if pattern_type == 'all':
                 cursor.execute('''
-                    SELECT * FROM coding_concepts
-                    WHERE category IN ('pattern', 'best_practice', 'idiom')
-                    AND doc_id IN (
-                        SELECT id FROM code_docs WHERE language = ?
-                    )
+                    SELECT c.* FROM coding_concepts c
+                    INNER JOIN code_docs d ON d.id = c.doc_id
+                    WHERE d.language = ?
+                    AND c.category IN ('pattern', 'best_practice', 'idiom')
                 ''', (language,))
             else:
                 cursor.execute('''
-                    SELECT * FROM coding_concepts
-                    WHERE category = ?
-                    AND doc_id IN (
-                        SELECT id FROM code_docs WHERE language = ?
-                    )
-                ''', (pattern_type, language))
+                    SELECT c.* FROM coding_concepts c
+                    INNER JOIN code_docs d ON d.id = c.doc_id
+                    WHERE d.language = ?
+                    AND c.category = ?
+                ''', (language, pattern_type))
             
+            columns = [desc[0] for desc in cursor.description]
             results = []
             for row in cursor.fetchall():
-                columns = [desc[0] for desc in cursor.description]
                 concept = dict(zip(columns, row))
+                concept.pop('embeddings', None)
                 
                 # Parse JSON fields
-                for field in ['best_practices', 'anti_patterns', 'related_concepts']:
+                for field in ('best_practices', 'anti_patterns', 'related_concepts'):
                     if concept.get(field):
-                        concept[field] = json.loads(concept[field])
+                        concept[field] = json_loads(concept[field])
                 
                 results.append(concept)
             
             return results
             
         finally:
-            conn.close()
+            cursor.close()
     
     def get_statistics(self) -> Dict[str, Any]:
         """Get statistics about the knowledge base"""
-        conn = sqlite3.connect(str(self.db_path))
+        conn = self._get_connection()
         cursor = conn.cursor()
         
         try:
@@ -439,13 +1279,17 @@ class CodingKnowledgeService:
             cursor.execute('SELECT DISTINCT framework FROM code_docs WHERE framework IS NOT NULL')
             stats['frameworks'] = [row[0] for row in cursor.fetchall()]
             
-            # Database size
-            stats['db_size_mb'] = os.path.getsize(self.db_path) / (1024 * 1024)
+            # Database size (including pages still in the WAL)
+            db_size = os.path.getsize(self.db_path)
+            wal_path = Path(f"{self.db_path}-wal")
+            if wal_path.exists():
+                db_size += os.path.getsize(wal_path)
+            stats['db_size_mb'] = db_size / (1024 * 1024)
             
             return stats
             
         finally:
-            conn.close()
+            cursor.close()
     
     def _generate_embedding(self, text: str) -> Optional[bytes]:
         """Generate embeddings for text if available"""
@@ -453,68 +1297,285 @@ class CodingKnowledgeService:
             return None
         
         try:
-            embedding = embedding_model.encode(text)
+            embedding = self.embedding_model.encode(text)
             return embedding.tobytes()
         except Exception as e:
             print(f"Error generating embedding: {e}")
             return None
     
-    def _add_to_search_index(self, cursor, table_name: str, record_id: int, text: str):
-        """Add entry to search index"""
-        cursor.execute('''
-            INSERT INTO search_index (table_name, record_id, searchable_text, embeddings)
-            VALUES (?, ?, ?, ?)
-        ''', (table_name, record_id, text, self._generate_embedding(text)))
+    def _generate_query_embeddings(self, texts: List[str]):
+        """Encode several queries in one pass; empty queries get all-zero rows"""
+        positions = [i for i, text in enumerate(texts) if text]
+        if not positions:
+            return None
         
-        # Also add to FTS index
-        cursor.execute('''
-            INSERT INTO search_fts (table_name, record_id, searchable_text)
-            VALUES (?, ?, ?)
-        ''', (table_name, record_id, text))
+        try:
+            vectors = self.embedding_model.encode(
+                [texts[i] for i in positions],
+                batch_size=64,
+                convert_to_numpy=True
+            )
+        except Exception as e:
+            print(f"Error generating embeddings: {e}")
+            return None
+        
+        matrix = np.zeros((len(texts), vectors.shape[1]), dtype=np.float32)
+        matrix[positions] = vectors
+        return matrix
+    
+    def _generate_embeddings(self, texts: List[str]) -> List[Optional[bytes]]:
+        """Generate embeddings for many texts in a single batched forward pass"""
+        embeddings: List[Optional[bytes]] = [None] * len(texts)
+        if not EMBEDDINGS_AVAILABLE:
+            return embeddings
+        
+        positions = [i for i, text in enumerate(texts) if text]
+        if not positions:
+            return embeddings
+        
+        try:
+            vectors = self.embedding_model.encode(
+                [texts[i] for i in positions],
+                batch_size=64,
+                convert_to_numpy=True,
+                normalize_embeddings=True
+            )
+        except Exception as e:
+            print(f"Error generating embeddings: {e}")
+            return embeddings
+        
+        for i, vector in zip(positions, vectors):
+            embeddings[i] = quantize_embedding(vector)
+        return embeddings
+    
+    @staticmethod
+    def _example_search_text(example: Dict[str, Any]) -> str:
+        return f"{example.get('title', '')} {example.get('code', '')}"
+    
+    @staticmethod
+    def _api_ref_search_text(api_ref: Dict[str, Any]) -> str:
+        return f"{api_ref.get('methodName', '')} {api_ref.get('signature', '')} {api_ref.get('description', '')}"
+    
+    def _next_row_id(self, cursor, table_name: str) -> int:
+        """Next AUTOINCREMENT id for a table (call inside the write transaction)"""
+        cursor.execute('SELECT seq FROM sqlite_sequence WHERE name = ?', (table_name,))
+        row = cursor.fetchone()
+        return (row[0] if row else 0) + 1
+    
+    @staticmethod
+    def _fts_query(query: str) -> str:
+        """Quote each word so user input can't be parsed as FTS5 syntax"""
+        return ' '.join(f'"{token}"' for token in _FTS_TOKEN_RE.findall(query))
     
     def _semantic_search(self, cursor, table_name: str, query_embedding: bytes, limit: int) -> List[Dict[str, Any]]:
         """Perform semantic search using embeddings"""
-        results = []
+        query_matrix = np.frombuffer(query_embedding, dtype=np.float32).reshape(1, -1)
+        return self._semantic_search_batch(cursor, table_name, query_matrix, limit)[0]
+    
+    def _semantic_search_batch(self, cursor, table_name: str, query_matrix, limit: int) -> List[List[Dict[str, Any]]]:
+        """Semantic search for every row of `query_matrix` in one index pass"""
+        if limit <= 0:
+            return [[] for _ in range(len(query_matrix))]
+        
+        # All-zero query rows stay zero and fall below the relevance threshold
+        query_matrix = self._normalize_rows(np.asarray(query_matrix, dtype=np.float32))
+        
+        if FAISS_AVAILABLE:
+            matches = self._ann_search(cursor, table_name, query_matrix, limit)
+        else:
+            matches = self._matrix_search(cursor, table_name, query_matrix, limit)
+        
+        return [
+            [
+                {
+                    'type': table_name,
+                    'id': row_id,
+                    'score': score
+                }
+                for row_id, score in query_matches
+                if score > 0.5  # Threshold for relevance
+            ]
+            for query_matches in matches
+        ]
+    
+    def _matrix_search(self, cursor, table_name: str, query_matrix, limit: int) -> List[List[Tuple[int, float]]]:
+        """Brute-force cosine similarity over the cached embedding matrix"""
+        ids, matrix = self._get_embedding_matrix(cursor, table_name)
+        if len(ids) == 0:
+            return [[] for _ in range(len(query_matrix))]
+        
+        # Cosine similarity for every (query, row) pair in one matrix product
+        all_scores = query_matrix @ matrix.T
+        
+        # Select the top results without sorting the whole score vector
+        k = min(limit, matrix.shape[0])
+        matches = []
+        for scores in all_scores:
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            matches.append([(int(ids[i]), float(scores[i])) for i in top])
+        return matches
+    
+    def _ann_search(self, cursor, table_name: str, query_matrix, limit: int) -> List[List[Tuple[int, float]]]:
+        """Approximate nearest-neighbour search through the table's Faiss index"""
+        index = self._get_ann_index(cursor, table_name)
+        if index is None or index.ntotal == 0:
+            return [[] for _ in range(len(query_matrix))]
         
-        # Get all embeddings from the table
+        with self._ann_lock:
+            all_scores, all_labels = index.search(query_matrix, min(limit, index.ntotal))
+        
+        return [
+            [
+                (int(label), float(score))
+                for label, score in zip(labels, scores)
+                if label != -1
+            ]
+            for labels, scores in zip(all_labels, all_scores)
+        ]
+    
+    def _load_embeddings(self, cursor, table_name: str) -> Tuple[Any, Any]:
+        """Read (ids, L2-normalized embedding matrix) for a table from SQLite"""
         cursor.execute(f'''
             SELECT id, embeddings FROM {table_name}
             WHERE embeddings IS NOT NULL
         ''')
+        rows = [row for row in cursor.fetchall() if row[1]]
         
-        query_vec = np.frombuffer(query_embedding, dtype=np.float32)
+        if not rows:
+            return np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32)
         
-        for row_id, embedding_bytes in cursor.fetchall():
-            if embedding_bytes:
-                doc_vec = np.frombuffer(embedding_bytes, dtype=np.float32)
-                
-                # Cosine similarity
-                similarity = np.dot(query_vec, doc_vec) / (np.linalg.norm(query_vec) * np.linalg.norm(doc_vec))
-                
-                if similarity > 0.5:  # Threshold for relevance
-                    results.append({
-                        'type': table_name,
-                        'id': row_id,
-                        'score': float(similarity)
-                    })
+        ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        return ids, self._normalize_rows(decode_embeddings([row[1] for row in rows]))
+    
+    @staticmethod
+    def _normalize_rows(matrix):
+        """L2-normalize each row so inner product equals cosine similarity"""
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (matrix / norms).astype(np.float32)
+    
+    def _get_embedding_matrix(self, cursor, table_name: str) -> Tuple[Any, Any]:
+        """Return (ids, normalized embedding matrix) for a table, loading it once"""
+        with self._emb_cache_lock:
+            cached = self._emb_cache.get(table_name)
+        if cached is not None:
+            return cached
+        
+        cursor.execute(f'SELECT COUNT(*) FROM {table_name} WHERE embeddings IS NOT NULL')
+        row_count = cursor.fetchone()[0]
         
-        # Sort by similarity and return top results
-        results.sort(key=lambda x: x['score'], reverse=True)
-        return results[:limit]
+        # Map the on-disk matrix directly; only fall back to decoding SQLite
+        # BLOBs when the store is missing or has drifted from the table
+        store = EmbeddingStore(self.knowledge_dir, table_name)
+        with self._emb_store_lock:
+            loaded = store.load()
+            if loaded is not None and len(loaded[0]) == row_count:
+                ids, matrix = loaded
+            else:
+                ids, matrix = self._load_embeddings(cursor, table_name)
+                if len(ids):
+                    store.write(ids, matrix)
+        
+        with self._emb_cache_lock:
+            self._emb_cache[table_name] = (ids, matrix)
+        return ids, matrix
     
-    def _extract_error_terms(self, error_message: str) -> List[str]:
-        """Extract meaningful terms from error message"""
-        # Remove common words and extract key terms
-        stop_words = {'the', 'is', 'at', 'which', 'on', 'a', 'an', 'as', 'are', 'was', 'were', 'been', 'be'}
+    def _get_ann_index(self, cursor, table_name: str):
+        """Return the Faiss index for a table, loading it from disk or building it once"""
+        with self._ann_lock:
+            index = self._ann_indexes.get(table_name)
+        if index is not None:
+            return index
         
-        # Extract potential class/function names (CamelCase or snake_case)
-        pattern = r'\b[A-Z][a-z]+(?:[A-Z][a-z]+)*\b|\b[a-z]+(?:_[a-z]+)*\b'
-        terms = re.findall(pattern, error_message)
+        cursor.execute(f'SELECT COUNT(*) FROM {table_name} WHERE embeddings IS NOT NULL')
+        row_count = cursor.fetchone()[0]
         
-        # Filter out stop words and short terms
-        terms = [term for term in terms if term.lower() not in stop_words and len(term) > 2]
+        index_path = self._ann_index_path(table_name)
+        if index_path.exists():
+            try:
+                index = faiss.read_index(str(index_path))
+            except RuntimeError as e:
+                print(f"Error loading ANN index for {table_name}: {e}")
+                index = None
+            # Rebuild if the persisted index has drifted from the table
+            if index is not None and index.ntotal != row_count:
+                index = None
         
-        return terms
+        if index is None:
+            ids, matrix = self._load_embeddings(cursor, table_name)
+            if len(ids) == 0:
+                return None
+            index = self._build_ann_index(ids, matrix)
+            faiss.write_index(index, str(index_path))
+        
+        with self._ann_lock:
+            self._ann_indexes[table_name] = index
+        return index
+    
+    @staticmethod
+    def _build_ann_index(ids, matrix):
+        """Build an inner-product index keyed by row id: int8 scalar-quantized IVF once
+        the table is large enough to train it, exact flat index otherwise"""
+        dim = matrix.shape[1]
+        if len(ids) >= ANN_MIN_TRAIN_SIZE:
+            index = faiss.index_factory(dim, f'IVF{ANN_NLIST},SQ8', faiss.METRIC_INNER_PRODUCT)
+            index.train(matrix)
+            index.nprobe = ANN_NPROBE
+        else:
+            index = faiss.index_factory(dim, 'IDMap2,Flat', faiss.METRIC_INNER_PRODUCT)
+        index.add_with_ids(matrix, ids)
+        return index
+    
+    def _ann_index_path(self, table_name: str) -> Path:
+        return self.knowledge_dir / f"{table_name}.faiss"
+    
+    def _index_new_embeddings(self, new_embeddings: List[Tuple[str, int, bytes]]):
+        """Make freshly saved rows searchable without rescanning the tables"""
+        self._invalidate_embedding_cache()
+        if not new_embeddings:
+            return
+        
+        by_table: Dict[str, List[Tuple[int, bytes]]] = {}
+        for table_name, record_id, embedding in new_embeddings:
+            by_table.setdefault(table_name, []).append((record_id, embedding))
+        
+        if not FAISS_AVAILABLE:
+            for table_name, rows in by_table.items():
+                ids = np.array([record_id for record_id, _ in rows], dtype=np.int64)
+                matrix = self._normalize_rows(decode_embeddings([embedding for _, embedding in rows]))
+                store = EmbeddingStore(self.knowledge_dir, table_name)
+                with self._emb_store_lock:
+                    if not store.exists():
+                        # Not built yet; the next search builds it from the table
+                        continue
+                    store.append(ids, matrix)
+            # A search that ran before the append may have cached a store without these rows
+            self._invalidate_embedding_cache()
+            return
+        
+        with self._ann_lock:
+            for table_name, rows in by_table.items():
+                index = self._ann_indexes.get(table_name)
+                if index is None:
+                    # Not loaded yet; the next search rebuilds it from the table
+                    continue
+                ids = np.array([record_id for record_id, _ in rows], dtype=np.int64)
+                matrix = decode_embeddings([embedding for _, embedding in rows])
+                index.add_with_ids(self._normalize_rows(matrix), ids)
+                faiss.write_index(index, str(self._ann_index_path(table_name)))
+    
+    def _invalidate_embedding_cache(self):
+        """Drop cached embedding matrices after the tables change"""
+        with self._emb_cache_lock:
+            self._emb_cache.clear()
+    
+    def _extract_error_terms(self, error_message: str) -> List[str]:
+        """Extract meaningful terms from error message"""
+        return [
+            term for term in _ERROR_TERM_RE.findall(error_message)
+            if len(term) > 2 and term.lower() not in _ERROR_STOP_WORDS
+        ]
     
     def _is_error_relevant(self, result: Dict[str, Any], error_message: str) -> bool:
         """Check if a search result is relevant to the error"""
@@ -538,4 +1599,4 @@ class CodingKnowledgeService:
         return False
 
 # Export the service class
-__all__ = ['CodingKnowledgeService']
\ No newline at end of file
+__all__ = ['CodingKnowledgeService', 'CrawlWriter', 'TTLCache', 'SemanticQueryCache', 'EmbeddingStore', 'EmbeddingWorker']
\ No newline at end of file
@@ -0,0 +1,7 @@
+"""
+pytest configuration for the Python services
+"""
+
+# test_service.py is an interactive walkthrough run as a script (it needs the
+# spaCy model and prints its results), not a pytest module
+collect_ignore = ["test_service.py"]
@@ -0,0 +1,61 @@
+"""
+Int8 codec shared by every service that stores sentence embeddings
+"""
+
+from typing import Callable, List
+
+import numpy as np
+
+# Quantized embeddings are int8 with a per-vector float32 scale, behind a magic
+# prefix so BLOBs written before quantization can still be told apart
+EMBEDDING_INT8_MAGIC = b'\x00Q8\x00'
+EMBEDDING_INT8_HEADER = len(EMBEDDING_INT8_MAGIC) + 4
+
+
+def is_quantized(blob: bytes) -> bool:
+    return blob[:len(EMBEDDING_INT8_MAGIC)] == EMBEDDING_INT8_MAGIC
+
+
+def quantize_embedding(vector) -> bytes:
+    """Encode a float vector as symmetric int8 with a per-vector scale"""
+    vector = np.asarray(vector, dtype=np.float32)
+    peak = float(np.abs(vector).max()) if vector.size else 0.0
+    scale = peak / 127.0 or 1.0
+    quantized = np.clip(np.rint(vector / scale), -127, 127).astype(np.int8)
+    return EMBEDDING_INT8_MAGIC + np.float32(scale).tobytes() + quantized.tobytes()
+
+
+def decode_float32(blob: bytes) -> np.ndarray:
+    """Legacy BLOB layout: the raw float32 vector"""
+    return np.frombuffer(blob, dtype=np.float32)
+
+
+def decode_embedding(blob: bytes, legacy_decoder: Callable[[bytes], np.ndarray] = decode_float32) -> np.ndarray:
+    """Decode one stored embedding into a float32 vector"""
+    if is_quantized(blob):
+        scale = np.frombuffer(blob, dtype=np.float32, count=1, offset=len(EMBEDDING_INT8_MAGIC))[0]
+        return np.frombuffer(blob, dtype=np.int8, offset=EMBEDDING_INT8_HEADER).astype(np.float32) * scale
+    return np.asarray(legacy_decoder(blob), dtype=np.float32)
+
+
+def decode_embeddings(blobs: List[bytes],
+                      legacy_decoder: Callable[[bytes], np.ndarray] = decode_float32) -> np.ndarray:
+    """Decode stored embeddings (int8 or legacy) into a float32 matrix"""
+    if all(is_quantized(blob) for blob in blobs) and len({len(blob) for blob in blobs}) == 1:
+        # Same-sized int8 rows decode as one matrix instead of row by row
+        raw = np.frombuffer(b''.join(blobs), dtype=np.uint8).reshape(len(blobs), -1)
+        scales = raw[:, len(EMBEDDING_INT8_MAGIC):EMBEDDING_INT8_HEADER].copy().view(np.float32)
+        return raw[:, EMBEDDING_INT8_HEADER:].view(np.int8).astype(np.float32) * scales
+    return np.stack([decode_embedding(blob, legacy_decoder) for blob in blobs])
+
+
+def unit_embedding(blob: bytes) -> np.ndarray:
+    """Decode an embedding as a unit-length float32 vector"""
+    vector = decode_embedding(blob)
+    return vector / (np.linalg.norm(vector) or 1.0)
+
+
+__all__ = [
+    'EMBEDDING_INT8_MAGIC', 'EMBEDDING_INT8_HEADER', 'is_quantized', 'quantize_embedding',
+    'decode_float32', 'decode_embedding', 'decode_embeddings', 'unit_embedding'
+]
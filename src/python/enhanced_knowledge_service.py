@@ -8,15 +8,271 @@ import sqlite3
 import hashlib
 import re
 import os
+import copy
+import functools
+import threading
+import time
 from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
 from pathlib import Path
 import numpy as np
 from sentence_transformers import SentenceTransformer
 import spacy
-from collections import defaultdict
+from collections import Counter, OrderedDict, defaultdict
 import pickle
 
+# Rows without the int8 magic prefix are legacy pickled float32 arrays,
+# migrated on startup
+from embedding_codec import EMBEDDING_INT8_MAGIC, quantize_embedding, decode_embeddings
+
+# Hyperscan matches the organization gazetteer in a single pass over the text
+try:
+    import hyperscan
+    HYPERSCAN_AVAILABLE = True
+except ImportError:
+    HYPERSCAN_AVAILABLE = False
+
+EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2'
+
+# Embedding backends in order of preference: int8 ONNX (VNNI kernels on CPU),
+# OpenVINO, then the plain PyTorch model. The backend= argument needs
+# sentence-transformers 3.2+ with the onnx / openvino extras installed
+EMBEDDER_BACKENDS = [
+    {'backend': 'onnx', 'model_kwargs': {'file_name': 'onnx/model_qint8_avx512_vnni.onnx'}},
+    {'backend': 'openvino'},
+    {},
+]
+
+# hnswlib provides approximate nearest-neighbour search for large corpora
+try:
+    import hnswlib
+    HNSWLIB_AVAILABLE = True
+except ImportError:
+    HNSWLIB_AVAILABLE = False
+
+# Numba compiles the content-overlap scan used when appending to documents
+try:
+    import numba
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# HNSW index settings; smaller corpora are scanned exactly with one matmul
+ANN_MIN_DOCUMENTS = 5000
+ANN_INITIAL_CAPACITY = 100_000
+ANN_EF_CONSTRUCTION = 200
+ANN_M = 16
+ANN_EF_SEARCH = 64
+
+# spaCy components needed when only entities (not relationships) are wanted
+NER_PIPES = ('tok2vec', 'ner')
+
+# Bulk saves with at least this many texts run spaCy in several processes
+NLP_PARALLEL_MIN_TEXTS = 64
+
+# Repeated searches and entity extractions are answered from an in-memory LRU
+RESULT_CACHE_SIZE = 256
+RESULT_CACHE_TTL = 300.0  # seconds
+
+# Rows kept in the persistent embedding cache; the oldest entries are evicted first
+EMBEDDING_CACHE_SIZE = 50_000
+
+# Dependency labels linking a verb to its subject and object
+SUBJECT_DEPS = ('nsubj', 'nsubjpass')
+OBJECT_DEPS = ('dobj', 'obj', 'pobj')
+
+# Fallback entity patterns
+_PERSON_PATTERNS = [
+    re.compile(r'\b([A-Z][a-z]+ [A-Z][a-z]+)\b'),
+    re.compile(r'\b(Dr\.|Prof\.|Mr\.|Mrs\.|Ms\.) ([A-Z][a-z]+ [A-Z][a-z]+)\b')
+]
+_ORG_SUFFIX_PATTERN = re.compile(r'\b([A-Z][a-z]+ (?:Inc|Corp|LLC|Ltd|Company|Corporation))\b', re.IGNORECASE)
+_KNOWN_ORGANIZATIONS = ('Apple', 'Google', 'Microsoft', 'Amazon', 'Facebook', 'Meta', 'OpenAI', 'Anthropic')
+_KNOWN_ORG_PATTERN = re.compile(r'\b(' + '|'.join(_KNOWN_ORGANIZATIONS) + r')\b', re.IGNORECASE)
+
+# Words of a keyword query, quoted into an FTS5 phrase
+_FTS_TOKEN_RE = re.compile(r'\w+')
+
+# Markdown filename sanitizing
+_SAFE_TITLE_NON_WORD = re.compile(r'[^\w\s-]')
+_SAFE_TITLE_DASH = re.compile(r'[-\s]+')
+
+def suffix_prefix_overlap(text, pattern) -> int:
+    """Length of the longest prefix of `pattern` that is a suffix of `text` (KMP)"""
+    m = len(pattern)
+    if m == 0:
+        return 0
+        
+    # Failure function: longest proper border of each prefix of the pattern
+    failure = np.zeros(m, dtype=np.int64)
+    k = 0
+    for i in range(1, m):
+        while k > 0 and pattern[i] != pattern[k]:
+            k = failure[k - 1]
+        if pattern[i] == pattern[k]:
+            k += 1
+        failure[i] = k
+        
+    # Run the matcher over the text; the final state is the overlap length
+    k = 0
+    for i in range(len(text)):
+        while k > 0 and (k == m or text[i] != pattern[k]):
+            k = failure[k - 1]
+        if text[i] == pattern[k]:
+            k += 1
+    return int(k)
+
+
+if NUMBA_AVAILABLE:
+    _suffix_prefix_overlap_jit = numba.njit(cache=True)(suffix_prefix_overlap)
+
+
+@functools.lru_cache(maxsize=8192)
+def _entity_id(name: str, entity_type: str) -> str:
+    normalized = name.lower().replace(' ', '_')
+    return f"{entity_type}_{hashlib.md5(normalized.encode()).hexdigest()[:8]}"
+
+
+@functools.lru_cache(maxsize=8192)
+def _canonical_name(name: str) -> str:
+    return ' '.join(name.split()).title()
+
+
+def _code_points(text: str) -> np.ndarray:
+    """View a string as an array of Unicode code points"""
+    return np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+
+
+class DocumentEmbeddingStore:
+    """Memory-mapped float16 matrix of L2-normalized document embeddings that
+    grows by doubling, with a parallel file of document ids (row i belongs to
+    line i). SQLite keeps the durable copy in documents.embedding; the version
+    file records the documents_version the rows were last brought up to.
+    """
+    
+    INITIAL_CAPACITY = 1024
+    
+    def __init__(self, directory: Path):
+        self.matrix_path = directory / "embeddings.npy"
+        self.ids_path = directory / "embeddings.ids"
+        self.version_path = directory / "embeddings.version"
+        self.matrix = None
+        self.version: Optional[int] = None
+    
+    def load(self) -> Optional[List[str]]:
+        """Map the matrix from disk and return its document ids, or None if missing or inconsistent"""
+        if not self.matrix_path.exists() or not self.ids_path.exists():
+            return None
+        try:
+            matrix = np.lib.format.open_memmap(str(self.matrix_path), mode='r+')
+        except (ValueError, OSError):
+            return None
+            
+        ids = self.ids_path.read_text().splitlines()
+        if matrix.dtype != np.float16 or matrix.ndim != 2 or len(ids) > matrix.shape[0]:
+            return None
+            
+        try:
+            self.version = int(self.version_path.read_text())
+        except (ValueError, OSError):
+            self.version = None
+        self.matrix = matrix
+        return ids
+    
+    def write(self, ids: List[str], matrix: np.ndarray, version: Optional[int] = None):
+        """Replace the store with the given rows"""
+        # Marked stale first, so a crash part-way through is never mistaken for current rows
+        self.set_version(None)
+        capacity = max(self.INITIAL_CAPACITY, len(ids))
+        self.matrix = np.lib.format.open_memmap(
+            str(self.matrix_path), mode='w+', dtype=np.float16, shape=(capacity, matrix.shape[1])
+        )
+        self.matrix[:len(ids)] = matrix
+        self.matrix.flush()
+        self.ids_path.write_text(''.join(f'{doc_id}\n' for doc_id in ids))
+        self.set_version(version)
+    
+    def set_version(self, version: Optional[int]):
+        """Record the documents_version the rows are current for (None: unknown)"""
+        self.version = version
+        self.version_path.write_text('' if version is None else str(version))
+    
+    def set_row(self, row: int, vector: np.ndarray, doc_id: str = None):
+        """Write one row; a new document's id is appended to the ids file"""
+        if self.matrix is None:
+            self.write([], np.empty((0, len(vector)), dtype=np.float16))
+        if row >= self.matrix.shape[0]:
+            self._grow(row + 1)
+            
+        self.matrix[row] = vector
+        if doc_id is not None:
+            # The ids file is written last, so a row only counts once its id is recorded
+            with open(self.ids_path, 'a') as f:
+                f.write(f'{doc_id}\n')
+    
+    def _grow(self, min_rows: int):
+        capacity, dim = self.matrix.shape
+        tmp_path = self.matrix_path.with_suffix('.tmp.npy')
+        grown = np.lib.format.open_memmap(
+            str(tmp_path), mode='w+', dtype=np.float16, shape=(max(2 * capacity, min_rows), dim)
+        )
+        grown[:capacity] = self.matrix
+        grown.flush()
+        del grown
+        self.matrix = None
+        os.replace(tmp_path, self.matrix_path)
+        self.matrix = np.lib.format.open_memmap(str(self.matrix_path), mode='r+')
+
+
+class ResultCache:
+    """Thread-safe LRU cache with a time-to-live, keyed by a hash of the
+    whitespace-normalized request. clear() bumps a generation counter so results
+    computed before an invalidation are not stored after it.
+    """
+    
+    def __init__(self, maxsize: int = RESULT_CACHE_SIZE, ttl: float = RESULT_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.generation = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def key(*parts) -> bytes:
+        normalized = '\x1f'.join(' '.join(str(part).split()) for part in parts)
+        return hashlib.blake2b(normalized.encode('utf-8'), digest_size=16).digest()
+    
+    def get(self, key: bytes):
+        """Return a copy of the cached value, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        # Callers may mutate what they get back
+        return copy.deepcopy(value)
+    
+    def put(self, key: bytes, value, generation: int):
+        """Store a copy of value unless the cache was cleared since generation was read"""
+        value = copy.deepcopy(value)
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+
 class EnhancedKnowledgeService:
     """Full-featured knowledge management with persistence and intelligence"""
     
@@ -27,29 +283,111 @@ class EnhancedKnowledgeService:
         
         # Initialize database
         self.db_path = self.knowledge_dir / "knowledge.db"
+        self.conn = self.connect()
+        # The connection and in-memory matrix are shared by concurrent requests;
+        # transactions (and the lazy matrix load) run one at a time
+        self.write_lock = threading.Lock()
         self.init_database()
         
         # Initialize NLP models
         try:
-            self.nlp = spacy.load("en_core_web_sm")
+            # Text categories are never used; lemmas name relationship types
+            self.nlp = spacy.load("en_core_web_sm", disable=["textcat"])
+            self.non_ner_pipes = [name for name in self.nlp.pipe_names if name not in NER_PIPES]
         except:
             # Fallback to simple extraction if spacy not available
             self.nlp = None
             
         # Initialize embedding model
-        try:
-            self.embedder = SentenceTransformer('all-MiniLM-L6-v2')
-        except:
-            self.embedder = None
+        self.embedder = self.load_embedder()
+            
+        # Organization gazetteer matcher (None when Hyperscan is unavailable)
+        self.org_matcher = self.build_org_matcher()
             
         # In-memory caches
         self.entity_cache = {}
         self.relationship_cache = defaultdict(list)
+        # Search results depend on stored documents and are cleared on every save;
+        # extraction depends only on the text
+        self.search_cache = ResultCache()
+        self.extraction_cache = ResultCache()
+        
+        # Document embeddings for semantic search (L2-normalized rows), loaded lazily
+        # from the memory-mapped store; _doc_matrix is a view of the first rows of _doc_buffer
+        self.embedding_store = DocumentEmbeddingStore(self.knowledge_dir)
+        self._doc_buffer: Optional[np.ndarray] = None
+        self._doc_matrix: Optional[np.ndarray] = None
+        self._doc_ids: List[str] = []
+        self._doc_rows: Dict[str, int] = {}
+        # documents_version the loaded rows reflect
+        self._doc_version: Optional[int] = None
+        
+        # HNSW index over the same rows (labels are row numbers), built once the corpus is large
+        self._ann = None
+        self._ann_dirty = False
+        self.ann_index_path = self.knowledge_dir / "documents.hnsw"
+        self.ann_ids_path = self.knowledge_dir / "documents.hnsw.ids.json"
+        
+    def load_embedder(self) -> Optional[SentenceTransformer]:
+        """Load the embedding model with the fastest backend that is available"""
+        for backend_kwargs in EMBEDDER_BACKENDS:
+            backend = backend_kwargs.get('backend', 'torch')
+            try:
+                embedder = SentenceTransformer(EMBEDDING_MODEL_NAME, **backend_kwargs)
+            except Exception as e:
+                # Backend extras not installed, or a sentence-transformers older than 3.2
+                print(f"⚠️  {backend} embedding backend unavailable ({e})")
+                continue
+            print(f"🧮 Embedding model loaded with the {backend} backend")
+            return embedder
+        return None
+        
+    def build_org_matcher(self):
+        """Compile the known-organization gazetteer into a Hyperscan database"""
+        if not HYPERSCAN_AVAILABLE:
+            return None
+            
+        try:
+            flags = (hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SOM_LEFTMOST |
+                     hyperscan.HS_FLAG_UTF8 | hyperscan.HS_FLAG_UCP)
+            database = hyperscan.Database()
+            database.compile(
+                expressions=[rf'\b{name}\b'.encode() for name in _KNOWN_ORGANIZATIONS],
+                ids=list(range(len(_KNOWN_ORGANIZATIONS))),
+                flags=[flags] * len(_KNOWN_ORGANIZATIONS)
+            )
+            return database
+        except Exception as e:
+            print(f"⚠️  Hyperscan gazetteer unavailable ({e}); using regex matching")
+            return None
+        
+    def connect(self) -> sqlite3.Connection:
+        """Open the service's database connection, tuned for repeated searches"""
+        # Autocommit mode: write paths use explicit BEGIN/COMMIT
+        conn = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+        conn.executescript('''
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            PRAGMA temp_store = MEMORY;
+            PRAGMA cache_size = -65536;
+            PRAGMA mmap_size = 268435456;
+        ''')
+        # INSERT OR REPLACE must fire the delete trigger that keeps documents_fts in sync
+        conn.execute('PRAGMA recursive_triggers = ON')
+        return conn
+    
+    def close(self):
+        """Persist the ANN index and close the database connection"""
+        if self._ann is not None and self._ann_dirty:
+            self._ann.save_index(str(self.ann_index_path))
+            self.ann_ids_path.write_text(json.dumps({'version': self._doc_version, 'ids': self._doc_ids}))
+            self._ann_dirty = False
+        self.conn.close()
         
     def init_database(self):
         """Initialize SQLite database for persistent storage"""
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
+        cursor = self.conn.cursor()
+        cursor.execute('BEGIN')
         
         # Entities table
         cursor.execute('''
@@ -99,41 +437,167 @@ class EnhancedKnowledgeService:
             )
         ''')
         
+        # Which entities each document mentions, and how often
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'entity_mentions'")
+        mentions_exist = cursor.fetchone() is not None
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS entity_mentions (
+                entity_id TEXT NOT NULL,
+                doc_id TEXT NOT NULL,
+                mentions INTEGER DEFAULT 1,
+                PRIMARY KEY (entity_id, doc_id)
+            )
+        ''')
+        
+        if not mentions_exist:
+            # Backfill from the entity lists stored on existing documents
+            cursor.execute('''
+                INSERT INTO entity_mentions (entity_id, doc_id, mentions)
+                SELECT json_extract(je.value, '$.id'), d.id, COUNT(*)
+                FROM documents d, json_each(d.entities) je
+                WHERE json_extract(je.value, '$.id') IS NOT NULL
+                GROUP BY 1, 2
+            ''')
+        
+        # Embeddings of previously seen texts, keyed by a hash of the text
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS embedding_cache (
+                hash BLOB PRIMARY KEY,
+                embedding BLOB NOT NULL
+            )
+        ''')
+        
+        # Full-text index over documents, kept in sync by triggers
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'documents_fts'")
+        fts_exists = cursor.fetchone() is not None
+        
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+                title, content,
+                content='documents', content_rowid='rowid',
+                tokenize='porter unicode61'
+            )
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS documents_fts_insert AFTER INSERT ON documents BEGIN
+                INSERT INTO documents_fts(rowid, title, content) VALUES (new.rowid, new.title, new.content);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS documents_fts_delete AFTER DELETE ON documents BEGIN
+                INSERT INTO documents_fts(documents_fts, rowid, title, content)
+                VALUES ('delete', old.rowid, old.title, old.content);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS documents_fts_update AFTER UPDATE ON documents BEGIN
+                INSERT INTO documents_fts(documents_fts, rowid, title, content)
+                VALUES ('delete', old.rowid, old.title, old.content);
+                INSERT INTO documents_fts(rowid, title, content) VALUES (new.rowid, new.title, new.content);
+            END
+        ''')
+        
+        if not fts_exists:
+            # Index documents saved before the full-text table existed
+            cursor.execute("INSERT INTO documents_fts(documents_fts) VALUES ('rebuild')")
+            
+        # Counts changes to document embeddings, whichever process makes them; the
+        # embedding store and ANN index are only reused at the version they were built for
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS documents_version (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                version INTEGER NOT NULL
+            )
+        ''')
+        cursor.execute('INSERT OR IGNORE INTO documents_version (id, version) VALUES (0, 0)')
+        for name, event in (('insert', 'INSERT'), ('delete', 'DELETE'), ('update', 'UPDATE OF embedding')):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS documents_version_{name} AFTER {event} ON documents BEGIN
+                    UPDATE documents_version SET version = version + 1;
+                END
+            ''')
+        
         # Create indexes for faster queries
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_entities_type ON entities(type)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_entities_name ON entities(name)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_documents_title ON documents(title)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_entities_canonical ON entities(canonical_name)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_entity_mentions_doc ON entity_mentions(doc_id)')
+        
+        self.migrate_embeddings(cursor)
         
-        conn.commit()
-        conn.close()
+        cursor.execute('COMMIT')
+        cursor.close()
         
-    def extract_entities(self, text: str, source: str = None) -> List[Dict]:
+    def migrate_embeddings(self, cursor):
+        """One-time rewrite of legacy pickled embeddings into the packed int8 format,
+        so pickle is never touched on the read path again"""
+        for table_name in ('documents', 'entities'):
+            cursor.execute(f'''
+                SELECT id, embedding FROM {table_name}
+                WHERE embedding IS NOT NULL AND substr(embedding, 1, ?) != ?
+            ''', (len(EMBEDDING_INT8_MAGIC), EMBEDDING_INT8_MAGIC))
+            rows = cursor.fetchall()
+            if not rows:
+                continue
+                
+            matrix = decode_embeddings([blob for _, blob in rows], legacy_decoder=pickle.loads)
+            cursor.executemany(
+                f'UPDATE {table_name} SET embedding = ? WHERE id = ?',
+                [(quantize_embedding(vector), row_id) for vector, (row_id, _) in zip(matrix, rows)]
+            )
+            print(f"🗜️  Migrated {len(rows)} {table_name} embeddings to int8")
+        
+    def extract_entities(self, text: str, source: str = None, relationships: bool = True) -> List[Dict]:
         """Extract entities using NLP or pattern matching"""
+        cache_key = ResultCache.key(text, source, relationships)
+        cached = self.extraction_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        generation = self.extraction_cache.generation
+        
         entities = []
         
         if self.nlp:
             # Use spaCy for advanced entity extraction
-            doc = self.nlp(text)
+            if relationships:
+                doc = self.nlp(text)
+            else:
+                # Entity-only lookups (e.g. search queries) skip the tagger and parser.
+                # Disabled per call: select_pipes would change the pipeline for
+                # requests running concurrently on other threads
+                doc = self.nlp(text, disable=self.non_ner_pipes)
             
-            for ent in doc.ents:
-                entity_id = self.generate_entity_id(ent.text, ent.label_)
-                entity = {
-                    'id': entity_id,
-                    'type': ent.label_.lower(),
-                    'name': ent.text,
-                    'canonical_name': self.canonicalize_name(ent.text),
-                    'confidence': 0.9,
-                    'source': source,
-                    'context': text[max(0, ent.start_char-50):min(len(text), ent.end_char+50)]
-                }
-                entities.append(entity)
+            entities = self.entities_from_doc(doc, text, source)
                 
             # Extract relationships between entities
-            self.extract_relationships(doc, entities)
+            if relationships:
+                self.extract_relationships(doc, entities)
         else:
             # Fallback to pattern-based extraction
             entities = self.pattern_based_extraction(text, source)
             
+        self.extraction_cache.put(cache_key, entities, generation)
+        return entities
+    
+    def entities_from_doc(self, doc, text: str, source: str = None) -> List[Dict]:
+        """Build entity records from a processed spaCy doc"""
+        entities = []
+        
+        for ent in doc.ents:
+            entity_id = self.generate_entity_id(ent.text, ent.label_)
+            entity = {
+                'id': entity_id,
+                'type': ent.label_.lower(),
+                'name': ent.text,
+                'canonical_name': self.canonicalize_name(ent.text),
+                'confidence': 0.9,
+                'source': source,
+                'context': text[max(0, ent.start_char-50):min(len(text), ent.end_char+50)]
+            }
+            entities.append(entity)
+            
         return entities
     
     def pattern_based_extraction(self, text: str, source: str = None) -> List[Dict]:
@@ -141,13 +605,8 @@ class EnhancedKnowledgeService:
         entities = []
         
         # Person patterns
-        person_patterns = [
-            r'\b([A-Z][a-z]+ [A-Z][a-z]+)\b',
-            r'\b(Dr\.|Prof\.|Mr\.|Mrs\.|Ms\.) ([A-Z][a-z]+ [A-Z][a-z]+)\b'
-        ]
-        
-        for pattern in person_patterns:
-            matches = re.findall(pattern, text)
+        for pattern in _PERSON_PATTERNS:
+            matches = pattern.findall(text)
             for match in matches:
                 name = match if isinstance(match, str) else ' '.join(match)
                 entity_id = self.generate_entity_id(name, 'person')
@@ -161,54 +620,78 @@ class EnhancedKnowledgeService:
                 })
         
         # Organization patterns
-        org_patterns = [
-            r'\b([A-Z][a-z]+ (?:Inc|Corp|LLC|Ltd|Company|Corporation))\b',
-            r'\b(Apple|Google|Microsoft|Amazon|Facebook|Meta|OpenAI|Anthropic)\b'
-        ]
-        
-        for pattern in org_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            for match in matches:
-                entity_id = self.generate_entity_id(match, 'organization')
-                entities.append({
-                    'id': entity_id,
-                    'type': 'organization', 
-                    'name': match,
-                    'canonical_name': self.canonicalize_name(match),
-                    'confidence': 0.8,
-                    'source': source
-                })
-                
+        matches = _ORG_SUFFIX_PATTERN.findall(text)
+        if self.org_matcher is not None:
+            matches += self.scan_known_organizations(text)
+        else:
+            matches += _KNOWN_ORG_PATTERN.findall(text)
+            
+        for match in matches:
+            entity_id = self.generate_entity_id(match, 'organization')
+            entities.append({
+                'id': entity_id,
+                'type': 'organization', 
+                'name': match,
+                'canonical_name': self.canonicalize_name(match),
+                'confidence': 0.8,
+                'source': source
+            })
+            
         return entities
     
+    def scan_known_organizations(self, text: str) -> List[str]:
+        """Find gazetteer organizations with the Hyperscan database, in text order"""
+        data = text.encode('utf-8')
+        spans = []
+        
+        def on_match(pattern_id, start, end, flags, context):
+            spans.append((start, end))
+            
+        self.org_matcher.scan(data, match_event_handler=on_match)
+        return [data[start:end].decode('utf-8') for start, end in sorted(spans)]
+    
     def extract_relationships(self, doc, entities):
-        """Extract relationships between entities"""
+        """Extract subject-verb-object relationships between entities"""
         if not self.nlp:
             return []
             
         relationships = []
         entity_map = {e['name']: e for e in entities}
         
-        # Look for relationships in dependency parse
-        for token in doc:
-            if token.dep_ in ['nsubj', 'dobj', 'pobj']:
-                # Check if this token is part of an entity
-                for ent in doc.ents:
-                    if token.i >= ent.start and token.i < ent.end:
-                        # Look for related entities
-                        for other_ent in doc.ents:
-                            if other_ent != ent:
-                                # Check if they're connected through the verb
-                                if token.head.pos_ == 'VERB':
-                                    rel = {
-                                        'source': entity_map.get(ent.text),
-                                        'target': entity_map.get(other_ent.text),
-                                        'type': token.head.lemma_,
-                                        'confidence': 0.7
-                                    }
-                                    if rel['source'] and rel['target']:
-                                        relationships.append(rel)
-                                        
+        # Map every token to the entity span containing it
+        token_to_ent = [None] * len(doc)
+        for ent in doc.ents:
+            for i in range(ent.start, ent.end):
+                token_to_ent[i] = ent
+                
+        # Look for relationships in dependency parse: entity subject -> verb -> entity object
+        for verb in doc:
+            if verb.pos_ != 'VERB':
+                continue
+                
+            subject = next((token_to_ent[child.i] for child in verb.children
+                            if child.dep_ in SUBJECT_DEPS and token_to_ent[child.i] is not None), None)
+            if subject is None:
+                continue
+                
+            # Direct objects, plus objects of the verb's prepositions ("met with X")
+            candidates = [child for child in verb.children if child.dep_ in OBJECT_DEPS]
+            candidates += [grandchild for child in verb.children if child.dep_ == 'prep'
+                           for grandchild in child.children if grandchild.dep_ == 'pobj']
+            obj = next((token_to_ent[token.i] for token in candidates
+                        if token_to_ent[token.i] is not None and token_to_ent[token.i] != subject), None)
+            if obj is None:
+                continue
+                
+            rel = {
+                'source': entity_map.get(subject.text),
+                'target': entity_map.get(obj.text),
+                'type': verb.lemma_ or verb.lower_,  # lemma_ is empty without a lemmatizer
+                'confidence': 0.7
+            }
+            if rel['source'] and rel['target']:
+                relationships.append(rel)
+                
         return relationships
     
     def save_to_knowledge(self, content: str, title: str = None, 
@@ -223,105 +706,292 @@ class EnhancedKnowledgeService:
         # Extract entities from content
         entities = self.extract_entities(content, source=title)
         
-        # Generate embedding for semantic search
+        # Generate embeddings for the document and its entities in one batch
         embedding = None
+        entity_embeddings = [None] * len(entities)
         if self.embedder:
-            embedding = self.embedder.encode(content[:1000])  # Use first 1000 chars
+            texts = [content[:1000]] + [entity['name'] for entity in entities]  # Use first 1000 chars
+            embeddings = self.encode_cached(texts)
+            embedding = embeddings[0]
+            entity_embeddings = embeddings[1:]
             
         # Handle different save modes
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
-        
-        try:
-            if mode == 'append':
-                # Check if document exists
-                cursor.execute('SELECT content, entities FROM documents WHERE id = ?', (doc_id,))
-                existing = cursor.fetchone()
+        with self.write_lock:
+            cursor = self.conn.cursor()
+            
+            try:
+                # Immediate, so no other process can write between the version reads
+                cursor.execute('BEGIN IMMEDIATE')
+                version_before = self.documents_version(cursor)
                 
-                if existing:
-                    # Append to existing content
-                    existing_content = existing[0]
-                    existing_entities = json.loads(existing[1] or '[]')
+                if mode == 'append':
+                    # Check if document exists; only the tail of the existing content is
+                    # needed to merge, so the full text never leaves SQLite
+                    cursor.execute(
+                        'SELECT instr(content, ?) > 0, substr(content, ?), entities FROM documents WHERE id = ?',
+                        (content, -len(content), doc_id)
+                    )
+                    existing = cursor.fetchone()
                     
-                    # Merge content intelligently (avoid duplication)
-                    merged_content = self.merge_content(existing_content, content)
-                    
-                    # Merge entities
-                    all_entities = existing_entities + entities
-                    unique_entities = self.deduplicate_entities(all_entities)
-                    
-                    # Update document
+                    if existing:
+                        # Append to existing content
+                        already_present, existing_tail, existing_entities = existing
+                        existing_entities = json.loads(existing_entities or '[]')
+                        
+                        # Merge content intelligently (avoid duplication)
+                        suffix = '' if already_present else self.merge_suffix(existing_tail, content)
+                        
+                        # Merge entities
+                        all_entities = existing_entities + entities
+                        unique_entities = self.deduplicate_entities(all_entities)
+                        
+                        # Update document
+                        cursor.execute('''
+                            UPDATE documents 
+                            SET content = content || ?, entities = ?, updated_at = CURRENT_TIMESTAMP
+                            WHERE id = ?
+                        ''', (suffix, json.dumps(unique_entities), doc_id))
+                        self.save_entity_mentions(cursor, doc_id, unique_entities)
+                    else:
+                        mode = 'new'  # Fall through to new creation
+                        
+                if mode in ['new', 'update']:
+                    # Save or update document
                     cursor.execute('''
-                        UPDATE documents 
-                        SET content = ?, entities = ?, updated_at = CURRENT_TIMESTAMP
-                        WHERE id = ?
-                    ''', (merged_content, json.dumps(unique_entities), doc_id))
-                else:
-                    mode = 'new'  # Fall through to new creation
+                        INSERT OR REPLACE INTO documents 
+                        (id, title, content, entities, embedding, metadata)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    ''', (
+                        doc_id,
+                        title or "Untitled",
+                        content,
+                        json.dumps(entities),
+                        quantize_embedding(embedding) if embedding is not None else None,
+                        json.dumps(metadata or {})
+                    ))
+                    self.save_entity_mentions(cursor, doc_id, entities)
                     
-            if mode in ['new', 'update']:
-                # Save or update document
-                cursor.execute('''
+                # Save entities to entities table
+                self.save_entities(cursor, entities, entity_embeddings)
+                
+                version_after = self.documents_version(cursor)
+                cursor.execute('COMMIT')
+                self.search_cache.clear()
+                
+                if mode in ['new', 'update'] and embedding is not None:
+                    self.update_doc_matrix(doc_id, embedding)
+                self.sync_doc_version(version_before, version_after)
+                
+                # Also save as markdown file
+                self.save_as_markdown(content, title, entities, metadata)
+                
+                return {
+                    'success': True,
+                    'document_id': doc_id,
+                    'entities_extracted': len(entities),
+                    'mode': mode
+                }
+                
+            except Exception as e:
+                if self.conn.in_transaction:
+                    cursor.execute('ROLLBACK')
+                return {'success': False, 'error': str(e)}
+            finally:
+                cursor.close()
+            
+    def save_many(self, documents: List[Dict], mode: str = 'new') -> Dict:
+        """
+        Bulk save: NER runs through nlp.pipe across processes, all embeddings are
+        encoded in one batch and every row is written in a single transaction.
+        Each document is a dict with 'content' and optional 'title' and 'metadata'.
+        """
+        if mode == 'append':
+            # Appends merge with stored content one document at a time
+            results = [self.save_to_knowledge(doc['content'], doc.get('title'), doc.get('metadata'), mode)
+                       for doc in documents]
+            return {
+                'success': all(result['success'] for result in results),
+                'document_ids': [result.get('document_id') for result in results],
+                'entities_extracted': sum(result.get('entities_extracted', 0) for result in results),
+                'mode': mode
+            }
+            
+        contents = [doc['content'] for doc in documents]
+        titles = [doc.get('title') for doc in documents]
+        doc_ids = [self.generate_document_id(title or "untitled") for title in titles]
+        
+        # Extract entities for all documents
+        all_entities = self.extract_entities_many(contents, titles)
+        
+        # Generate embeddings for every document and entity in one batch
+        embeddings = [None] * len(documents)
+        entity_embeddings = [[None] * len(entities) for entities in all_entities]
+        if self.embedder:
+            texts = []
+            for content, entities in zip(contents, all_entities):
+                texts.append(content[:1000])  # Use first 1000 chars
+                texts.extend(entity['name'] for entity in entities)
+            vectors = self.encode_cached(texts) if texts else []
+            
+            offset = 0
+            for i, entities in enumerate(all_entities):
+                embeddings[i] = vectors[offset]
+                entity_embeddings[i] = vectors[offset + 1:offset + 1 + len(entities)]
+                offset += 1 + len(entities)
+                
+        with self.write_lock:
+            cursor = self.conn.cursor()
+            
+            try:
+                cursor.execute('BEGIN IMMEDIATE')
+                version_before = self.documents_version(cursor)
+                
+                cursor.executemany('''
                     INSERT OR REPLACE INTO documents 
                     (id, title, content, entities, embedding, metadata)
                     VALUES (?, ?, ?, ?, ?, ?)
-                ''', (
-                    doc_id,
-                    title or "Untitled",
-                    content,
-                    json.dumps(entities),
-                    pickle.dumps(embedding) if embedding is not None else None,
-                    json.dumps(metadata or {})
-                ))
+                ''', [
+                    (
+                        doc_id,
+                        title or "Untitled",
+                        content,
+                        json.dumps(entities),
+                        quantize_embedding(embedding) if embedding is not None else None,
+                        json.dumps(doc.get('metadata') or {})
+                    )
+                    for doc_id, title, content, entities, embedding, doc
+                    in zip(doc_ids, titles, contents, all_entities, embeddings, documents)
+                ])
                 
-            # Save entities to entities table
-            for entity in entities:
-                entity_embedding = None
-                if self.embedder:
-                    entity_embedding = self.embedder.encode(entity['name'])
+                for doc_id, entities, vectors in zip(doc_ids, all_entities, entity_embeddings):
+                    self.save_entity_mentions(cursor, doc_id, entities)
+                    self.save_entities(cursor, entities, vectors)
                     
-                cursor.execute('''
-                    INSERT OR REPLACE INTO entities
-                    (id, type, name, canonical_name, confidence, embedding, source)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    entity['id'],
-                    entity['type'],
-                    entity['name'],
-                    entity.get('canonical_name', entity['name']),
-                    entity.get('confidence', 1.0),
-                    pickle.dumps(entity_embedding) if entity_embedding is not None else None,
-                    entity.get('source')
-                ))
+                version_after = self.documents_version(cursor)
+                cursor.execute('COMMIT')
+                self.search_cache.clear()
                 
-            conn.commit()
+                for doc_id, embedding in zip(doc_ids, embeddings):
+                    if embedding is not None:
+                        self.update_doc_matrix(doc_id, embedding)
+                self.sync_doc_version(version_before, version_after)
+                        
+                # Also save as markdown files
+                for content, title, entities, doc in zip(contents, titles, all_entities, documents):
+                    self.save_as_markdown(content, title, entities, doc.get('metadata'))
+                    
+                return {
+                    'success': True,
+                    'document_ids': doc_ids,
+                    'entities_extracted': sum(len(entities) for entities in all_entities),
+                    'mode': mode
+                }
+                
+            except Exception as e:
+                if self.conn.in_transaction:
+                    cursor.execute('ROLLBACK')
+                return {'success': False, 'error': str(e)}
+            finally:
+                cursor.close()
             
-            # Also save as markdown file
-            self.save_as_markdown(content, title, entities, metadata)
+    def extract_entities_many(self, texts: List[str], sources: List[str]) -> List[List[Dict]]:
+        """Extract entities from many texts, batching spaCy across worker processes"""
+        if not self.nlp:
+            return [self.pattern_based_extraction(text, source) for text, source in zip(texts, sources)]
             
-            return {
-                'success': True,
-                'document_id': doc_id,
-                'entities_extracted': len(entities),
-                'mode': mode
-            }
+        n_process = 1
+        if len(texts) >= NLP_PARALLEL_MIN_TEXTS:
+            n_process = max(1, (os.cpu_count() or 1) // 2)
             
-        except Exception as e:
-            conn.rollback()
-            return {'success': False, 'error': str(e)}
-        finally:
-            conn.close()
+        all_entities = []
+        for doc, text, source in zip(self.nlp.pipe(texts, batch_size=32, n_process=n_process), texts, sources):
+            entities = self.entities_from_doc(doc, text, source)
+            self.extract_relationships(doc, entities)
+            all_entities.append(entities)
+            
+        return all_entities
+    
+    def save_entities(self, cursor, entities: List[Dict], entity_embeddings):
+        """Insert or refresh entity rows in one batch"""
+        cursor.executemany('''
+            INSERT OR REPLACE INTO entities
+            (id, type, name, canonical_name, confidence, embedding, source)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', [
+            (
+                entity['id'],
+                entity['type'],
+                entity['name'],
+                entity.get('canonical_name', entity['name']),
+                entity.get('confidence', 1.0),
+                quantize_embedding(entity_embedding) if entity_embedding is not None else None,
+                entity.get('source')
+            )
+            for entity, entity_embedding in zip(entities, entity_embeddings)
+        ])
+    
+    def encode_cached(self, texts: List[str]) -> np.ndarray:
+        """Encode texts in one batch, reusing embeddings of texts seen before"""
+        keys = [hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest() for text in texts]
+        unique_keys = list(dict.fromkeys(keys))
+        
+        cursor = self.conn.cursor()
+        placeholders = ','.join('?' * len(unique_keys))
+        cursor.execute(f'SELECT hash, embedding FROM embedding_cache WHERE hash IN ({placeholders})', unique_keys)
+        cached = {key: np.frombuffer(blob, dtype=np.float32) for key, blob in cursor.fetchall()}
+        
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached:
+                missing.setdefault(key, text)
+                
+        if missing:
+            vectors = self.embedder.encode(
+                list(missing.values()),
+                batch_size=64,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                show_progress_bar=False
+            )
+            with self.write_lock:
+                try:
+                    cursor.execute('BEGIN')
+                    cursor.executemany(
+                        'INSERT OR REPLACE INTO embedding_cache (hash, embedding) VALUES (?, ?)',
+                        [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in zip(missing, vectors)]
+                    )
+                    # Rowids grow with every insert, so the lowest ones are the oldest entries
+                    cursor.execute(
+                        'DELETE FROM embedding_cache WHERE rowid <= (SELECT MAX(rowid) FROM embedding_cache) - ?',
+                        (EMBEDDING_CACHE_SIZE,)
+                    )
+                    cursor.execute('COMMIT')
+                except sqlite3.Error as e:
+                    # The vectors are still returned; they are just not cached
+                    if self.conn.in_transaction:
+                        cursor.execute('ROLLBACK')
+                    print(f"⚠️  Could not cache embeddings: {e}")
+            cached.update(zip(missing, vectors))
             
+        cursor.close()
+        return np.array([cached[key] for key in keys], dtype=np.float32)
+    
     def search_knowledge(self, query: str, search_type: str = 'hybrid') -> List[Dict]:
         """
         Advanced search with multiple strategies
         Types: 'keyword', 'semantic', 'entity', 'hybrid'
         """
+        cache_key = ResultCache.key(query, search_type)
+        cached = self.search_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        generation = self.search_cache.generation
+        
         results = []
         
         if search_type in ['semantic', 'hybrid'] and self.embedder:
             # Semantic search using embeddings
-            query_embedding = self.embedder.encode(query)
+            query_embedding = self.embedder.encode(query, normalize_embeddings=True)
             results.extend(self.semantic_search(query_embedding))
             
         if search_type in ['keyword', 'hybrid']:
@@ -330,69 +1000,227 @@ class EnhancedKnowledgeService:
             
         if search_type in ['entity', 'hybrid']:
             # Entity-based search
-            query_entities = self.extract_entities(query)
+            query_entities = self.extract_entities(query, relationships=False)
             results.extend(self.entity_search(query_entities))
             
         # Deduplicate and rank results
         unique_results = self.deduplicate_results(results)
         ranked_results = self.rank_results(unique_results, query)
         
-        return ranked_results[:10]  # Return top 10 results
+        top_results = ranked_results[:10]  # Return top 10 results
+        self.search_cache.put(cache_key, top_results, generation)
+        return top_results
     
     def semantic_search(self, query_embedding: np.ndarray, top_k: int = 5) -> List[Dict]:
         """Search using semantic similarity"""
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
+        if self._doc_matrix is None:
+            with self.write_lock:
+                if self._doc_matrix is None:
+                    self.load_doc_matrix()
+        if not self._doc_ids or top_k <= 0:
+            return []
+            
+        # Stored rows are unit-length, so cosine similarity is a plain dot product;
+        # callers that did not normalize the query are covered by this one division
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        k = min(top_k, len(self._doc_ids))
         
-        cursor.execute('SELECT id, title, content, embedding FROM documents WHERE embedding IS NOT NULL')
-        documents = cursor.fetchall()
+        ann = self._ann
+        if ann is not None:
+            labels, distances = ann.knn_query(query, k=k)
+            top = labels[0]
+            top_scores = 1.0 - distances[0]  # Cosine distance -> similarity
+        else:
+            # Cosine similarity against every document in one matrix-vector product
+            scores = self._doc_matrix @ query
+            
+            # Select the top results without sorting every score
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            top_scores = scores[top]
+            
+        top_ids = [self._doc_ids[i] for i in top]
+        
+        cursor = self.conn.cursor()
+        
+        placeholders = ','.join('?' * len(top_ids))
+        cursor.execute(f'SELECT id, title, substr(content, 1, 500) FROM documents WHERE id IN ({placeholders})',
+                       top_ids)
+        documents = {doc_id: (title, preview) for doc_id, title, preview in cursor.fetchall()}
+        
+        cursor.close()
         
         results = []
-        for doc_id, title, content, embedding_blob in documents:
-            if embedding_blob:
-                doc_embedding = pickle.loads(embedding_blob)
-                similarity = self.cosine_similarity(query_embedding, doc_embedding)
-                
+        for doc_id, score in zip(top_ids, top_scores):
+            if doc_id in documents:
+                title, preview = documents[doc_id]
                 results.append({
                     'id': doc_id,
                     'title': title,
-                    'content': content[:500],  # Preview
-                    'score': similarity,
+                    'content': preview,  # Preview
+                    'score': float(score),
                     'type': 'semantic'
                 })
                 
-        conn.close()
+        return results
+    
+    def load_doc_matrix(self):
+        """Load all document embeddings into one normalized float32 matrix"""
+        cursor = self.conn.cursor()
+        
+        # One statement, so the count and version describe the same snapshot
+        cursor.execute('''
+            SELECT (SELECT COUNT(*) FROM documents WHERE embedding IS NOT NULL),
+                   (SELECT version FROM documents_version)
+        ''')
+        count, version = cursor.fetchone()
+        
+        # Prefer the memory-mapped store; rebuild it from SQLite if it is out of date.
+        # A row count alone misses documents whose embedding was replaced
+        doc_ids = self.embedding_store.load()
+        if doc_ids is not None and len(doc_ids) == count and self.embedding_store.version == version:
+            matrix = np.asarray(self.embedding_store.matrix[:count], dtype=np.float32)
+        else:
+            cursor.execute('SELECT id, embedding FROM documents WHERE embedding IS NOT NULL')
+            rows = cursor.fetchall()
+            
+            doc_ids = [doc_id for doc_id, _ in rows]
+            if rows:
+                matrix = decode_embeddings([blob for _, blob in rows], legacy_decoder=pickle.loads)
+                norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+                norms[norms == 0] = 1.0
+                matrix /= norms
+                self.embedding_store.write(doc_ids, matrix, version)
+            else:
+                matrix = np.empty((0, 0), dtype=np.float32)
+                
+        cursor.close()
         
-        # Sort by similarity score
-        results.sort(key=lambda x: x['score'], reverse=True)
-        return results[:top_k]
+        self._doc_ids = doc_ids
+        self._doc_rows = {doc_id: i for i, doc_id in enumerate(doc_ids)}
+        self._doc_version = version
+        self._doc_buffer = np.ascontiguousarray(matrix, dtype=np.float32)
+        self._doc_matrix = self._doc_buffer[:len(doc_ids)]
+            
+        if HNSWLIB_AVAILABLE and len(self._doc_ids) >= ANN_MIN_DOCUMENTS:
+            self._ann = self.load_ann_index() or self.build_ann_index()
+    
+    def load_ann_index(self):
+        """Load the persisted HNSW index if it covers exactly the current documents"""
+        if not self.ann_index_path.exists() or not self.ann_ids_path.exists():
+            return None
+            
+        try:
+            # Labels are row numbers, so the saved row order must match exactly,
+            # and the rows must be the ones the loaded matrix holds
+            saved = json.loads(self.ann_ids_path.read_text())
+            if saved != {'version': self._doc_version, 'ids': self._doc_ids}:
+                return None
+                
+            index = hnswlib.Index(space='cosine', dim=self._doc_matrix.shape[1])
+            index.load_index(str(self.ann_index_path), max_elements=max(ANN_INITIAL_CAPACITY, len(self._doc_ids)))
+            index.set_ef(ANN_EF_SEARCH)
+            return index
+        except Exception as e:
+            print(f"⚠️  Could not load ANN index ({e}); rebuilding")
+            return None
+    
+    def build_ann_index(self):
+        """Build an HNSW index over the loaded document matrix"""
+        count, dim = self._doc_matrix.shape
+        index = hnswlib.Index(space='cosine', dim=dim)
+        index.init_index(max_elements=max(ANN_INITIAL_CAPACITY, count), ef_construction=ANN_EF_CONSTRUCTION, M=ANN_M)
+        index.add_items(self._doc_matrix, np.arange(count))
+        index.set_ef(ANN_EF_SEARCH)
+        self._ann_dirty = True
+        return index
+    
+    def documents_version(self, cursor) -> int:
+        """Current value of the documents_version change counter"""
+        cursor.execute('SELECT version FROM documents_version')
+        return cursor.fetchone()[0]
+    
+    def sync_doc_version(self, before: int, after: int):
+        """After update_doc_matrix has applied a save, record that the loaded rows
+        reflect `after`, provided they reflected `before` when the save began"""
+        if self._doc_matrix is None or self._doc_version != before:
+            # Not loaded, or another process wrote in between; the next load rebuilds
+            return
+        self._doc_version = after
+        self.embedding_store.set_version(after)
+    
+    def update_doc_matrix(self, doc_id: str, embedding: np.ndarray):
+        """Keep the in-memory embedding matrix in sync with a saved document"""
+        if self._doc_matrix is None:
+            return  # Not loaded yet; the next search will read it from the database
+            
+        vector = np.asarray(embedding, dtype=np.float32)
+        vector = vector / (np.linalg.norm(vector) or 1.0)
+        
+        row = self._doc_rows.get(doc_id)
+        if row is None:
+            row = len(self._doc_ids)
+            if row >= len(self._doc_buffer) or self._doc_buffer.shape[1] != len(vector):
+                # Grow by doubling so appends stay amortized O(1)
+                grown = np.empty((max(2 * row, DocumentEmbeddingStore.INITIAL_CAPACITY), len(vector)), dtype=np.float32)
+                if row:
+                    grown[:row] = self._doc_buffer[:row]
+                self._doc_buffer = grown
+            self._doc_rows[doc_id] = row
+            self._doc_ids.append(doc_id)
+            self.embedding_store.set_row(row, vector, doc_id)
+        else:
+            self.embedding_store.set_row(row, vector)
+            
+        self._doc_buffer[row] = vector
+        self._doc_matrix = self._doc_buffer[:len(self._doc_ids)]
+            
+        ann = self._ann
+        if ann is not None:
+            row = self._doc_rows[doc_id]
+            if row >= ann.get_max_elements():
+                # resize_index is unsafe while knn_query runs, so grow a copy and
+                # swap it in; searches keep using the old index until then
+                ann = pickle.loads(pickle.dumps(ann))
+                ann.resize_index(2 * ann.get_max_elements())
+                ann.set_ef(ANN_EF_SEARCH)
+            ann.add_items(vector.reshape(1, -1), np.array([row]))
+            self._ann = ann
+            self._ann_dirty = True
+        elif HNSWLIB_AVAILABLE and len(self._doc_ids) >= ANN_MIN_DOCUMENTS:
+            self._ann = self.build_ann_index()
     
     def keyword_search(self, query: str) -> List[Dict]:
-        """Traditional keyword search"""
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
+        """Full-text keyword search ranked by BM25"""
+        tokens = _FTS_TOKEN_RE.findall(query)
+        if not tokens:
+            return []
+            
+        cursor = self.conn.cursor()
         
-        # Search in content and title
+        # Match the query as a phrase; quoting keeps user input out of FTS5 syntax
         cursor.execute('''
-            SELECT id, title, content 
-            FROM documents 
-            WHERE content LIKE ? OR title LIKE ?
-        ''', (f'%{query}%', f'%{query}%'))
+            SELECT d.id, d.title, snippet(documents_fts, 1, '[', ']', '…', 32),
+                   bm25(documents_fts, 2.0, 1.0) AS rank
+            FROM documents_fts
+            JOIN documents d ON d.rowid = documents_fts.rowid
+            WHERE documents_fts MATCH ?
+            ORDER BY rank
+            LIMIT 20
+        ''', ('"' + ' '.join(tokens) + '"',))
         
         results = []
-        for doc_id, title, content in cursor.fetchall():
-            # Calculate relevance score based on frequency
-            score = content.lower().count(query.lower()) + title.lower().count(query.lower()) * 2
-            
+        for doc_id, title, preview, rank in cursor.fetchall():
             results.append({
                 'id': doc_id,
                 'title': title,
-                'content': content[:500],
-                'score': score,
+                'content': preview,
+                'score': -rank,  # bm25 is lower-is-better
                 'type': 'keyword'
             })
             
-        conn.close()
+        cursor.close()
         return results
     
     def entity_search(self, query_entities: List[Dict]) -> List[Dict]:
@@ -400,62 +1228,76 @@ class EnhancedKnowledgeService:
         if not query_entities:
             return []
             
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
+        cursor = self.conn.cursor()
         
         results = []
         for entity in query_entities:
-            # Find documents containing this entity
+            # Find documents mentioning an entity with this canonical name
             cursor.execute('''
-                SELECT id, title, content, entities
-                FROM documents
-                WHERE entities LIKE ?
-            ''', (f'%{entity["name"]}%',))
+                SELECT d.id, d.title, substr(d.content, 1, 500), SUM(m.mentions) AS matches
+                FROM entities e
+                JOIN entity_mentions m ON m.entity_id = e.id
+                JOIN documents d ON d.id = m.doc_id
+                WHERE e.canonical_name = ?
+                GROUP BY d.id
+                ORDER BY matches DESC
+            ''', (entity.get('canonical_name') or self.canonicalize_name(entity['name']),))
             
-            for doc_id, title, content, entities_json in cursor.fetchall():
-                doc_entities = json.loads(entities_json or '[]')
-                
-                # Count matching entities
-                matching_entities = sum(1 for e in doc_entities 
-                                      if e['name'].lower() == entity['name'].lower())
-                
-                if matching_entities > 0:
-                    results.append({
-                        'id': doc_id,
-                        'title': title,
-                        'content': content[:500],
-                        'score': matching_entities * 10,  # Weight entity matches highly
-                        'type': 'entity',
-                        'matched_entity': entity['name']
-                    })
+            for doc_id, title, preview, matching_entities in cursor.fetchall():
+                results.append({
+                    'id': doc_id,
+                    'title': title,
+                    'content': preview,
+                    'score': matching_entities * 10,  # Weight entity matches highly
+                    'type': 'entity',
+                    'matched_entity': entity['name']
+                })
                     
-        conn.close()
+        cursor.close()
         return results
     
+    def save_entity_mentions(self, cursor, doc_id: str, entities: List[Dict]):
+        """Record the entities a document mentions (replacing earlier mentions)"""
+        counts = Counter(entity['id'] for entity in entities)
+        cursor.execute('DELETE FROM entity_mentions WHERE doc_id = ?', (doc_id,))
+        cursor.executemany(
+            'INSERT INTO entity_mentions (entity_id, doc_id, mentions) VALUES (?, ?, ?)',
+            [(entity_id, doc_id, count) for entity_id, count in counts.items()]
+        )
+    
     def merge_content(self, existing: str, new: str) -> str:
         """Intelligently merge content to avoid duplication"""
         # Simple approach: check if new content is already in existing
         if new in existing:
             return existing
             
+        return existing + self.merge_suffix(existing[-len(new):], new)
+    
+    def merge_suffix(self, existing_tail: str, new: str) -> str:
+        """Text to append so that `new` follows the existing content.
+        Only the last len(new) characters of the existing content are needed."""
         # Check for substantial overlap
-        overlap = self.find_overlap(existing, new)
+        overlap = self.find_overlap(existing_tail, new)
         if len(overlap) > len(new) * 0.5:  # More than 50% overlap
             # Merge by removing overlapping part
-            return existing + new[len(overlap):]
+            return new[len(overlap):]
         else:
             # Append with separator
-            return existing + "\n\n---\n\n" + new
+            return "\n\n---\n\n" + new
     
     def find_overlap(self, text1: str, text2: str) -> str:
         """Find overlapping text between two strings"""
-        max_overlap = min(len(text1), len(text2))
-        
-        for i in range(max_overlap, 0, -1):
-            if text1[-i:] == text2[:i]:
-                return text2[:i]
-                
-        return ""
+        if not text1 or not text2:
+            return ""
+            
+        # The overlap can be at most len(text2), so only the tail of text1 matters
+        tail = text1[-len(text2):]
+        if NUMBA_AVAILABLE:
+            length = _suffix_prefix_overlap_jit(_code_points(tail), _code_points(text2))
+        else:
+            length = suffix_prefix_overlap(tail, text2)
+            
+        return text2[:length]
     
     def deduplicate_entities(self, entities: List[Dict]) -> List[Dict]:
         """Remove duplicate entities based on canonical name"""
@@ -509,8 +1351,8 @@ class EnhancedKnowledgeService:
     def save_as_markdown(self, content: str, title: str, entities: List[Dict], metadata: Dict):
         """Save as markdown file with YAML frontmatter"""
         # Create filename from title
-        safe_title = re.sub(r'[^\w\s-]', '', title or 'untitled').strip()
-        safe_title = re.sub(r'[-\s]+', '-', safe_title)
+        safe_title = _SAFE_TITLE_NON_WORD.sub('', title or 'untitled').strip()
+        safe_title = _SAFE_TITLE_DASH.sub('-', safe_title)
         
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         filename = f"{safe_title}_{timestamp}.md"
@@ -545,8 +1387,8 @@ class EnhancedKnowledgeService:
     
     def generate_entity_id(self, name: str, entity_type: str) -> str:
         """Generate unique entity ID"""
-        normalized = name.lower().replace(' ', '_')
-        return f"{entity_type}_{hashlib.md5(normalized.encode()).hexdigest()[:8]}"
+        # Entity names repeat heavily across documents and queries, so IDs are memoized
+        return _entity_id(name, entity_type)
     
     def generate_document_id(self, title: str) -> str:
         """Generate unique document ID"""
@@ -555,16 +1397,15 @@ class EnhancedKnowledgeService:
     
     def canonicalize_name(self, name: str) -> str:
         """Create canonical form of name"""
-        return ' '.join(name.split()).title()
+        return _canonical_name(name)
     
     def cosine_similarity(self, a: np.ndarray, b: np.ndarray) -> float:
-        """Calculate cosine similarity between two vectors"""
-        return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
+        """Calculate cosine similarity between two L2-normalized vectors"""
+        return float(a @ b)
     
     def get_statistics(self) -> Dict:
         """Get knowledge base statistics"""
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
+        cursor = self.conn.cursor()
         
         stats = {}
         
@@ -580,5 +1421,5 @@ class EnhancedKnowledgeService:
         cursor.execute('SELECT type, COUNT(*) FROM entities GROUP BY type')
         stats['entities_by_type'] = dict(cursor.fetchall())
         
-        conn.close()
+        cursor.close()
         return stats
\ No newline at end of file
@@ -4,13 +4,33 @@ Enhanced Knowledge Service HTTP Server
 Provides REST API for the enhanced knowledge management system
 """
 
-import json
+import asyncio
 import sys
 import os
-import traceback
-from http.server import HTTPServer, BaseHTTPRequestHandler
-from urllib.parse import urlparse, parse_qs
-from pathlib import Path
+from typing import Any
+
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
+from starlette.exceptions import HTTPException as StarletteHTTPException
+import uvicorn
+
+# Prefer orjson for (de)serialization; it reads and emits bytes directly and is
+# several times faster on large search result arrays
+try:
+    import orjson
+
+    def json_dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj)
+
+    json_loads = orjson.loads
+except ImportError:
+    import json
+
+    def json_dumps(obj: Any) -> bytes:
+        return json.dumps(obj).encode('utf-8')
+
+    json_loads = json.loads
 
 # Add parent directory to path to import our module
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -26,209 +46,223 @@ except ImportError as e:
     from simple_server import SimpleKnowledgeManager
     ENHANCED_MODE = False
 
-class KnowledgeAPIHandler(BaseHTTPRequestHandler):
-    """HTTP Request Handler for Knowledge API"""
-    
-    def __init__(self, *args, **kwargs):
-        # Get workspace path from environment or use default
-        workspace_path = os.environ.get('KNOWLEDGE_WORKSPACE', 
-                                       '/Users/clemenshoenig/Documents/My-Coding-Programs/Knowledge OS')
-        
-        if ENHANCED_MODE:
-            self.knowledge_service = EnhancedKnowledgeService(workspace_path)
-        else:
-            self.knowledge_service = SimpleKnowledgeManager()
-            
-        super().__init__(*args, **kwargs)
-    
-    def do_OPTIONS(self):
-        """Handle CORS preflight requests"""
-        self.send_response(200)
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
-        self.end_headers()
-    
-    def do_GET(self):
-        """Handle GET requests"""
-        parsed_path = urlparse(self.path)
-        path = parsed_path.path
-        
-        if path == '/health':
-            self.send_json_response({'status': 'healthy', 'mode': 'enhanced' if ENHANCED_MODE else 'simple'})
-            
-        elif path == '/statistics':
-            if ENHANCED_MODE:
-                stats = self.knowledge_service.get_statistics()
-                self.send_json_response(stats)
-            else:
-                self.send_json_response({'error': 'Statistics only available in enhanced mode'}, 404)
-                
-        elif path == '/search':
-            params = parse_qs(parsed_path.query)
-            query = params.get('q', [''])[0]
-            search_type = params.get('type', ['hybrid'])[0]
-            
-            if ENHANCED_MODE:
-                results = self.knowledge_service.search_knowledge(query, search_type)
-                self.send_json_response({'results': results})
-            else:
-                # Simple keyword search fallback
-                self.send_json_response({'results': [], 'mode': 'simple'})
-                
-        else:
-            self.send_json_response({'error': 'Not found'}, 404)
-    
-    def do_POST(self):
-        """Handle POST requests"""
-        content_length = int(self.headers['Content-Length'])
-        post_data = self.rfile.read(content_length)
-        
-        try:
-            data = json.loads(post_data.decode('utf-8'))
-        except json.JSONDecodeError:
-            self.send_json_response({'error': 'Invalid JSON'}, 400)
-            return
-        
-        path = urlparse(self.path).path
-        
-        try:
-            if path == '/process':
-                # Process text and extract entities
-                text = data.get('text', '')
-                source = data.get('source')
-                
-                if ENHANCED_MODE:
-                    entities = self.knowledge_service.extract_entities(text, source)
-                    result = {
-                        'entities': entities,
-                        'entity_count': len(entities),
-                        'mode': 'enhanced'
-                    }
-                else:
-                    # Use simple extraction
-                    entities = self.knowledge_service.extract_entities(text)
-                    result = {
-                        'entities': [e.to_dict() for e in entities],
-                        'entity_count': len(entities),
-                        'mode': 'simple'
-                    }
-                    
-                self.send_json_response(result)
-                
-            elif path == '/save':
-                # Smart save with entity extraction
-                content = data.get('content', '')
-                title = data.get('title', 'Untitled')
-                metadata = data.get('metadata', {})
-                mode = data.get('mode', 'new')  # new, append, update
-                
-                if ENHANCED_MODE:
-                    result = self.knowledge_service.save_to_knowledge(
-                        content, title, metadata, mode
-                    )
-                    self.send_json_response(result)
-                else:
-                    # Simple save without entity extraction
-                    self.send_json_response({
-                        'success': True,
-                        'mode': 'simple',
-                        'message': 'Saved without entity extraction'
-                    })
-                    
-            elif path == '/append':
-                # Append to existing document
-                content = data.get('content', '')
-                title = data.get('title', 'Untitled')
-                metadata = data.get('metadata', {})
-                
-                if ENHANCED_MODE:
-                    result = self.knowledge_service.save_to_knowledge(
-                        content, title, metadata, mode='append'
-                    )
-                    self.send_json_response(result)
-                else:
-                    self.send_json_response({'error': 'Append only available in enhanced mode'}, 404)
-                    
-            elif path == '/search':
-                # Advanced search
-                query = data.get('query', '')
-                search_type = data.get('type', 'hybrid')
-                
-                if ENHANCED_MODE:
-                    results = self.knowledge_service.search_knowledge(query, search_type)
-                    self.send_json_response({'results': results})
-                else:
-                    self.send_json_response({'results': [], 'mode': 'simple'})
-                    
-            elif path == '/query':
-                # Query knowledge graph
-                query = data.get('query', '')
-                
-                if ENHANCED_MODE:
-                    # Execute knowledge graph query
-                    # This could be expanded to support graph queries
-                    results = self.knowledge_service.search_knowledge(query, 'entity')
-                    self.send_json_response({'results': results})
-                else:
-                    self.send_json_response({'error': 'Query only available in enhanced mode'}, 404)
-                    
-            else:
-                self.send_json_response({'error': 'Not found'}, 404)
-                
-        except Exception as e:
-            print(f"Error processing request: {e}")
-            traceback.print_exc()
-            self.send_json_response({'error': str(e)}, 500)
-    
-    def send_json_response(self, data, status=200):
-        """Send JSON response with proper headers"""
-        self.send_response(status)
-        self.send_header('Content-Type', 'application/json')
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.end_headers()
-        self.wfile.write(json.dumps(data).encode('utf-8'))
-    
-    def log_message(self, format, *args):
-        """Custom logging"""
-        print(f"[Knowledge API] {format % args}")
+# The app calls the API in bursts; keep idle HTTP/1.1 connections open longer
+# than uvicorn's 5s default so consecutive requests reuse them
+KEEP_ALIVE_TIMEOUT = 30
+
+# Get workspace path from environment or use default
+WORKSPACE_PATH = os.environ.get('KNOWLEDGE_WORKSPACE',
+                                '/Users/clemenshoenig/Documents/My-Coding-Programs/Knowledge OS')
+
+app = FastAPI(
+    title="Enhanced Knowledge API",
+    description="REST API for the enhanced knowledge management system",
+    version="1.0.0"
+)
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_methods=["GET", "POST", "OPTIONS"],
+    allow_headers=["Content-Type"],
+)
+
+
+def send_json_response(data: Any, status: int = 200) -> Response:
+    """Send JSON response with proper headers"""
+    return Response(content=json_dumps(data), status_code=status, media_type='application/json')
+
+
+async def read_json_body(request: Request) -> Any:
+    """Parse the request body, returning None if it is not valid JSON"""
+    try:
+        return json_loads(await request.body())
+    except ValueError:
+        return None
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking service call (NER / embedding inference / SQLite) off the event loop"""
+    return await asyncio.to_thread(func, *args, **kwargs)
+
+
+@app.middleware("http")
+async def handle_errors(request: Request, call_next):
+    """Report unexpected errors as JSON, like the previous handler did"""
+    try:
+        return await call_next(request)
+    except Exception as e:
+        print(f"Error processing request: {e}")
+        import traceback
+        traceback.print_exc()
+        return send_json_response({'error': str(e)}, 500)
+
+
+@app.exception_handler(StarletteHTTPException)
+async def handle_http_error(request: Request, exc: StarletteHTTPException):
+    """Keep the {'error': ...} body shape for unknown endpoints"""
+    message = 'Not found' if exc.status_code == 404 else exc.detail
+    return send_json_response({'error': message}, exc.status_code)
+
+
+@app.on_event("startup")
+async def startup_event():
+    """Create the shared knowledge service once for all requests"""
+    if ENHANCED_MODE:
+        app.state.knowledge_service = await run_blocking(EnhancedKnowledgeService, WORKSPACE_PATH)
+    else:
+        app.state.knowledge_service = SimpleKnowledgeManager()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release the database connection and persist the ANN index"""
+    if ENHANCED_MODE:
+        app.state.knowledge_service.close()
+
+
+@app.get("/health")
+async def health():
+    """Check service health"""
+    return send_json_response({'status': 'healthy', 'mode': 'enhanced' if ENHANCED_MODE else 'simple'})
+
+
+@app.get("/statistics")
+async def statistics():
+    """Get knowledge base statistics"""
+    if not ENHANCED_MODE:
+        return send_json_response({'error': 'Statistics only available in enhanced mode'}, 404)
+
+    stats = await run_blocking(app.state.knowledge_service.get_statistics)
+    return send_json_response(stats)
+
+
+@app.get("/search")
+async def search_get(q: str = '', type: str = 'hybrid'):
+    """Search knowledge base"""
+    if not ENHANCED_MODE:
+        # Simple keyword search fallback
+        return send_json_response({'results': [], 'mode': 'simple'})
+
+    results = await run_blocking(app.state.knowledge_service.search_knowledge, q, type)
+    return send_json_response({'results': results})
+
+
+@app.post("/process")
+async def process(request: Request):
+    """Process text and extract entities"""
+    data = await read_json_body(request)
+    if data is None:
+        return send_json_response({'error': 'Invalid JSON'}, 400)
+
+    text = data.get('text', '')
+    source = data.get('source')
+
+    if ENHANCED_MODE:
+        entities = await run_blocking(app.state.knowledge_service.extract_entities, text, source)
+        return send_json_response({
+            'entities': entities,
+            'entity_count': len(entities),
+            'mode': 'enhanced'
+        })
+
+    # Use simple extraction
+    entities = await run_blocking(app.state.knowledge_service.extract_entities, text)
+    return send_json_response({
+        'entities': [e.to_dict() for e in entities],
+        'entity_count': len(entities),
+        'mode': 'simple'
+    })
+
+
+@app.post("/save")
+async def save(request: Request):
+    """Smart save with entity extraction"""
+    data = await read_json_body(request)
+    if data is None:
+        return send_json_response({'error': 'Invalid JSON'}, 400)
+
+    content = data.get('content', '')
+    title = data.get('title', 'Untitled')
+    metadata = data.get('metadata', {})
+    mode = data.get('mode', 'new')  # new, append, update
+
+    if not ENHANCED_MODE:
+        # Simple save without entity extraction
+        return send_json_response({
+            'success': True,
+            'mode': 'simple',
+            'message': 'Saved without entity extraction'
+        })
+
+    result = await run_blocking(app.state.knowledge_service.save_to_knowledge, content, title, metadata, mode)
+    return send_json_response(result)
+
+
+@app.post("/append")
+async def append(request: Request):
+    """Append to existing document"""
+    data = await read_json_body(request)
+    if data is None:
+        return send_json_response({'error': 'Invalid JSON'}, 400)
+
+    content = data.get('content', '')
+    title = data.get('title', 'Untitled')
+    metadata = data.get('metadata', {})
+
+    if not ENHANCED_MODE:
+        return send_json_response({'error': 'Append only available in enhanced mode'}, 404)
+
+    result = await run_blocking(app.state.knowledge_service.save_to_knowledge, content, title, metadata, 'append')
+    return send_json_response(result)
+
+
+@app.post("/search")
+async def search(request: Request):
+    """Advanced search"""
+    data = await read_json_body(request)
+    if data is None:
+        return send_json_response({'error': 'Invalid JSON'}, 400)
+
+    query = data.get('query', '')
+    search_type = data.get('type', 'hybrid')
+
+    if not ENHANCED_MODE:
+        return send_json_response({'results': [], 'mode': 'simple'})
+
+    results = await run_blocking(app.state.knowledge_service.search_knowledge, query, search_type)
+    return send_json_response({'results': results})
+
+
+@app.post("/query")
+async def query(request: Request):
+    """Query knowledge graph"""
+    data = await read_json_body(request)
+    if data is None:
+        return send_json_response({'error': 'Invalid JSON'}, 400)
+
+    query = data.get('query', '')
+
+    if not ENHANCED_MODE:
+        return send_json_response({'error': 'Query only available in enhanced mode'}, 404)
+
+    # Execute knowledge graph query
+    # This could be expanded to support graph queries
+    results = await run_blocking(app.state.knowledge_service.search_knowledge, query, 'entity')
+    return send_json_response({'results': results})
+
 
 def run_server(port=8000):
-    """Run the HTTP server"""
-    # Set workspace path from environment or use default
-    workspace_path = os.environ.get('KNOWLEDGE_WORKSPACE', 
-                                   '/Users/clemenshoenig/Documents/My-Coding-Programs/Knowledge OS')
-    
+    """Run the ASGI server"""
     print(f"🚀 Starting Enhanced Knowledge Service on port {port}")
-    print(f"📁 Workspace: {workspace_path}")
+    print(f"📁 Workspace: {WORKSPACE_PATH}")
     print(f"🔧 Mode: {'Enhanced' if ENHANCED_MODE else 'Simple'}")
-    
+
     if not ENHANCED_MODE:
         print("\n📦 To enable full features, install:")
         print("   pip install spacy sentence-transformers numpy")
         print("   python -m spacy download en_core_web_sm")
-    
-    server_address = ('', port)
-    
-    # Create a custom HTTPServer that passes the workspace to handlers
-    class KnowledgeHTTPServer(HTTPServer):
-        def __init__(self, server_address, RequestHandlerClass):
-            super().__init__(server_address, RequestHandlerClass)
-            self.workspace_path = workspace_path
-            
-            if ENHANCED_MODE:
-                self.knowledge_service = EnhancedKnowledgeService(workspace_path)
-            else:
-                self.knowledge_service = SimpleKnowledgeManager()
-    
-    # Create custom handler that uses the shared service
-    class CustomHandler(KnowledgeAPIHandler):
-        def __init__(self, *args, **kwargs):
-            self.knowledge_service = httpd.knowledge_service
-            BaseHTTPRequestHandler.__init__(self, *args, **kwargs)
-    
-    httpd = KnowledgeHTTPServer(server_address, CustomHandler)
-    
+
     print(f"\n✅ Knowledge API ready at http://localhost:{port}")
     print("\nEndpoints:")
     print("  GET  /health           - Check service health")
@@ -239,13 +273,11 @@ def run_server(port=8000):
     print("  POST /append           - Append to existing document")
     print("  POST /search           - Advanced search")
     print("  POST /query            - Query knowledge graph")
-    
-    try:
-        httpd.serve_forever()
-    except KeyboardInterrupt:
-        print("\n👋 Shutting down Knowledge Service")
-        httpd.shutdown()
+
+    # uvicorn picks uvloop/httptools automatically when they are installed
+    uvicorn.run(app, host="0.0.0.0", port=port, log_level="info", timeout_keep_alive=KEEP_ALIVE_TIMEOUT)
+    print("\n👋 Shutting down Knowledge Service")
 
 if __name__ == "__main__":
     port = int(sys.argv[1]) if len(sys.argv) > 1 else 8000
-    run_server(port)
\ No newline at end of file
+    run_server(port)
@@ -1,20 +1,31 @@
 """
 Universal Agentic Knowledge Management System
-Using Python + Pydantic for type safety and validation
+Using Python dataclasses for typed, lightweight domain objects
 """
 
-from pydantic import BaseModel, Field, validator
+from dataclasses import asdict, dataclass, field
 from typing import List, Dict, Optional, Any, Union
+from collections import OrderedDict
 from enum import Enum
 from datetime import datetime
 import asyncio
+import functools
 import hashlib
+import os
+import re
+import sys
 from abc import ABC, abstractmethod
-import networkx as nx
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 from sentence_transformers import SentenceTransformer
 
-# Type definitions with Pydantic validation
+from embedding_codec import quantize_embedding, unit_embedding
+
+# Domain objects are built internally on the hot path, so they are plain
+# dataclasses (with __slots__ where the interpreter supports it)
+DATACLASS_OPTIONS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+# Type definitions
 class EntityType(str, Enum):
     PERSON = "person"
     ORGANIZATION = "organization"
@@ -39,29 +50,39 @@ class InformationStatus(str, Enum):
     PLANNED = "planned"
     UNCERTAIN = "uncertain"
 
-class Confidence(BaseModel):
+@dataclass(**DATACLASS_OPTIONS)
+class Confidence:
     """Confidence scoring for information"""
-    value: float = Field(ge=0.0, le=1.0)
+    value: float
     source: str
     timestamp: datetime
     
-    @validator('value')
-    def validate_confidence(cls, v):
-        if not 0 <= v <= 1:
+    def __post_init__(self):
+        if not 0 <= self.value <= 1:
             raise ValueError('Confidence must be between 0 and 1')
-        return v
 
-class Entity(BaseModel):
+@dataclass(**DATACLASS_OPTIONS)
+class Entity:
     """Universal entity representation"""
     id: str
     type: EntityType
     canonical_name: str
-    aliases: List[str] = []
-    properties: Dict[str, Any] = {}
-    embeddings: Optional[List[float]] = None
     confidence: Confidence
-    created_at: datetime = Field(default_factory=datetime.now)
-    updated_at: datetime = Field(default_factory=datetime.now)
+    aliases: List[str] = field(default_factory=list)
+    properties: Dict[str, Any] = field(default_factory=dict)
+    embeddings: Optional[bytes] = None  # int8, see embedding_codec
+    created_at: datetime = field(default_factory=datetime.now)
+    updated_at: datetime = field(default_factory=datetime.now)
+    
+    def __post_init__(self):
+        # Accept plain strings the way the pydantic model did
+        self.type = EntityType(self.type)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain-dict view for responses; the int8 embedding is internal"""
+        data = asdict(self)
+        del data['embeddings']
+        return data
     
     def merge_with(self, other: 'Entity') -> 'Entity':
         """Intelligently merge two entities"""
@@ -77,23 +98,29 @@ class Entity(BaseModel):
         self.updated_at = datetime.now()
         return self
 
-class Relationship(BaseModel):
+@dataclass(**DATACLASS_OPTIONS)
+class Relationship:
     """Relationship between entities"""
     id: str
     type: RelationshipType
     source_entity_id: str
     target_entity_id: str
-    properties: Dict[str, Any] = {}
     confidence: Confidence
+    properties: Dict[str, Any] = field(default_factory=dict)
     status: InformationStatus = InformationStatus.CURRENT
     valid_from: Optional[datetime] = None
     valid_to: Optional[datetime] = None
+    
+    def __post_init__(self):
+        self.type = RelationshipType(self.type)
+        self.status = InformationStatus(self.status)
 
-class KnowledgeNode(BaseModel):
+@dataclass(**DATACLASS_OPTIONS)
+class KnowledgeNode:
     """Node in the knowledge graph"""
     entity: Entity
-    relationships: List[Relationship] = []
-    context: Dict[str, Any] = {}
+    relationships: List[Relationship] = field(default_factory=list)
+    context: Dict[str, Any] = field(default_factory=dict)
     
     def to_graph_format(self) -> Dict:
         """Convert to graph database format"""
@@ -107,6 +134,53 @@ class KnowledgeNode(BaseModel):
             }
         }
 
+# Embedding model and storage
+EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2'
+
+# Encoding blocks (torch releases the GIL), so agents run it on a small shared
+# pool; its size also bounds how many batches are in flight at once
+EMBEDDING_WORKERS = min(4, os.cpu_count() or 1)
+_embedding_pool = ThreadPoolExecutor(max_workers=EMBEDDING_WORKERS, thread_name_prefix='embedder')
+
+# int8 embeddings of recently seen entity names, shared by all agents
+EMBEDDING_CACHE_SIZE = 10_000
+_embedding_cache: 'OrderedDict[str, bytes]' = OrderedDict()
+
+@functools.lru_cache(maxsize=4)
+def _get_embedder(name: str) -> SentenceTransformer:
+    """Load each embedding model once per process and share it across agents"""
+    return SentenceTransformer(name)
+
+async def encode_async(embedder: SentenceTransformer, texts, **kwargs) -> np.ndarray:
+    """Encode on the embedding pool without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_embedding_pool, functools.partial(embedder.encode, texts, **kwargs))
+
+async def embed_names(names: List[str]) -> List[bytes]:
+    """int8 embeddings for entity names; only names not seen recently are encoded"""
+    found = {}
+    for name in names:
+        if name in _embedding_cache:
+            _embedding_cache.move_to_end(name)
+            found[name] = _embedding_cache[name]
+    
+    missing = [name for name in dict.fromkeys(names) if name not in found]
+    if missing:
+        # One batched forward pass for all new names
+        vectors = await encode_async(
+            _get_embedder(EMBEDDING_MODEL_NAME),
+            missing,
+            batch_size=32,
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        )
+        for name, vector in zip(missing, vectors):
+            found[name] = _embedding_cache[name] = quantize_embedding(vector)
+        while len(_embedding_cache) > EMBEDDING_CACHE_SIZE:
+            _embedding_cache.popitem(last=False)
+    
+    return [found[name] for name in names]
+
 # Agent Base Classes
 class KnowledgeAgent(ABC):
     """Base class for all knowledge agents"""
@@ -151,23 +225,27 @@ class EntityRecognitionAgent(KnowledgeAgent):
                 r"([A-Z][a-zA-Z& ]+) (?:Inc|Corp|LLC|Ltd|GmbH)"
             ]
         }
+        # One precompiled alternation per type, so each type is a single pass over the text
+        self._compiled = {
+            entity_type: re.compile("|".join(f"(?:{pattern})" for pattern in patterns))
+            for entity_type, patterns in self.patterns.items()
+        }
     
     async def process(self, text: str) -> List[Entity]:
         """Extract entities from text"""
         entities = []
         
         # Simplified pattern matching (use spaCy in production)
-        for entity_type, patterns in self.patterns.items():
-            for pattern in patterns:
-                # Extract matches and create entities
-                # This is simplified - use proper NER
-                pass
+        for entity_type, pattern in self._compiled.items():
+            # Extract matches and create entities
+            # This is simplified - use proper NER
+            pass
         
         # Add embeddings for semantic search
         if entities:
-            embedder = SentenceTransformer('all-MiniLM-L6-v2')
-            for entity in entities:
-                entity.embeddings = embedder.encode(entity.canonical_name).tolist()
+            embeddings = await embed_names([entity.canonical_name for entity in entities])
+            for entity, embedding in zip(entities, embeddings):
+                entity.embeddings = embedding
         
         return entities
 
@@ -176,23 +254,18 @@ class CanonicalLocationAgent(KnowledgeAgent):
     
     def __init__(self):
         super().__init__("location_router", ["routing", "organization"])
-        self.routing_rules = {
-            InformationStatus.CURRENT: {
-                EntityType.PERSON: lambda e: f"entities/person/{e.id}/current.json",
-                EntityType.ORGANIZATION: lambda e: f"entities/org/{e.id}/current.json",
-            },
-            InformationStatus.HISTORICAL: {
-                EntityType.PERSON: lambda e: f"entities/person/{e.id}/history.json",
-                EntityType.ORGANIZATION: lambda e: f"entities/org/{e.id}/history.json",
-            }
+        # Path templates keyed by (status, entity type); anything else is generic
+        self.route_table = {
+            (InformationStatus.CURRENT, EntityType.PERSON): "entities/person/{id}/current.json",
+            (InformationStatus.CURRENT, EntityType.ORGANIZATION): "entities/org/{id}/current.json",
+            (InformationStatus.HISTORICAL, EntityType.PERSON): "entities/person/{id}/history.json",
+            (InformationStatus.HISTORICAL, EntityType.ORGANIZATION): "entities/org/{id}/history.json",
         }
+        self.default_route = "entities/generic/{id}/data.json"
     
     async def process(self, entity: Entity, status: InformationStatus) -> str:
         """Determine canonical location for entity"""
-        rule = self.routing_rules.get(status, {}).get(entity.type)
-        if rule:
-            return rule(entity)
-        return f"entities/generic/{entity.id}/data.json"
+        return self.route_table.get((status, entity.type), self.default_route).format(id=entity.id)
 
 class ConflictResolutionAgent(KnowledgeAgent):
     """Resolves conflicts in information"""
@@ -242,55 +315,145 @@ class SemanticClusteringAgent(KnowledgeAgent):
     
     def __init__(self, similarity_threshold: float = 0.7):
         super().__init__("semantic_clusterer", ["clustering", "similarity"])
-        self.embedder = SentenceTransformer('all-MiniLM-L6-v2')
+        self.embedder = _get_embedder(EMBEDDING_MODEL_NAME)
         self.similarity_threshold = similarity_threshold
         self.clusters: Dict[str, List[Entity]] = {}
+        
+        # Mean unit embedding of each cluster's members, one row per cluster; its dot
+        # product with a unit query is the average cosine similarity to the members
+        self._cluster_ids: List[str] = []
+        self._cluster_rows: Dict[str, int] = {}
+        self._cluster_sizes: List[int] = []
+        self._centroid_buffer: Optional[np.ndarray] = None
     
     async def process(self, entity: Entity) -> str:
         """Assign entity to semantic cluster"""
         if not entity.embeddings:
-            entity.embeddings = self.embedder.encode(entity.canonical_name).tolist()
+            entity.embeddings = (await embed_names([entity.canonical_name]))[0]
         
-        # Find most similar cluster
+        query = unit_embedding(entity.embeddings)
+        
+        # Find most similar cluster with one matrix-vector product over all centroids
         best_cluster = None
         best_similarity = 0
         
-        for cluster_id, cluster_entities in self.clusters.items():
-            # Calculate average similarity to cluster
-            similarities = []
-            for cluster_entity in cluster_entities[:5]:  # Sample for efficiency
-                if cluster_entity.embeddings:
-                    sim = self.cosine_similarity(
-                        entity.embeddings, 
-                        cluster_entity.embeddings
-                    )
-                    similarities.append(sim)
-            
-            if similarities:
-                avg_sim = np.mean(similarities)
-                if avg_sim > best_similarity:
-                    best_similarity = avg_sim
-                    best_cluster = cluster_id
+        if self._cluster_ids:
+            similarities = self._centroid_buffer[:len(self._cluster_ids)] @ query
+            best_row = int(np.argmax(similarities))
+            if similarities[best_row] > best_similarity:
+                best_similarity = similarities[best_row]
+                best_cluster = self._cluster_ids[best_row]
         
         if best_similarity > self.similarity_threshold:
             self.clusters[best_cluster].append(entity)
+            self.add_to_centroid(best_cluster, query)
             return best_cluster
         else:
             # Create new cluster
-            new_cluster_id = hashlib.md5(entity.canonical_name.encode()).hexdigest()
+            new_cluster_id = hashlib.blake2b(entity.canonical_name.encode('utf-8'), digest_size=16).hexdigest()
             self.clusters[new_cluster_id] = [entity]
+            self.reset_centroid(new_cluster_id, query)
             return new_cluster_id
     
-    def cosine_similarity(self, a: List[float], b: List[float]) -> float:
+    def add_to_centroid(self, cluster_id: str, embedding: np.ndarray):
+        """Fold a member's unit embedding into its cluster's running mean"""
+        row = self._cluster_rows[cluster_id]
+        self._cluster_sizes[row] += 1
+        self._centroid_buffer[row] += (embedding - self._centroid_buffer[row]) / self._cluster_sizes[row]
+    
+    def reset_centroid(self, cluster_id: str, embedding: np.ndarray):
+        """Start a cluster's centroid from its first member"""
+        row = self._cluster_rows.get(cluster_id)
+        if row is None:
+            row = len(self._cluster_ids)
+            if self._centroid_buffer is None:
+                self._centroid_buffer = np.empty((16, embedding.shape[0]), dtype=np.float32)
+            elif row == len(self._centroid_buffer):
+                # Double the buffer so appending a cluster is amortized O(1)
+                buffer = np.empty((2 * row, self._centroid_buffer.shape[1]), dtype=np.float32)
+                buffer[:row] = self._centroid_buffer
+                self._centroid_buffer = buffer
+            self._cluster_ids.append(cluster_id)
+            self._cluster_rows[cluster_id] = row
+            self._cluster_sizes.append(0)
+        
+        self._centroid_buffer[row] = embedding
+        self._cluster_sizes[row] = 1
+    
+    def cosine_similarity(self, a: bytes, b: bytes) -> float:
         """Calculate cosine similarity between embeddings"""
-        return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
+        return float(unit_embedding(a) @ unit_embedding(b))
+
+# Knowledge Graph
+class CSRGraph:
+    """
+    Directed graph over entity ids in compressed sparse row form: the neighbors of
+    node i are indices[indptr[i]:indptr[i + 1]]. New edges are buffered and merged
+    into the arrays the next time neighbors are read.
+    """
+    
+    def __init__(self):
+        self.node_ids: List[str] = []
+        self.node_index: Dict[str, int] = {}
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.indices = np.empty(0, dtype=np.int64)
+        self._pending_sources: List[int] = []
+        self._pending_targets: List[int] = []
+    
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self.node_index
+    
+    def number_of_nodes(self) -> int:
+        return len(self.node_ids)
+    
+    def add_node(self, node_id: str) -> int:
+        """Add a node if it is new and return its integer index"""
+        index = self.node_index.get(node_id)
+        if index is None:
+            index = self.node_index[node_id] = len(self.node_ids)
+            self.node_ids.append(node_id)
+        return index
+    
+    def add_edges(self, pairs):
+        """Add (source_id, target_id) edges, creating nodes as needed"""
+        for source_id, target_id in pairs:
+            self._pending_sources.append(self.add_node(source_id))
+            self._pending_targets.append(self.add_node(target_id))
+    
+    def neighbors(self, node_id: str) -> List[str]:
+        """Successors of a node"""
+        self.compact()
+        i = self.node_index[node_id]
+        return [self.node_ids[j] for j in self.indices[self.indptr[i]:self.indptr[i + 1]]]
+    
+    def compact(self):
+        """Merge buffered edges (and nodes added since the last merge) into the CSR arrays"""
+        count = len(self.node_ids)
+        if not self._pending_sources:
+            if len(self.indptr) <= count:
+                padding = np.full(count + 1 - len(self.indptr), self.indptr[-1], dtype=np.int64)
+                self.indptr = np.concatenate([self.indptr, padding])
+            return
+        
+        # Expand the current rows back to edge pairs, add the new ones, then drop
+        # duplicate edges and re-sort by source in one np.unique pass
+        sources = np.repeat(np.arange(len(self.indptr) - 1, dtype=np.int64), np.diff(self.indptr))
+        sources = np.concatenate([sources, np.asarray(self._pending_sources, dtype=np.int64)])
+        targets = np.concatenate([self.indices, np.asarray(self._pending_targets, dtype=np.int64)])
+        edges = np.unique(sources * count + targets)
+        sources, self.indices = np.divmod(edges, count)
+        
+        self.indptr = np.zeros(count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=count), out=self.indptr[1:])
+        self._pending_sources.clear()
+        self._pending_targets.clear()
 
 # Knowledge Graph Manager
 class KnowledgeGraphManager:
     """Manages the entire knowledge graph with agents"""
     
     def __init__(self):
-        self.graph = nx.DiGraph()
+        self.graph = CSRGraph()
         self.agents = {
             'entity_recognizer': EntityRecognitionAgent(),
             'location_router': CanonicalLocationAgent(),
@@ -298,6 +461,8 @@ class KnowledgeGraphManager:
             'semantic_clusterer': SemanticClusteringAgent()
         }
         self.entity_store: Dict[str, Entity] = {}
+        # Guards the read-resolve-write of entity_store across concurrent entity pipelines
+        self.store_lock = asyncio.Lock()
     
     async def process_information(self, text: str, source: str = "user") -> Dict[str, Any]:
         """Process any information through agent pipeline"""
@@ -305,15 +470,51 @@ class KnowledgeGraphManager:
         # 1. Extract entities
         entities = await self.agents['entity_recognizer'].process(text)
         
-        # 2. For each entity, check if it exists
-        results = []
+        # 2. Keep one instance per entity id, preferring the most confident
+        unique_entities: Dict[str, Entity] = {}
         for entity in entities:
-            entity.confidence = Confidence(
-                value=0.9,
-                source=source,
-                timestamp=datetime.now()
-            )
-            
+            current = unique_entities.get(entity.id)
+            if current is None or entity.confidence.value > current.confidence.value:
+                unique_entities[entity.id] = entity
+        
+        # 3. Run the per-entity pipelines concurrently; results keep entity order
+        results = await asyncio.gather(*(self.process_entity(entity, source) for entity in unique_entities.values()))
+        
+        return {
+            "processed": text,
+            "entities": list(results),
+            "graph_size": self.graph.number_of_nodes()
+        }
+    
+    async def process_entity(self, entity: Entity, source: str) -> Dict[str, Any]:
+        """Store, route and cluster one extracted entity"""
+        entity.confidence = Confidence(
+            value=0.9,
+            source=source,
+            timestamp=datetime.now()
+        )
+        
+        # Storing, routing and clustering are independent of each other
+        action, location, cluster = await asyncio.gather(
+            self.store_entity(entity),
+            self.agents['location_router'].process(entity, InformationStatus.CURRENT),
+            self.agents['semantic_clusterer'].process(entity)
+        )
+        
+        # Update graph; the entity itself lives in entity_store
+        self.graph.add_node(entity.id)
+        
+        return {
+            "entity": entity.canonical_name,
+            "action": action,
+            "location": location,
+            "cluster": cluster,
+            "confidence": entity.confidence.value
+        }
+    
+    async def store_entity(self, entity: Entity) -> str:
+        """Add the entity to the store, resolving conflicts with an existing one"""
+        async with self.store_lock:
             # Check for existing entity
             existing = self.entity_store.get(entity.id)
             
@@ -323,38 +524,10 @@ class KnowledgeGraphManager:
                     existing, entity
                 )
                 self.entity_store[entity.id] = resolved
-                action = "updated"
-            else:
-                self.entity_store[entity.id] = entity
-                action = "created"
-            
-            # Determine storage location
-            location = await self.agents['location_router'].process(
-                entity, InformationStatus.CURRENT
-            )
-            
-            # Cluster semantically
-            cluster = await self.agents['semantic_clusterer'].process(entity)
+                return "updated"
             
-            # Update graph
-            self.graph.add_node(
-                entity.id,
-                **entity.dict()
-            )
-            
-            results.append({
-                "entity": entity.canonical_name,
-                "action": action,
-                "location": location,
-                "cluster": cluster,
-                "confidence": entity.confidence.value
-            })
-        
-        return {
-            "processed": text,
-            "entities": results,
-            "graph_size": self.graph.number_of_nodes()
-        }
+            self.entity_store[entity.id] = entity
+            return "created"
     
     async def query(self, question: str) -> Dict[str, Any]:
         """Query the knowledge graph"""
@@ -375,8 +548,8 @@ class KnowledgeGraphManager:
                     related = []
                 
                 results.append({
-                    "entity": stored_entity.dict(),
-                    "related": [r.dict() for r in related if r]
+                    "entity": stored_entity.to_dict(),
+                    "related": [r.to_dict() for r in related if r]
                 })
         
         return {
@@ -1,10 +1,10 @@
 """
 Entity models for the Knowledge Management System
 """
-from typing import Dict, List, Optional, Any, Union
+from typing import Dict, Hashable, List, Optional, Any, Tuple, Union
 from datetime import datetime
 from enum import Enum
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, PrivateAttr, validator
 
 
 class EntityType(str, Enum):
@@ -44,6 +44,16 @@ class ConfidenceLevel(str, Enum):
     UNCERTAIN = "uncertain"
 
 
+# Confidence levels in increasing order of trust, for comparisons
+CONF_RANK = {
+    ConfidenceLevel.UNCERTAIN: 0,
+    ConfidenceLevel.LOW: 1,
+    ConfidenceLevel.MEDIUM: 2,
+    ConfidenceLevel.HIGH: 3,
+    ConfidenceLevel.VERIFIED: 4
+}
+
+
 class Attribute(BaseModel):
     """Represents an attribute of an entity"""
     key: str
@@ -53,12 +63,30 @@ class Attribute(BaseModel):
     timestamp: datetime = Field(default_factory=datetime.utcnow)
     version: int = 1
     
+    def touch(self):
+        """Mark the value as seen now"""
+        self.timestamp = datetime.utcnow()
+    
     class Config:
         json_encoders = {
             datetime: lambda v: v.isoformat()
         }
 
 
+def _value_key(value: Any) -> Hashable:
+    """Hashable stand-in for an attribute value; lists and dicts go by their repr"""
+    try:
+        hash(value)
+    except TypeError:
+        return ('repr', repr(value))
+    return value
+
+
+def _best_key(attribute: Attribute):
+    """Sort key ranking attribute values by confidence, then recency"""
+    return (CONF_RANK[attribute.confidence], attribute.timestamp)
+
+
 class Entity(BaseModel):
     """Core entity model"""
     id: str
@@ -66,12 +94,17 @@ class Entity(BaseModel):
     name: str
     aliases: List[str] = []
     attributes: Dict[str, List[Attribute]] = {}
-    embeddings: Optional[List[float]] = None
+    # int8-quantized name embedding; internal to the graph, so left out of dumps
+    embeddings: Optional[bytes] = Field(default=None, exclude=True)
     canonical_file: Optional[str] = None
     confidence: ConfidenceLevel = ConfidenceLevel.HIGH
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     sources: List[str] = []
+    # Attribute values per key, indexed by _value_key, so repeated values are found by hash.
+    # Each entry is [list, its length, index]: a list replaced or appended to
+    # outside add_attribute is re-indexed on the next add
+    _by_value: Dict[str, List[Any]] = PrivateAttr(default_factory=dict)
     
     @validator('updated_at', pre=True, always=True)
     def set_updated_at(cls, v):
@@ -82,21 +115,31 @@ class Entity(BaseModel):
         """Add or update an attribute"""
         if key not in self.attributes:
             self.attributes[key] = []
+        values = self.attributes[key]
         
         # Check if we already have this value
-        existing = next((attr for attr in self.attributes[key] 
-                        if attr.value == value), None)
+        entry = self._value_index(key)
+        existing = entry[2].get(_value_key(value))
         
         if existing:
             # Update confidence if higher
-            if confidence.value > existing.confidence.value:
+            if CONF_RANK[confidence] > CONF_RANK[existing.confidence]:
                 existing.confidence = confidence
-            existing.timestamp = datetime.utcnow()
+            existing.touch()
         else:
-            self.attributes[key].append(
-                Attribute(key=key, value=value, source=source, 
-                         confidence=confidence)
-            )
+            attribute = Attribute(key=key, value=value, source=source, 
+                                  confidence=confidence)
+            values.append(attribute)
+            entry[1] += 1
+            entry[2][_value_key(value)] = attribute
+    
+    def _value_index(self, key: str) -> List[Any]:
+        """The key's _by_value entry, rebuilt if the list changed outside add_attribute"""
+        values = self.attributes[key]
+        entry = self._by_value.get(key)
+        if entry is None or entry[0] is not values or entry[1] != len(values):
+            entry = self._by_value[key] = [values, len(values), {_value_key(attr.value): attr for attr in values}]
+        return entry
     
     def get_latest_attribute(self, key: str) -> Optional[Attribute]:
         """Get the most recent value for an attribute"""
@@ -108,8 +151,14 @@ class Entity(BaseModel):
         """Get the value with highest confidence for an attribute"""
         if key not in self.attributes or not self.attributes[key]:
             return None
-        return max(self.attributes[key], 
-                  key=lambda x: (x.confidence.value, x.timestamp))
+        return max(self.attributes[key], key=_best_key)
+    
+    def keep_best_attributes(self):
+        """Drop every value but the best one for each attribute"""
+        self.attributes = {
+            key: [self.get_best_attribute(key)] for key, values in self.attributes.items() if values
+        }
+        self._by_value = {}
     
     class Config:
         json_encoders = {
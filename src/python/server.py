@@ -6,12 +6,27 @@ import os
 import sys
 from typing import Dict, Any, List, Optional
 from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel
 import uvicorn
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+# orjson serializes datetimes and enums natively, so responses can skip
+# FastAPI's jsonable_encoder pass entirely
+try:
+    import orjson  # noqa: F401
+    from fastapi.responses import ORJSONResponse
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Threads for spaCy / embedding inference; both release the GIL in native code
+EXECUTOR_WORKERS = min(8, os.cpu_count() or 1)
+
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
@@ -34,6 +49,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def send_json_response(data: Any, status: int = 200) -> Response:
+    """Serialize a response body directly, bypassing response-model re-validation"""
+    if ORJSON_AVAILABLE:
+        return ORJSONResponse(content=data, status_code=status)
+    return JSONResponse(content=jsonable_encoder(data), status_code=status)
+
+
 # Initialize knowledge manager
 knowledge_manager = KnowledgeGraphManager()
 
@@ -73,7 +95,7 @@ async def health_check():
     return HealthResponse(
         status="healthy",
         version="1.0.0",
-        nlp_available=knowledge_manager.nlp is not None,
+        nlp_available=knowledge_manager.nlp_available(),
         entities_count=len(knowledge_manager.entities),
         relationships_count=len(knowledge_manager.relationships)
     )
@@ -87,11 +109,11 @@ async def process_text(request: ProcessTextRequest):
             request.text,
             request.source
         )
-        return {
+        return send_json_response({
             "success": True,
             "data": result,
             "timestamp": datetime.utcnow().isoformat()
-        }
+        })
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -110,11 +132,11 @@ async def query_knowledge(request: QueryRequest):
         
         result = await knowledge_manager.query_knowledge(context)
         
-        return {
+        return send_json_response({
             "success": True,
             "data": result,
             "timestamp": datetime.utcnow().isoformat()
-        }
+        })
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -122,19 +144,19 @@ async def query_knowledge(request: QueryRequest):
 @app.get("/entities")
 async def list_entities(entity_type: Optional[str] = None):
     """List all entities, optionally filtered by type"""
-    entities = knowledge_manager.entities.values()
-    
     if entity_type:
-        entities = [e for e in entities if e.type.value == entity_type]
+        entities = knowledge_manager.entities_of_type(entity_type)
+    else:
+        entities = knowledge_manager.entities.values()
     
-    return {
+    return send_json_response({
         "success": True,
         "data": {
-            "entities": [e.dict() for e in entities],
+            "entities": [knowledge_manager.dump_entity(e) for e in entities],
             "count": len(entities)
         },
         "timestamp": datetime.utcnow().isoformat()
-    }
+    })
 
 
 @app.get("/entities/{entity_id}")
@@ -146,19 +168,16 @@ async def get_entity(entity_id: str):
         raise HTTPException(status_code=404, detail=f"Entity {entity_id} not found")
     
     # Get related relationships
-    relationships = [
-        r for r in knowledge_manager.relationships
-        if r.source_entity_id == entity_id or r.target_entity_id == entity_id
-    ]
+    relationships = knowledge_manager.relationships_for(entity_id)
     
-    return {
+    return send_json_response({
         "success": True,
         "data": {
-            "entity": entity.dict(),
-            "relationships": [r.dict() for r in relationships]
+            "entity": knowledge_manager.dump_entity(entity),
+            "relationships": [knowledge_manager.dump_relationship(r) for r in relationships]
         },
         "timestamp": datetime.utcnow().isoformat()
-    }
+    })
 
 
 @app.put("/entities/{entity_id}")
@@ -176,34 +195,31 @@ async def update_entity(entity_id: str, request: EntityUpdateRequest):
     # Resolve conflicts if needed
     entity = await knowledge_manager.resolve_conflicts(entity_id)
     
-    return {
+    return send_json_response({
         "success": True,
         "data": {
-            "entity": entity.dict()
+            "entity": knowledge_manager.dump_entity(entity)
         },
         "timestamp": datetime.utcnow().isoformat()
-    }
+    })
 
 
 @app.get("/relationships")
 async def list_relationships(entity_id: Optional[str] = None):
     """List all relationships, optionally filtered by entity"""
-    relationships = knowledge_manager.relationships
-    
     if entity_id:
-        relationships = [
-            r for r in relationships
-            if r.source_entity_id == entity_id or r.target_entity_id == entity_id
-        ]
+        relationships = knowledge_manager.relationships_for(entity_id)
+    else:
+        relationships = knowledge_manager.relationships
     
-    return {
+    return send_json_response({
         "success": True,
         "data": {
-            "relationships": [r.dict() for r in relationships],
+            "relationships": [knowledge_manager.dump_relationship(r) for r in relationships],
             "count": len(relationships)
         },
         "timestamp": datetime.utcnow().isoformat()
-    }
+    })
 
 
 @app.post("/canonical-locations")
@@ -217,13 +233,13 @@ async def get_canonical_locations(entity_ids: List[str]):
     
     file_mappings = await knowledge_manager.determine_canonical_locations(entities)
     
-    return {
+    return send_json_response({
         "success": True,
         "data": {
             "mappings": file_mappings
         },
         "timestamp": datetime.utcnow().isoformat()
-    }
+    })
 
 
 @app.post("/resolve-conflicts/{entity_id}")
@@ -234,13 +250,13 @@ async def resolve_entity_conflicts(entity_id: str):
     if not entity:
         raise HTTPException(status_code=404, detail=f"Entity {entity_id} not found")
     
-    return {
+    return send_json_response({
         "success": True,
         "data": {
-            "entity": entity.dict()
+            "entity": knowledge_manager.dump_entity(entity)
         },
         "timestamp": datetime.utcnow().isoformat()
-    }
+    })
 
 
 # Startup event
@@ -248,7 +264,10 @@ async def resolve_entity_conflicts(entity_id: str):
 async def startup_event():
     """Initialize the service on startup"""
     print("🚀 KnowledgeOS Intelligence API starting...")
-    print(f"📊 NLP available: {knowledge_manager.nlp is not None}")
+    # One shared pool for all blocking model calls made through asyncio.to_thread
+    app.state.executor = ThreadPoolExecutor(max_workers=EXECUTOR_WORKERS)
+    asyncio.get_running_loop().set_default_executor(app.state.executor)
+    print(f"📊 NLP available: {knowledge_manager.nlp_available()}")
     print("✅ Ready to accept connections")
 
 
@@ -256,6 +275,7 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup on shutdown"""
+    app.state.executor.shutdown(wait=False)
     print("👋 Shutting down KnowledgeOS Intelligence API")
 
 
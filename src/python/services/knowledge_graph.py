@@ -2,7 +2,11 @@
 Knowledge Graph Manager for entity-based knowledge management
 """
 import json
+import re
 import asyncio
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, defaultdict
 from typing import Dict, List, Optional, Tuple, Any
 from datetime import datetime
 import spacy
@@ -11,7 +15,37 @@ import numpy as np
 
 from ..models.entities import (
     Entity, EntityType, Relationship, RelationType, 
-    ConfidenceLevel, KnowledgeContext
+    ConfidenceLevel, KnowledgeContext, CONF_RANK
+)
+from ..embedding_codec import quantize_embedding, unit_embedding
+
+# NLP models, loaded on first use
+SPACY_MODEL = "en_core_web_sm"
+# Only doc.ents is used, so the pipes that NER does not depend on are skipped
+SPACY_DISABLED_PIPES = ["parser", "tagger", "lemmatizer", "attribute_ruler"]
+EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+
+# Embeddings of recently encoded texts (names and queries) kept in memory
+EMBEDDING_CACHE_SIZE = 10_000
+
+
+# Phrases that signal a relationship between the entities of a text
+RELATIONSHIP_PATTERNS = {
+    "works at": RelationType.WORKS_AT,
+    "employed by": RelationType.WORKS_AT,
+    "manages": RelationType.MANAGES,
+    "reports to": RelationType.REPORTS_TO,
+    "located in": RelationType.LOCATED_IN,
+    "brother": RelationType.RELATED_TO,
+    "sister": RelationType.RELATED_TO,
+    "parent": RelationType.RELATED_TO,
+    "friend": RelationType.KNOWS
+}
+
+# All phrases as one alternation, so the text is scanned once rather than once per phrase
+RELATIONSHIP_REGEX = re.compile(
+    '|'.join(re.escape(pattern) for pattern in sorted(RELATIONSHIP_PATTERNS, key=len, reverse=True)),
+    re.IGNORECASE
 )
 
 
@@ -21,16 +55,35 @@ class KnowledgeGraphManager:
     def __init__(self):
         # Entity storage (in production, this would be a database)
         self.entities: Dict[str, Entity] = {}
-        self.relationships: List[Relationship] = []
+        # Entity ids by type, in insertion order
+        self._entities_by_type: Dict[EntityType, List[str]] = defaultdict(list)
+        # Relationships keyed by (source, target, type), plus per-entity adjacency lists
+        self._rel_map: Dict[Tuple[str, str, str], Relationship] = {}
+        self._rel_by_source: Dict[str, List[Relationship]] = defaultdict(list)
+        self._rel_by_target: Dict[str, List[Relationship]] = defaultdict(list)
+        # model_dump() output by id, dropped whenever the object changes
+        self._entity_dumps: Dict[str, Dict[str, Any]] = {}
+        self._relationship_dumps: Dict[str, Dict[str, Any]] = {}
         
-        # Load NLP models
-        try:
-            self.nlp = spacy.load("en_core_web_sm")
-        except:
-            # If model not installed, we'll handle it gracefully
-            self.nlp = None
-            
-        self.embedder = SentenceTransformer('all-MiniLM-L6-v2')
+        # NLP models are loaded lazily, so serving stored entities never pays for them
+        self._nlp = None
+        self._nlp_loaded = False
+        self._embedder = None
+        self._model_lock = threading.Lock()
+        
+        # L2-normalized entity embeddings, one row per entity in _entity_ids order;
+        # _embedding_matrix is a view of the first rows of _embedding_buffer
+        self._embedding_buffer: Optional[np.ndarray] = None
+        self._embedding_matrix = np.empty((0, 0), dtype=np.float32)
+        self._entity_ids: List[str] = []
+        self._entity_rows: Dict[str, int] = {}
+        # Per row: number of embeddings averaged into it and the norm of that mean
+        self._embedding_counts: List[int] = []
+        self._embedding_norms: List[float] = []
+        
+        # LRU of normalized text -> unit embedding
+        self._emb_cache: 'OrderedDict[str, np.ndarray]' = OrderedDict()
+        self._emb_cache_lock = threading.Lock()
         
         # Canonical file mappings
         self.canonical_mappings = {
@@ -47,15 +100,79 @@ class KnowledgeGraphManager:
             }
         }
     
+    @property
+    def nlp(self):
+        """spaCy pipeline, or None if the model is not installed"""
+        if not self._nlp_loaded:
+            with self._model_lock:
+                if not self._nlp_loaded:
+                    try:
+                        self._nlp = spacy.load(SPACY_MODEL, disable=SPACY_DISABLED_PIPES)
+                    except:
+                        # If model not installed, we'll handle it gracefully
+                        self._nlp = None
+                    self._nlp_loaded = True
+        return self._nlp
+    
+    @property
+    def embedder(self) -> SentenceTransformer:
+        """Sentence embedding model"""
+        if self._embedder is None:
+            with self._model_lock:
+                if self._embedder is None:
+                    self._embedder = SentenceTransformer(EMBEDDING_MODEL)
+        return self._embedder
+    
+    def nlp_available(self) -> bool:
+        """Whether NER is available, without loading the model"""
+        if self._nlp_loaded:
+            return self._nlp is not None
+        return spacy.util.is_package(SPACY_MODEL)
+    
+    @property
+    def relationships(self) -> List[Relationship]:
+        """All relationships in insertion order"""
+        return list(self._rel_map.values())
+    
+    def relationships_for(self, entity_id: str) -> List[Relationship]:
+        """Relationships in which the entity is the source or the target"""
+        outgoing = self._rel_by_source.get(entity_id, [])
+        incoming = [r for r in self._rel_by_target.get(entity_id, []) if r.source_entity_id != entity_id]
+        return outgoing + incoming
+    
+    def dump_entity(self, entity: Entity) -> Dict[str, Any]:
+        """Serialized entity, reused until the entity changes"""
+        dump = self._entity_dumps.get(entity.id)
+        if dump is None:
+            dump = self._entity_dumps[entity.id] = entity.model_dump()
+        return dump
+    
+    def dump_relationship(self, relationship: Relationship) -> Dict[str, Any]:
+        """Serialized relationship, reused until the relationship changes"""
+        dump = self._relationship_dumps.get(relationship.id)
+        if dump is None:
+            dump = self._relationship_dumps[relationship.id] = relationship.model_dump()
+        return dump
+    
+    def entities_of_type(self, entity_type: str) -> List[Entity]:
+        """Entities of the given type; unknown types have none"""
+        try:
+            ids = self._entities_by_type.get(EntityType(entity_type), [])
+        except ValueError:
+            return []
+        return [self.entities[entity_id] for entity_id in ids]
+    
     async def process_information(self, text: str, source: str = "user") -> Dict[str, Any]:
         """Process new information and update knowledge graph"""
         # Extract entities
-        entities = await self.extract_entities(text)
+        mentions = await self.extract_mentions(text)
+        entities = [entity for entity, _, _ in mentions]
         
         # Extract relationships
-        relationships = await self.extract_relationships(text, entities)
+        relationships = await self.extract_relationships(text, mentions)
         
-        # Merge with existing knowledge
+        # Merge with existing knowledge. merge_entity and add_relationship never
+        # await, so each runs atomically on the event loop without a lock
         merged_entities = []
         for entity in entities:
             merged = await self.merge_entity(entity, source)
@@ -69,35 +186,83 @@ class KnowledgeGraphManager:
         file_mappings = await self.determine_canonical_locations(merged_entities)
         
         return {
-            "entities": [e.dict() for e in merged_entities],
-            "relationships": [r.dict() for r in relationships],
+            "entities": [self.dump_entity(e) for e in merged_entities],
+            "relationships": [r.model_dump() for r in relationships],
             "file_mappings": file_mappings,
             "summary": f"Processed {len(entities)} entities and {len(relationships)} relationships"
         }
     
     async def extract_entities(self, text: str) -> List[Entity]:
         """Extract entities from text using NLP"""
-        entities = []
+        return [entity for entity, _, _ in await self.extract_mentions(text)]
+    
+    async def extract_mentions(self, text: str) -> List[Tuple[Entity, int, int]]:
+        """Extract entities with the character span of each mention in the text"""
+        mentions = []
         
-        if self.nlp:
-            doc = self.nlp(text)
-            
+        # Model inference runs in the executor so the event loop keeps serving requests
+        doc = await asyncio.to_thread(self._parse, text)
+        if doc is not None:
             for ent in doc.ents:
                 entity_type = self._map_spacy_to_entity_type(ent.label_)
                 if entity_type:
-                    entity = Entity(
+                    # Built from our own NER output, so skip pydantic validation
+                    now = datetime.utcnow()
+                    entity = Entity.model_construct(
                         id=f"{entity_type.value}_{ent.text.lower().replace(' ', '_')}",
                         type=entity_type,
                         name=ent.text,
+                        aliases=[],
+                        attributes={},
+                        embeddings=None,
+                        canonical_file=None,
+                        confidence=ConfidenceLevel.HIGH,
+                        created_at=now,
+                        updated_at=now,
                         sources=[text[:100]]  # Store snippet as source
                     )
-                    
-                    # Generate embeddings
-                    entity.embeddings = self.embedder.encode(ent.text).tolist()
-                    
-                    entities.append(entity)
+                    mentions.append((entity, ent.start_char, ent.end_char))
+            
+            # Generate embeddings for all mentions in one batch
+            if mentions:
+                vectors = await asyncio.to_thread(
+                    self._encode_cached, [entity.name for entity, _, _ in mentions]
+                )
+                for (entity, _, _), vector in zip(mentions, vectors):
+                    entity.embeddings = quantize_embedding(vector)
+        
+        return mentions
+    
+    def _parse(self, text: str):
+        """Run the spaCy pipeline, or return None if it is unavailable"""
+        nlp = self.nlp
+        return nlp(text) if nlp else None
+    
+    def _encode_cached(self, texts: List[str]) -> np.ndarray:
+        """Unit embeddings for texts, encoding only those not seen recently"""
+        keys = [text.strip().lower() for text in texts]  # The model is uncased
+        found = {}
+        with self._emb_cache_lock:
+            for key in keys:
+                if key in self._emb_cache:
+                    self._emb_cache.move_to_end(key)
+                    found[key] = self._emb_cache[key]
+        
+        missing = [key for key in dict.fromkeys(keys) if key not in found]
+        if missing:
+            vectors = self.embedder.encode(
+                missing,
+                batch_size=32,
+                convert_to_numpy=True,
+                normalize_embeddings=True
+            )
+            with self._emb_cache_lock:
+                for key, vector in zip(missing, vectors):
+                    found[key] = self._emb_cache[key] = np.asarray(vector, dtype=np.float32)
+                while len(self._emb_cache) > EMBEDDING_CACHE_SIZE:
+                    self._emb_cache.popitem(last=False)
         
-        return entities
+        return np.array([found[key] for key in keys], dtype=np.float32)
     
     def _map_spacy_to_entity_type(self, label: str) -> Optional[EntityType]:
         """Map spaCy NER labels to our entity types"""
@@ -112,42 +277,44 @@ class KnowledgeGraphManager:
         }
         return mapping.get(label)
     
-    async def extract_relationships(self, text: str, entities: List[Entity]) -> List[Relationship]:
+    async def extract_relationships(self, text: str,
+                                    mentions: List[Tuple[Entity, int, int]]) -> List[Relationship]:
         """Extract relationships between entities"""
-        relationships = []
-        
-        # Simple pattern matching for relationships
-        patterns = {
-            "works at": RelationType.WORKS_AT,
-            "employed by": RelationType.WORKS_AT,
-            "manages": RelationType.MANAGES,
-            "reports to": RelationType.REPORTS_TO,
-            "located in": RelationType.LOCATED_IN,
-            "brother": RelationType.RELATED_TO,
-            "sister": RelationType.RELATED_TO,
-            "parent": RelationType.RELATED_TO,
-            "friend": RelationType.KNOWS
-        }
+        relationships = {}
         
-        text_lower = text.lower()
-        
-        for pattern, rel_type in patterns.items():
-            if pattern in text_lower:
-                # Try to find entity pairs around the pattern
-                for i, e1 in enumerate(entities):
-                    for e2 in entities[i+1:]:
-                        # Check if entities are near the pattern in text
-                        if e1.name in text and e2.name in text:
-                            rel = Relationship(
-                                id=f"rel_{e1.id}_{e2.id}_{rel_type.value}",
-                                type=rel_type,
-                                source_entity_id=e1.id,
-                                target_entity_id=e2.id,
-                                source=text[:100]
-                            )
-                            relationships.append(rel)
-        
-        return relationships
+        # Pair the closest mention before each relationship phrase with the
+        # closest one after it, e.g. "X works at Y"
+        mentions = sorted(mentions, key=lambda mention: mention[1])
+        starts = [start for _, start, _ in mentions]
+        ends = [end for _, _, end in mentions]
+        
+        for match in RELATIONSHIP_REGEX.finditer(text):
+            before = bisect_right(ends, match.start()) - 1
+            after = bisect_left(starts, match.end())
+            if before < 0 or after == len(mentions):
+                continue
+            
+            e1, e2 = mentions[before][0], mentions[after][0]
+            rel_type = RELATIONSHIP_PATTERNS[match.group(0).lower()]
+            rel_id = f"rel_{e1.id}_{e2.id}_{rel_type.value}"
+            if e1.id == e2.id or rel_id in relationships:
+                continue
+            
+            now = datetime.utcnow()
+            relationships[rel_id] = Relationship.model_construct(
+                id=rel_id,
+                type=rel_type,
+                source_entity_id=e1.id,
+                target_entity_id=e2.id,
+                attributes={},
+                confidence=ConfidenceLevel.HIGH,
+                temporal_context=None,
+                created_at=now,
+                updated_at=now,
+                source=text[:100]
+            )
+        
+        return list(relationships.values())
     
     async def merge_entity(self, new_entity: Entity, source: str) -> Entity:
         """Merge new entity with existing one or create new"""
@@ -156,6 +323,8 @@ class KnowledgeGraphManager:
         if not existing:
             # New entity
             self.entities[new_entity.id] = new_entity
+            self._entities_by_type[new_entity.type].append(new_entity.id)
+            self._index_embedding(new_entity)
             return new_entity
         
         # Merge attributes
@@ -169,32 +338,73 @@ class KnowledgeGraphManager:
                 existing.aliases.append(alias)
         
         # Update embeddings (average them)
-        if new_entity.embeddings and existing.embeddings:
-            existing.embeddings = (
-                (np.array(existing.embeddings) + np.array(new_entity.embeddings)) / 2
-            ).tolist()
+        if new_entity.embeddings and existing.id in self._entity_rows:
+            self._merge_embedding(existing, new_entity.embeddings)
         
         existing.updated_at = datetime.utcnow()
+        self._entity_dumps.pop(existing.id, None)
         return existing
     
+    def _index_embedding(self, entity: Entity):
+        """Store the entity's normalized embedding in the search matrix"""
+        if not entity.embeddings:
+            return
+        
+        vector = unit_embedding(entity.embeddings)
+        
+        row = self._entity_rows.get(entity.id)
+        if row is None:
+            row = len(self._entity_ids)
+            if self._embedding_buffer is None:
+                self._embedding_buffer = np.empty((64, vector.shape[0]), dtype=np.float32)
+            elif row == len(self._embedding_buffer):
+                # Double the buffer so appending an entity is amortized O(1)
+                buffer = np.empty((2 * row, self._embedding_buffer.shape[1]), dtype=np.float32)
+                buffer[:row] = self._embedding_buffer
+                self._embedding_buffer = buffer
+            self._entity_ids.append(entity.id)
+            self._entity_rows[entity.id] = row
+            self._embedding_counts.append(0)
+            self._embedding_norms.append(0.0)
+            self._embedding_matrix = self._embedding_buffer[:row + 1]
+        
+        self._embedding_buffer[row] = vector
+        self._embedding_counts[row] = 1
+        self._embedding_norms[row] = 1.0
+    
+    def _merge_embedding(self, entity: Entity, embedding: bytes):
+        """Fold another embedding into the entity's row as a running mean, in place"""
+        row = self._entity_rows[entity.id]
+        count = self._embedding_counts[row]
+        vector = self._embedding_buffer[row]
+        
+        # Rows are stored normalized; scale back to the running sum, add, renormalize
+        vector *= count * self._embedding_norms[row]
+        vector += unit_embedding(embedding)
+        norm = float(np.linalg.norm(vector)) or 1.0
+        vector /= norm
+        
+        self._embedding_counts[row] = count + 1
+        self._embedding_norms[row] = norm / (count + 1)
+        entity.embeddings = quantize_embedding(vector)
+    
     async def add_relationship(self, relationship: Relationship):
         """Add a relationship to the graph"""
         # Check for duplicates
-        existing = next(
-            (r for r in self.relationships 
-             if r.source_entity_id == relationship.source_entity_id
-             and r.target_entity_id == relationship.target_entity_id
-             and r.type == relationship.type),
-            None
-        )
+        key = (relationship.source_entity_id, relationship.target_entity_id, relationship.type.value)
+        
+        existing = self._rel_map.get(key)
         
         if not existing:
-            self.relationships.append(relationship)
+            self._rel_map[key] = relationship
+            self._rel_by_source[relationship.source_entity_id].append(relationship)
+            self._rel_by_target[relationship.target_entity_id].append(relationship)
         else:
             # Update confidence if higher
-            if relationship.confidence.value > existing.confidence.value:
+            if CONF_RANK[relationship.confidence] > CONF_RANK[existing.confidence]:
                 existing.confidence = relationship.confidence
             existing.updated_at = datetime.utcnow()
+            self._relationship_dumps.pop(existing.id, None)
     
     async def determine_canonical_locations(self, entities: List[Entity]) -> Dict[str, str]:
         """Determine where each entity's information should be stored"""
@@ -239,34 +449,33 @@ class KnowledgeGraphManager:
         }
         
         # Generate query embedding
-        query_embedding = self.embedder.encode(context.query)
-        
-        # Find relevant entities by similarity
-        entity_scores = []
-        for entity_id, entity in self.entities.items():
-            if entity.embeddings:
-                similarity = np.dot(query_embedding, entity.embeddings) / (
-                    np.linalg.norm(query_embedding) * np.linalg.norm(entity.embeddings)
-                )
-                entity_scores.append((entity, similarity))
+        query_embedding = (await asyncio.to_thread(self._encode_cached, [context.query]))[0]
+        
+        query_embedding = np.asarray(query_embedding, dtype=np.float32)
+        query_embedding = query_embedding / (np.linalg.norm(query_embedding) or 1.0)
         
-        # Sort by similarity and filter by threshold
-        entity_scores.sort(key=lambda x: x[1], reverse=True)
-        relevant_entities = [
-            e for e, score in entity_scores[:context.max_results]
-            if score > 0.3  # Similarity threshold
-        ]
+        # Find relevant entities by similarity: one matrix-vector product over all entities
+        relevant_entities = []
+        k = min(context.max_results, len(self._entity_ids))
+        if k > 0:
+            scores = self._embedding_matrix @ query_embedding
+            
+            # Select the top results without sorting every score, then filter by threshold
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind='stable')]
+            relevant_entities = [
+                self.entities[self._entity_ids[i]] for i in top
+                if scores[i] > 0.3  # Similarity threshold
+            ]
         
-        results["entities"] = [e.dict() for e in relevant_entities]
+        results["entities"] = [self.dump_entity(e) for e in relevant_entities]
         
         # Get relationships for relevant entities
         if context.include_related:
-            entity_ids = {e.id for e in relevant_entities}
-            relevant_relationships = [
-                r for r in self.relationships
-                if r.source_entity_id in entity_ids or r.target_entity_id in entity_ids
-            ]
-            results["relationships"] = [r.dict() for r in relevant_relationships]
+            relevant_relationships = list({
+                r.id: r for e in relevant_entities for r in self.relationships_for(e.id)
+            }.values())
+            results["relationships"] = [self.dump_relationship(r) for r in relevant_relationships]
         
         # Suggest files to search
         file_mappings = await self.determine_canonical_locations(relevant_entities)
@@ -281,10 +490,6 @@ class KnowledgeGraphManager:
             return None
         
         # For each attribute, keep the best value
-        resolved_attributes = {}
-        for key, attributes in entity.attributes.items():
-            best = max(attributes, key=lambda x: (x.confidence.value, x.timestamp))
-            resolved_attributes[key] = [best]
-        
-        entity.attributes = resolved_attributes
+        entity.keep_best_attributes()
+        self._entity_dumps.pop(entity_id, None)
         return entity
\ No newline at end of file
@@ -2,37 +2,100 @@
 Simplified Knowledge Management Service
 Minimal dependencies version for easy setup
 """
-import json
 import re
 from typing import Dict, List, Any, Optional
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 from urllib.parse import urlparse, parse_qs
 from datetime import datetime
 import threading
 import time
 
+# Use orjson when it happens to be installed; it reads and emits bytes directly.
+# The stdlib fallback keeps this server dependency-free.
+try:
+    import orjson
+
+    def json_dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj)
+
+    json_loads = orjson.loads
+except ImportError:
+    import json
+
+    def json_dumps(obj: Any) -> bytes:
+        return json.dumps(obj).encode('utf-8')
+
+    def json_loads(data) -> Any:
+        # Request bodies may arrive as a view of a reused buffer
+        return json.loads(bytes(data) if isinstance(data, memoryview) else data)
+
+# All entity patterns fused into one scanner, so the text is read once. At a
+# given position the first alternative wins; organization forms come first so
+# "Apple Inc" is not also taken for a person's full name.
+ORG_PATTERNS = [
+    r'(?P<org_suffix>\b(?i:[A-Z][a-z]+ (?:Inc|Corp|LLC|Company))\b)',
+    r'(?P<org_known>\b(?i:Apple|Google|Microsoft|Amazon|Facebook|Meta)\b)',
+]
+PERSON_PATTERNS = [
+    r'(?P<person_full>\b[A-Z][a-z]+ [A-Z][a-z]+\b)',  # Full names
+    r'(?P<person_known>\b(?:Julian|Clemens|Mark|Sarah|John|Jane)\b)',  # Known names
+]
+ENTITY_REGEX = re.compile('|'.join(ORG_PATTERNS + PERSON_PATTERNS))
+
+# Every organization match contains one of these words. Texts without any of
+# them are scanned for persons only, skipping the case-insensitive alternatives.
+ORG_HINTS = ('apple', 'google', 'microsoft', 'amazon', 'facebook', 'meta', 'inc', 'corp', 'llc', 'company')
+PERSON_REGEX = re.compile('|'.join(PERSON_PATTERNS))
+
+# Words of a query, looked up in the entity name index
+WORD_REGEX = re.compile(r'\w+')
+
+# /entities responses with more entities than this are streamed in batches of this size
+ENTITY_STREAM_BATCH = 256
+
+# Request bodies up to this size are read into a reused per-thread buffer
+REQUEST_BUFFER_SIZE = 64 * 1024
+
+_request_buffers = threading.local()
+
+# Entity type for each named group of ENTITY_REGEX
+ENTITY_GROUP_TYPES = {
+    'org_suffix': 'organization',
+    'org_known': 'organization',
+    'person_full': 'person',
+    'person_known': 'person',
+}
+
 
 class Entity:
     """Simple entity representation"""
-    def __init__(self, id: str, type: str, name: str):
+    __slots__ = ('id', 'type', 'name', 'attributes', 'confidence', 'created_at', 'updated_at',
+                 '_dict_cache')
+    
+    def __init__(self, id: str, type: str, name: str, timestamp: Optional[str] = None):
         self.id = id
         self.type = type
         self.name = name
         self.attributes = {}
         self.confidence = "high"
-        self.created_at = datetime.utcnow().isoformat()
-        self.updated_at = datetime.utcnow().isoformat()
+        now = timestamp or datetime.utcnow().isoformat()
+        self.created_at = now
+        self.updated_at = now
+        self._dict_cache = None
         
     def to_dict(self):
-        return {
-            'id': self.id,
-            'type': self.type,
-            'name': self.name,
-            'attributes': self.attributes,
-            'confidence': self.confidence,
-            'createdAt': self.created_at,
-            'updatedAt': self.updated_at
-        }
+        # Reused until updated_at moves; bump it whenever a field changes
+        if self._dict_cache is None or self._dict_cache['updatedAt'] != self.updated_at:
+            self._dict_cache = {
+                'id': self.id,
+                'type': self.type,
+                'name': self.name,
+                'attributes': self.attributes,
+                'confidence': self.confidence,
+                'createdAt': self.created_at,
+                'updatedAt': self.updated_at
+            }
+        return self._dict_cache
 
 
 class SimpleKnowledgeManager:
@@ -41,54 +104,54 @@ class SimpleKnowledgeManager:
     def __init__(self):
         self.entities = {}
         self.relationships = []
+        # (lowercase name, entity) pairs keyed by the first word of the name
+        self._names_by_word: Dict[str, List[tuple]] = {}
+        # Requests are handled on separate threads; guards the stores above
+        self.lock = threading.Lock()
         
-    def extract_entities(self, text: str) -> List[Entity]:
+    def extract_entities(self, text: str, timestamp: Optional[str] = None) -> List[Entity]:
         """Simple pattern-based entity extraction"""
+        # All entities of one text share a creation time
+        timestamp = timestamp or datetime.utcnow().isoformat()
         entities = []
+        seen = set()
         
-        # Extract person names (simple pattern)
-        person_patterns = [
-            r'\b([A-Z][a-z]+ [A-Z][a-z]+)\b',  # Full names
-            r'\b(Julian|Clemens|Mark|Sarah|John|Jane)\b',  # Known names
-        ]
-        
-        for pattern in person_patterns:
-            matches = re.findall(pattern, text)
-            for match in matches:
-                entity_id = f"person_{match.lower().replace(' ', '_')}"
-                entity = Entity(entity_id, "person", match)
-                entities.append(entity)
-        
-        # Extract organizations
-        org_patterns = [
-            r'\b(Apple|Google|Microsoft|Amazon|Facebook|Meta)\b',
-            r'\b([A-Z][a-z]+ (?:Inc|Corp|LLC|Company))\b',
-        ]
-        
-        for pattern in org_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            for match in matches:
-                entity_id = f"organization_{match.lower().replace(' ', '_')}"
-                entity = Entity(entity_id, "organization", match)
-                entities.append(entity)
+        text_lower = text.lower()
+        scanner = ENTITY_REGEX if any(hint in text_lower for hint in ORG_HINTS) else PERSON_REGEX
+        
+        for match in scanner.finditer(text):
+            entity_type = ENTITY_GROUP_TYPES[match.lastgroup]
+            name = match.group()
+            entity_id = f"{entity_type}_{name.lower().replace(' ', '_')}"
+            # Repeated mentions map to the same entity; only build it once
+            if entity_id in seen:
+                continue
+            seen.add(entity_id)
+            entities.append(Entity(entity_id, entity_type, name, timestamp))
         
         return entities
     
-    def process_text(self, text: str) -> Dict[str, Any]:
+    def process_text(self, text: str, timestamp: Optional[str] = None) -> Dict[str, Any]:
         """Process text and extract entities"""
-        entities = self.extract_entities(text)
+        entities = self.extract_entities(text, timestamp)
         
         # Store entities
-        for entity in entities:
-            if entity.id not in self.entities:
-                self.entities[entity.id] = entity
+        with self.lock:
+            for entity in entities:
+                if entity.id not in self.entities:
+                    self.entities[entity.id] = entity
+                    name_lower = entity.name.lower()
+                    first_word = name_lower.split(' ', 1)[0]
+                    self._names_by_word.setdefault(first_word, []).append((name_lower, entity))
         
         # Determine file mappings
+        text_lower = text.lower()
+        is_work_context = "work" in text_lower or "employ" in text_lower
         file_mappings = {}
         for entity in entities:
             if entity.type == "person":
                 # Check context
-                if "work" in text.lower() or "employ" in text.lower():
+                if is_work_context:
                     file_mappings[entity.id] = "Professional Journey.md"
                 else:
                     file_mappings[entity.id] = "Personal Info.md"
@@ -107,10 +170,13 @@ class SimpleKnowledgeManager:
         query_lower = query_text.lower()
         relevant_entities = []
         
-        # Find relevant entities
-        for entity_id, entity in self.entities.items():
-            if entity.name.lower() in query_lower:
-                relevant_entities.append(entity)
+        # Find relevant entities: look up names starting at each query word,
+        # then confirm multi-word names against the whole query
+        with self.lock:
+            for word in dict.fromkeys(WORD_REGEX.findall(query_lower)):
+                for name_lower, entity in self._names_by_word.get(word, []):
+                    if name_lower in query_lower:
+                        relevant_entities.append(entity)
         
         # Suggest files based on query
         suggested_files = []
@@ -133,10 +199,14 @@ class KnowledgeAPIHandler(BaseHTTPRequestHandler):
     
     manager = SimpleKnowledgeManager()
     
+    # Keep connections open between requests; every response sets Content-Length
+    protocol_version = 'HTTP/1.1'
+    
     def do_OPTIONS(self):
         """Handle CORS preflight"""
         self.send_response(200)
         self.send_cors_headers()
+        self.send_header('Content-Length', '0')
         self.end_headers()
     
     def send_cors_headers(self):
@@ -158,7 +228,12 @@ class KnowledgeAPIHandler(BaseHTTPRequestHandler):
                 'relationships_count': len(self.manager.relationships)
             })
         elif parsed.path == '/entities':
-            entities = [e.to_dict() for e in self.manager.entities.values()]
+            with self.manager.lock:
+                entities = list(self.manager.entities.values())
+            if len(entities) > ENTITY_STREAM_BATCH and self.request_version == 'HTTP/1.1':
+                self.send_entities_stream(entities)
+                return
+            entities = [e.to_dict() for e in entities]
             self.send_json_response({
                 'success': True,
                 'data': {
@@ -173,24 +248,38 @@ class KnowledgeAPIHandler(BaseHTTPRequestHandler):
         """Handle POST requests"""
         content_length = int(self.headers.get('Content-Length', 0))
         if content_length > 0:
-            body = self.rfile.read(content_length)
+            body = self.read_body(content_length)
             try:
-                data = json.loads(body.decode('utf-8'))
-            except json.JSONDecodeError:
+                data = json_loads(body)
+            except ValueError:
                 self.send_error(400, 'Invalid JSON')
                 return
         else:
             data = {}
         
         parsed = urlparse(self.path)
+        # One clock read per request, shared by the response and every entity it creates
+        timestamp = datetime.utcnow().isoformat()
         
         if parsed.path == '/process':
             text = data.get('text', '')
-            result = self.manager.process_text(text)
+            result = self.manager.process_text(text, timestamp)
             self.send_json_response({
                 'success': True,
                 'data': result,
-                'timestamp': datetime.utcnow().isoformat()
+                'timestamp': timestamp
+            })
+        elif parsed.path == '/process_batch':
+            # Several texts per request, so the per-request overhead is paid once
+            texts = data.get('texts', [])
+            if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+                self.send_error(400, 'texts must be a list of strings')
+                return
+            results = [self.manager.process_text(text, timestamp) for text in texts]
+            self.send_json_response({
+                'success': True,
+                'data': results,
+                'timestamp': timestamp
             })
         elif parsed.path == '/query':
             query = data.get('query', '')
@@ -198,18 +287,59 @@ class KnowledgeAPIHandler(BaseHTTPRequestHandler):
             self.send_json_response({
                 'success': True,
                 'data': result,
-                'timestamp': datetime.utcnow().isoformat()
+                'timestamp': timestamp
             })
         else:
             self.send_error(404, 'Not Found')
     
+    def read_body(self, content_length: int):
+        """Read the request body through this thread's buffer instead of a fresh allocation"""
+        if content_length > REQUEST_BUFFER_SIZE:
+            return self.rfile.read(content_length)
+        
+        buffer = getattr(_request_buffers, 'buffer', None)
+        if buffer is None:
+            buffer = _request_buffers.buffer = bytearray(REQUEST_BUFFER_SIZE)
+        
+        view = memoryview(buffer)
+        received = 0
+        while received < content_length:
+            count = self.rfile.readinto(view[received:content_length])
+            if not count:
+                break
+            received += count
+        # Parsed in place; the view is only valid until this thread's next request
+        return view[:received]
+    
+    def send_entities_stream(self, entities: List[Entity]):
+        """Send the /entities response in chunks, serializing a batch of entities at a time"""
+        self.send_response(200)
+        self.send_cors_headers()
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        
+        self.write_chunk(b'{"success":true,"data":{"entities":[')
+        for start in range(0, len(entities), ENTITY_STREAM_BATCH):
+            batch = entities[start:start + ENTITY_STREAM_BATCH]
+            chunk = b','.join(json_dumps(e.to_dict()) for e in batch)
+            self.write_chunk(chunk if start == 0 else b',' + chunk)
+        self.write_chunk(b'],"count":%d}}' % len(entities))
+        self.wfile.write(b'0\r\n\r\n')
+    
+    def write_chunk(self, chunk: bytes):
+        """Write one chunk of a chunked response"""
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+    
     def send_json_response(self, data: Dict[str, Any]):
         """Send JSON response"""
+        body = json_dumps(data)
         self.send_response(200)
         self.send_cors_headers()
         self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
         self.end_headers()
-        self.wfile.write(json.dumps(data).encode('utf-8'))
+        self.wfile.write(body)
     
     def log_message(self, format, *args):
         """Custom logging"""
@@ -218,7 +348,7 @@ class KnowledgeAPIHandler(BaseHTTPRequestHandler):
 
 def run_server(port: int = 8000):
     """Run the simple HTTP server"""
-    server = HTTPServer(('127.0.0.1', port), KnowledgeAPIHandler)
+    server = ThreadingHTTPServer(('127.0.0.1', port), KnowledgeAPIHandler)
     print(f"🚀 Simple Knowledge Service starting on http://127.0.0.1:{port}")
     print("📊 No heavy dependencies required!")
     print("✅ Ready to accept connections")
@@ -0,0 +1,140 @@
+"""
+Tests for the coding knowledge API and its keyword search
+Run with: python -m pytest test_coding_knowledge_api.py
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+
+from fastapi.testclient import TestClient
+
+import coding_knowledge_api
+from coding_knowledge_service import CodingKnowledgeService
+
+CRAWL_RESULTS = [{
+    'url': 'https://docs.example.com/requests',
+    'title': 'Requests quickstart',
+    'content': 'Make a request with requests.get',
+    'metadata': {'language': 'python', 'framework': 'requests'},
+    'codeBlocks': [{
+        'title': 'GET request',
+        'description': 'Fetch a page with requests.get',
+        'language': 'python',
+        'code': 'response = requests.get(url, timeout=5)',
+    }],
+    'apiReferences': [{
+        'className': 'Session',
+        'methodName': 'mount',
+        'signature': 'Session.mount(prefix, adapter)',
+        'description': 'Register a connection adapter for a prefix',
+    }],
+}]
+
+
+@pytest.fixture
+def service(tmp_path):
+    service = CodingKnowledgeService(str(tmp_path))
+    service.save_crawl_results(CRAWL_RESULTS)
+    return service
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(coding_knowledge_api, 'WORKSPACE_PATH', str(tmp_path))
+    with TestClient(coding_knowledge_api.app) as client:
+        client.app.state.knowledge_service.save_crawl_results(CRAWL_RESULTS)
+        yield client
+
+
+def test_fts_query_quotes_every_word():
+    assert CodingKnowledgeService._fts_query('foo:bar "baz') == '"foo" "bar" "baz"'
+    assert CodingKnowledgeService._fts_query('NEAR(a b) OR -c*') == '"NEAR" "a" "b" "OR" "c"'
+    assert CodingKnowledgeService._fts_query('"() :*') == ''
+
+
+@pytest.mark.parametrize('query', ['requests.get(url', 'timeout:5 "', 'Session.mount(prefix, adapter)'])
+def test_keyword_search_accepts_fts_syntax_characters(service, query):
+    results = service.search_code(query, 'keyword')
+    assert results
+    assert all(0.0 <= result['score'] < 1.0 for result in results)
+
+
+def test_keyword_search_without_words_returns_nothing(service):
+    assert service.search_code('"*:()', 'keyword') == []
+
+
+def crawl_result(url, **fields):
+    return dict(CRAWL_RESULTS[0], url=url, **fields)
+
+
+def test_staged_crawl_does_not_block_other_saves(service):
+    writer = service.crawl_writer()
+    try:
+        writer.add([crawl_result('https://docs.example.com/streamed')])
+        # Until commit the streamed crawl holds no write lock and is not visible
+        assert service.save_crawl_results([crawl_result('https://docs.example.com/other')])['success']
+        assert service.get_statistics()['total_docs'] == 2
+        assert writer.commit()['success']
+    finally:
+        writer.close()
+    assert service.get_statistics()['total_docs'] == 3
+
+
+def test_save_crawl_is_all_or_nothing(client, monkeypatch):
+    monkeypatch.setattr(coding_knowledge_api, 'SAVE_CRAWL_BATCH_SIZE', 2)
+    results = [crawl_result(f'https://docs.example.com/{i}') for i in range(5)]
+    # api_references.method_name is NOT NULL, so the last batch fails to insert
+    results[4]['apiReferences'] = [{'signature': 'broken()'}]
+
+    response = client.post('/save-crawl', json={'results': results})
+
+    assert response.json()['success'] is False
+    assert client.get('/statistics').json()['total_docs'] == 1
+
+    response = client.post('/save-crawl', json={'results': results[:4]})
+    assert response.json()['stats']['docs_saved'] == 4
+    assert client.get('/statistics').json()['total_docs'] == 5
+
+
+def test_search_batch_returns_results_per_query(client):
+    response = client.post('/search-batch', json={
+        'queries': ['requests get', 'Session mount', 'nothing matches this'],
+        'search_type': 'keyword',
+    })
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body['success'] is True
+    assert body['count'] == 3
+    assert body['results'][0] and body['results'][1]
+    assert body['results'][2] == []
+
+
+def test_search_batch_matches_single_searches(client):
+    queries = ['requests get', 'Session mount']
+    response = client.post('/search-batch', json={'queries': queries, 'search_type': 'keyword'})
+
+    for query, batch_results in zip(queries, response.json()['results']):
+        single = client.post('/search', json={'query': query, 'search_type': 'keyword'}).json()
+        assert batch_results == single['results']
+
+
+@pytest.mark.parametrize('queries', ['requests get', ['requests', 5], {'q': 'requests'}, None])
+def test_search_batch_rejects_queries_that_are_not_a_list_of_strings(client, queries):
+    response = client.post('/search-batch', json={'queries': queries})
+
+    assert response.status_code == 400
+    assert 'queries' in response.json()['error']
+
+
+def test_search_batch_rejects_invalid_json(client):
+    response = client.post('/search-batch', content=b'{"queries": [',
+                           headers={'Content-Type': 'application/json'})
+    assert response.status_code == 400
@@ -0,0 +1,50 @@
+"""
+Tests for overlap detection in the enhanced knowledge service
+Run with: python -m pytest test_enhanced_knowledge_service.py
+"""
+
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("spacy")
+pytest.importorskip("sentence_transformers")
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from enhanced_knowledge_service import suffix_prefix_overlap
+
+
+def naive_overlap(text, pattern):
+    for length in range(min(len(text), len(pattern)), 0, -1):
+        if text.endswith(pattern[:length]):
+            return length
+    return 0
+
+
+@pytest.mark.parametrize('text, pattern, expected', [
+    ('hello world', 'world peace', 5),
+    ('abc def', 'def ghi', 3),
+    ('abc', 'xyz', 0),
+    ('', 'abc', 0),
+    ('abc', '', 0),
+    ('abc', 'abc', 3),
+    ('xabc', 'abc', 3),
+    ('aaaa', 'aaab', 3),
+    # The matcher has to fall back through the failure function
+    ('abababa', 'ababac', 5),
+    ('aabaab', 'aabaaab', 3),
+    ('naïve café', 'café olé', 4),
+])
+def test_suffix_prefix_overlap(text, pattern, expected):
+    assert suffix_prefix_overlap(text, pattern) == expected
+
+
+def test_suffix_prefix_overlap_matches_naive_scan():
+    alphabet = 'ab'
+    words = [''.join(alphabet[(n >> bit) & 1] for bit in range(length))
+             for length in range(7) for n in range(2 ** length)]
+    for text in words:
+        for pattern in words:
+            assert suffix_prefix_overlap(text, pattern) == naive_overlap(text, pattern), (text, pattern)
@@ -0,0 +1,106 @@
+"""
+Tests for attribute selection on the Entity model
+Run with: python -m pytest test_entities.py
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from models.entities import Attribute, ConfidenceLevel, Entity, EntityType
+
+
+def make_entity() -> Entity:
+    return Entity(id="person_julian", type=EntityType.PERSON, name="Julian")
+
+
+def test_best_attribute_ranks_confidence_numerically():
+    entity = make_entity()
+    entity.add_attribute("employer", "Apple", "source1", ConfidenceLevel.HIGH)
+    entity.add_attribute("employer", "Google", "source2", ConfidenceLevel.LOW)
+    entity.add_attribute("employer", "Yorizon", "source3", ConfidenceLevel.MEDIUM)
+
+    # "low" > "high" as strings; the numeric ranking must still prefer HIGH
+    assert entity.get_best_attribute("employer").value == "Apple"
+    assert entity.get_latest_attribute("employer").value == "Yorizon"
+
+
+def test_best_attribute_prefers_recent_value_on_equal_confidence():
+    entity = make_entity()
+    entity.add_attribute("city", "Berlin")
+    entity.add_attribute("city", "Munich")
+    assert entity.get_best_attribute("city").value == "Munich"
+
+    # Seeing an older value again makes it the newest
+    entity.add_attribute("city", "Berlin")
+    assert entity.get_best_attribute("city").value == "Berlin"
+    assert entity.get_latest_attribute("city").value == "Berlin"
+    assert len(entity.attributes["city"]) == 2
+
+
+def test_repeated_value_upgrades_confidence():
+    entity = make_entity()
+    entity.add_attribute("role", "Engineer", confidence=ConfidenceLevel.LOW)
+    entity.add_attribute("role", "Designer", confidence=ConfidenceLevel.MEDIUM)
+    entity.add_attribute("role", "Engineer", confidence=ConfidenceLevel.VERIFIED)
+
+    best = entity.get_best_attribute("role")
+    assert best.value == "Engineer"
+    assert best.confidence == ConfidenceLevel.VERIFIED
+
+
+def test_direct_append_is_seen_by_cached_lookups():
+    entity = make_entity()
+    entity.add_attribute("employer", "Apple", confidence=ConfidenceLevel.HIGH)
+    assert entity.get_best_attribute("employer").value == "Apple"
+
+    entity.attributes["employer"].append(
+        Attribute(key="employer", value="Yorizon", confidence=ConfidenceLevel.VERIFIED)
+    )
+    assert entity.get_best_attribute("employer").value == "Yorizon"
+    assert entity.get_latest_attribute("employer").value == "Yorizon"
+
+
+def test_direct_list_replacement_is_seen_by_cached_lookups():
+    entity = make_entity()
+    entity.add_attribute("city", "Berlin")
+    entity.attributes["city"] = [Attribute(key="city", value="Hamburg")]
+
+    assert entity.get_best_attribute("city").value == "Hamburg"
+
+    # add_attribute must not think "Berlin" is still stored
+    entity.add_attribute("city", "Berlin")
+    assert [attr.value for attr in entity.attributes["city"]] == ["Hamburg", "Berlin"]
+
+
+def test_direct_timestamp_and_confidence_writes_are_seen():
+    entity = make_entity()
+    entity.add_attribute("city", "Berlin")
+    entity.add_attribute("city", "Munich")
+    assert entity.get_latest_attribute("city").value == "Munich"
+
+    berlin = entity.attributes["city"][0]
+    berlin.timestamp = datetime.utcnow() + timedelta(days=1)
+    assert entity.get_latest_attribute("city").value == "Berlin"
+
+    munich = entity.attributes["city"][1]
+    munich.confidence = ConfidenceLevel.VERIFIED
+    assert entity.get_best_attribute("city").value == "Munich"
+
+
+def test_keep_best_attributes():
+    entity = make_entity()
+    entity.add_attribute("employer", "Apple", confidence=ConfidenceLevel.VERIFIED)
+    entity.add_attribute("employer", "Google", confidence=ConfidenceLevel.LOW)
+    entity.add_attribute("city", "Berlin")
+    entity.attributes["empty"] = []
+
+    entity.keep_best_attributes()
+
+    assert {key: [attr.value for attr in values] for key, values in entity.attributes.items()} == {
+        "employer": ["Apple"],
+        "city": ["Berlin"],
+    }
+    assert entity.get_latest_attribute("employer").value == "Apple"
@@ -0,0 +1,110 @@
+"""
+Tests for relationship extraction in the knowledge graph
+Run with: python -m pytest test_knowledge_graph.py
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("spacy")
+pytest.importorskip("sentence_transformers")
+
+# services/ uses package-relative imports, so import it through src/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from python.models.entities import Entity, EntityType, RelationType
+from python.services.knowledge_graph import KnowledgeGraphManager
+
+
+def mention(text, name, entity_type=EntityType.PERSON, occurrence=0):
+    start = -1
+    for _ in range(occurrence + 1):
+        start = text.index(name, start + 1)
+    entity = Entity(id=f"{entity_type.value}_{name.lower().replace(' ', '_')}", type=entity_type, name=name)
+    return entity, start, start + len(name)
+
+
+def extract(text, mentions):
+    # extract_relationships never touches the NLP models
+    return asyncio.run(KnowledgeGraphManager().extract_relationships(text, mentions))
+
+
+def pairs(relationships):
+    return [(r.source_entity_id, r.target_entity_id, r.type) for r in relationships]
+
+
+def test_pairs_closest_mentions_around_phrase():
+    text = "Julian works at Apple"
+    mentions = [mention(text, "Julian"), mention(text, "Apple", EntityType.ORGANIZATION)]
+
+    assert pairs(extract(text, mentions)) == [
+        ("person_julian", "organization_apple", RelationType.WORKS_AT)
+    ]
+
+
+def test_mentions_do_not_need_to_be_sorted():
+    text = "Sarah manages Mark and Mark reports to Sarah"
+    mentions = [
+        mention(text, "Sarah", occurrence=1),
+        mention(text, "Mark", occurrence=1),
+        mention(text, "Mark"),
+        mention(text, "Sarah"),
+    ]
+
+    assert pairs(extract(text, mentions)) == [
+        ("person_sarah", "person_mark", RelationType.MANAGES),
+        ("person_mark", "person_sarah", RelationType.REPORTS_TO),
+    ]
+
+
+def test_uses_nearest_mention_on_each_side():
+    text = "Clemens met Julian who works at Apple near Google"
+    mentions = [
+        mention(text, "Clemens"),
+        mention(text, "Julian"),
+        mention(text, "Apple", EntityType.ORGANIZATION),
+        mention(text, "Google", EntityType.ORGANIZATION),
+    ]
+
+    assert pairs(extract(text, mentions)) == [
+        ("person_julian", "organization_apple", RelationType.WORKS_AT)
+    ]
+
+
+def test_phrase_matching_is_case_insensitive():
+    text = "Julian Works At Apple"
+    mentions = [mention(text, "Julian"), mention(text, "Apple", EntityType.ORGANIZATION)]
+
+    assert pairs(extract(text, mentions)) == [
+        ("person_julian", "organization_apple", RelationType.WORKS_AT)
+    ]
+
+
+def test_phrase_without_mention_on_both_sides_is_skipped():
+    text = "works at Apple, and Julian is employed by"
+    mentions = [mention(text, "Apple", EntityType.ORGANIZATION), mention(text, "Julian")]
+
+    assert extract(text, mentions) == []
+
+
+def test_self_pairs_and_duplicates_are_dropped():
+    text = "Julian manages Julian. Mark manages Sarah and Mark manages Sarah"
+    mentions = [
+        mention(text, "Julian"),
+        mention(text, "Julian", occurrence=1),
+        mention(text, "Mark"),
+        mention(text, "Sarah"),
+        mention(text, "Mark", occurrence=1),
+        mention(text, "Sarah", occurrence=1),
+    ]
+
+    assert pairs(extract(text, mentions)) == [
+        ("person_mark", "person_sarah", RelationType.MANAGES)
+    ]
+
+
+def test_no_mentions():
+    assert extract("Julian works at Apple", []) == []
@@ -9,7 +9,7 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from services.knowledge_graph import KnowledgeGraphManager
-from models.entities import KnowledgeContext
+from models.entities import KnowledgeContext, ConfidenceLevel
 
 async def test_knowledge_service():
     """Test the knowledge management service"""
@@ -99,9 +99,11 @@ async def test_knowledge_service():
     # Add conflicting information
     if all_entities:
         entity = all_entities[0]
-        entity.add_attribute("test_attr", "value1", "source1")
-        entity.add_attribute("test_attr", "value2", "source2")
-        entity.add_attribute("test_attr", "value3", "source3")
+        # Confidence is ranked numerically: HIGH must beat the newer LOW and
+        # MEDIUM values (as strings, "medium" > "low" > "high")
+        entity.add_attribute("test_attr", "value1", "source1", ConfidenceLevel.HIGH)
+        entity.add_attribute("test_attr", "value2", "source2", ConfidenceLevel.LOW)
+        entity.add_attribute("test_attr", "value3", "source3", ConfidenceLevel.MEDIUM)
         
         print(f"Entity '{entity.name}' has conflicting values for 'test_attr':")
         if "test_attr" in entity.attributes:
@@ -114,6 +116,8 @@ async def test_knowledge_service():
         if resolved and "test_attr" in resolved.attributes:
             for attr in resolved.attributes["test_attr"]:
                 print(f"  - {attr.value} (confidence: {attr.confidence})")
+            kept = [attr.value for attr in resolved.attributes["test_attr"]]
+            print("  ✅ kept the HIGH value" if kept == ["value1"] else f"  ❌ expected ['value1'], kept {kept}")
     
     print("\n✅ All tests completed!")
 
@@ -0,0 +1,135 @@
+"""
+Tests for the simple knowledge server endpoints
+Run with: python -m pytest test_simple_server.py
+"""
+
+import http.client
+import json
+import os
+import sys
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import simple_server
+from simple_server import ENTITY_STREAM_BATCH, KnowledgeAPIHandler, SimpleKnowledgeManager
+
+
+@pytest.fixture
+def server(monkeypatch):
+    # Every test gets a fresh store and silent request logging
+    monkeypatch.setattr(KnowledgeAPIHandler, 'manager', SimpleKnowledgeManager())
+    monkeypatch.setattr(KnowledgeAPIHandler, 'log_message', lambda *args: None)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), KnowledgeAPIHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def request(server, method, path, payload=None):
+    conn = http.client.HTTPConnection(*server.server_address, timeout=10)
+    try:
+        body = json.dumps(payload) if payload is not None else None
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        conn.request(method, path, body=body, headers=headers)
+        response = conn.getresponse()
+        return response, json.loads(response.read())
+    finally:
+        conn.close()
+
+
+def test_process_batch_matches_process_per_text(server):
+    texts = ['Julian works at Apple Inc', 'Sarah Connor met John at Google', 'no entities here']
+    response, body = request(server, 'POST', '/process_batch', {'texts': texts})
+
+    assert response.status == 200
+    assert body['success'] is True
+    assert len(body['data']) == len(texts)
+
+    names = [sorted(e['name'] for e in result['entities']) for result in body['data']]
+    assert names[0] == ['Apple Inc', 'Julian']
+    assert 'Sarah Connor' in names[1] and 'Google' in names[1]
+    assert names[2] == []
+
+    # Every text of the batch is stored, as if sent to /process one by one
+    _, entities = request(server, 'GET', '/entities')
+    assert entities['data']['count'] == len({name for batch in names for name in batch})
+
+
+def test_process_batch_shares_one_timestamp(server):
+    _, body = request(server, 'POST', '/process_batch', {'texts': ['Julian at Apple', 'Clemens at Google']})
+
+    created = {e['createdAt'] for result in body['data'] for e in result['entities']}
+    assert created == {body['timestamp']}
+
+
+def test_process_batch_without_texts(server):
+    response, body = request(server, 'POST', '/process_batch', {})
+    assert response.status == 200
+    assert body['data'] == []
+
+
+@pytest.mark.parametrize('texts', ['Julian at Apple', ['Julian at Apple', 5], {'text': 'Julian'}, None])
+def test_process_batch_rejects_texts_that_are_not_a_list_of_strings(server, texts):
+    conn = http.client.HTTPConnection(*server.server_address, timeout=10)
+    try:
+        conn.request('POST', '/process_batch', body=json.dumps({'texts': texts}),
+                     headers={'Content-Type': 'application/json'})
+        response = conn.getresponse()
+        response.read()
+    finally:
+        conn.close()
+
+    assert response.status == 400
+    _, entities = request(server, 'GET', '/entities')
+    assert entities['data']['count'] == 0
+
+
+def test_entities_small_response_has_content_length(server):
+    request(server, 'POST', '/process', {'text': 'Julian works at Apple'})
+    response, body = request(server, 'GET', '/entities')
+
+    assert response.getheader('Content-Length') is not None
+    assert response.getheader('Transfer-Encoding') is None
+    assert body['data']['count'] == 2
+
+
+def test_entities_large_response_is_chunked(server):
+    manager = KnowledgeAPIHandler.manager
+    count = ENTITY_STREAM_BATCH * 2 + 3
+    for i in range(count):
+        entity = simple_server.Entity(f'person_{i}', 'person', f'Person {i}')
+        manager.entities[entity.id] = entity
+
+    response, body = request(server, 'GET', '/entities')
+
+    assert response.getheader('Transfer-Encoding') == 'chunked'
+    assert response.getheader('Content-Length') is None
+    assert body['success'] is True
+    assert body['data']['count'] == count
+    assert [e['id'] for e in body['data']['entities']] == [f'person_{i}' for i in range(count)]
+
+
+def test_entities_large_response_keeps_connection_usable(server):
+    manager = KnowledgeAPIHandler.manager
+    for i in range(ENTITY_STREAM_BATCH + 1):
+        entity = simple_server.Entity(f'person_{i}', 'person', f'Person {i}')
+        manager.entities[entity.id] = entity
+
+    conn = http.client.HTTPConnection(*server.server_address, timeout=10)
+    try:
+        for _ in range(2):
+            conn.request('GET', '/entities')
+            response = conn.getresponse()
+            assert json.loads(response.read())['data']['count'] == ENTITY_STREAM_BATCH + 1
+        conn.request('GET', '/health')
+        assert json.loads(conn.getresponse().read())['entities_count'] == ENTITY_STREAM_BATCH + 1
+    finally:
+        conn.close()